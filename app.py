@@ -1,16 +1,40 @@
 import os
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import (Flask, render_template, request, redirect, url_for, flash, session,
+                   Response, stream_with_context, jsonify, g)
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+import contextlib
+import functools
+import gc
+import hashlib
+import hmac
+import io
 import json
-from utils.nlp_processor import preprocess_text
-from utils.rag_engine import RAGEngine
+import threading
+import time
+from datetime import date
+from utils.analysis_pipeline import run_analysis
+from utils.batch_processor import (BatchSummary, read_records, run_batch, shared_executor,
+                                   DEFAULT_CHUNK_SIZE)
+from utils.index_snapshot import load_engine, DEFAULT_SNAPSHOT_PATH
 from utils.claim_analyzer import ClaimAnalyzer
+from utils.result_cache import create_result_cache
+from utils.persistence import AnalysisWriter
+from utils.evidence_watcher import EvidenceWatcher
+from utils.sharded_engine import ShardedRAGEngine
+from utils.domain_classifier import DomainClassifier, DEFAULT_KEYWORDS_PATH
+from utils.brand_catalog import BrandCatalog, DEFAULT_SUGGESTION_LIMIT, MAX_SUGGESTION_LIMIT
+from utils.near_duplicates import NearDuplicateIndex, DEFAULT_THRESHOLD
+from utils import rollups
+from utils.schema import upgrade_schema
+from utils.jobs import JobQueue, JobStore, QueueFull, DEFAULT_WORKERS, DEFAULT_MAX_QUEUED
+from utils.profiler import SamplingProfiler, DEFAULT_INTERVAL, DEFAULT_RATE
+from utils import metrics
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging (per-request details are logged at DEBUG)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
 # Setup database
@@ -31,6 +55,34 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_pre_ping": True,
 }
 
+# Seconds browsers and proxies may reuse catalog and suggestion responses
+CATALOG_MAX_AGE = int(os.environ.get("CATALOG_MAX_AGE", 300))
+
+# Seconds browsers and proxies may reuse /api/stats responses
+STATS_MAX_AGE = int(os.environ.get("STATS_MAX_AGE", 60))
+
+# Evidence corpus (.json, .jsonl or .csv), streamed into the index at startup
+EVIDENCE_PATH = os.environ.get("EVIDENCE_PATH", "data/evidence_database.json")
+
+# Keywords used to classify claim domains
+DOMAIN_KEYWORDS_PATH = os.environ.get("DOMAIN_KEYWORDS_PATH", DEFAULT_KEYWORDS_PATH)
+
+# Seconds /analyze waits for an analysis to be committed before redirecting to its results
+PERSIST_WAIT = float(os.environ.get("PERSIST_WAIT", 5))
+
+# Async mode: /analyze queues a job on a bounded pool of worker threads and returns at once
+ASYNC_ANALYSIS = os.environ.get("ASYNC_ANALYSIS", "0") == "1"
+
+# Sampling profiler: off unless PROFILING=1; the dump endpoint and forced sampling
+# require the PROFILER_TOKEN secret
+PROFILING = os.environ.get("PROFILING", "0") == "1"
+PROFILER_TOKEN = os.environ.get("PROFILER_TOKEN")
+if PROFILING and not PROFILER_TOKEN:
+    raise RuntimeError("PROFILING=1 requires PROFILER_TOKEN to protect /admin/profile")
+
+# Worker processes used by the batch analysis API
+app.config["BATCH_WORKERS"] = int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1))
+
 # Initialize the app with the extension
 db.init_app(app)
 
@@ -43,30 +95,405 @@ def load_json_data(file_path):
         logger.error(f"Error loading {file_path}: {e}")
         return {}
 
-# Initialize NLP components
+# NLP components, built by create_app (once before forking in preload mode)
 rag_engine = None
 claim_analyzer = None
 
-def initialize_nlp_components():
+# Set once the NLP components are built (or failed to build)
+components_ready = threading.Event()
+warmup_error = None
+
+# Seconds a request waits for warmup before getting 503
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", 30))
+
+# Brand catalog, re-read only when the file changes
+brand_catalog = BrandCatalog()
+
+# Per-process services (threads and connections), started in each worker on first request
+evidence_watcher = None
+
+# Cache of analysis results for repeated claims
+result_cache = None
+
+# Write-behind persistence of analyses
+analysis_writer = None
+
+# MinHash/LSH index of earlier analyses, used to reuse verdicts of paraphrased claims
+near_duplicates = None
+
+# Claim rows below the newest one read again on every history sync
+CLAIM_SYNC_OVERLAP = 1000
+
+# Queue of asynchronous analyses (ASYNC_ANALYSIS=1)
+analysis_jobs = None
+
+# Stack sampler for a fraction of requests (PROFILING=1)
+profiler = None
+
+_lifecycle_lock = threading.RLock()
+_app_created = False
+_services_pid = None
+_warmup_pid = None
+
+# Gauges read from the live components at scrape time
+metrics.registry.register(metrics.CallbackGauge(
+    'tbt_result_cache_hits_total', 'Result cache hits (local and shared).',
+    lambda: result_cache.hits + result_cache.shared_hits if result_cache else None,
+    metric_type='counter'))
+metrics.registry.register(metrics.CallbackGauge(
+    'tbt_result_cache_misses_total', 'Result cache misses.',
+    lambda: result_cache.misses if result_cache else None, metric_type='counter'))
+metrics.registry.register(metrics.CallbackGauge(
+    'tbt_index_generation', 'Generation of the live evidence index.',
+    lambda: rag_engine.generation if rag_engine else None))
+metrics.registry.register(metrics.CallbackGauge(
+    'tbt_index_documents', 'Documents in the live evidence index.',
+    lambda: rag_engine.status()['documents'] if rag_engine else None))
+metrics.registry.register(metrics.CallbackGauge(
+    'tbt_index_last_reload_seconds', 'Duration of the last evidence index reload.',
+    lambda: rag_engine.last_reload_seconds if rag_engine else None))
+metrics.registry.register(metrics.CallbackGauge(
+    'tbt_near_duplicate_claims', 'Analyzed claims indexed for near-duplicate detection.',
+    lambda: len(near_duplicates) if near_duplicates is not None else None))
+metrics.registry.register(metrics.CallbackGauge(
+    'tbt_job_queue_depth', 'Asynchronous analysis jobs waiting for a worker.',
+    lambda: analysis_jobs.depth if analysis_jobs is not None else None))
+
+def engine_options():
+    """Retrieval settings from the environment, applied to every RAGEngine (including batch workers)"""
+    return {
+        # MaxScore pruning returns the same results as exhaustive scoring, faster
+        'pruning': os.environ.get("RETRIEVAL_PRUNING", "1") != "0",
+        # Search the claim's domain first, falling back to all evidence
+        'domain_filter': os.environ.get("RETRIEVAL_DOMAIN_FILTER", "1") != "0",
+        # Optionally rerank keyword matches together with hashed dense vector similarity
+        'hybrid': os.environ.get("RETRIEVAL_HYBRID", "0") == "1",
+        # Optionally index token positions to boost and check claim phrases
+        'positional': os.environ.get("RETRIEVAL_PHRASES", "0") == "1",
+    }
+
+def build_components(fork_safe=False):
+    """
+    Build the retrieval engine and claim analyzer
+    
+    Components that are already set (e.g. by a benchmark) are kept.
+    
+    Args:
+        fork_safe: Only build components that can be shared with forked
+            workers; the sharded engine owns worker processes and is then
+            left for each worker to start
+            
+    Returns:
+        True if all components are built
+    """
     global rag_engine, claim_analyzer
     
-    # Load evidence data
-    evidence_data = load_json_data('data/evidence_database.json')
-    regulatory_standards = load_json_data('data/regulatory_standards.json')
+    # Initialize claim analyzer
+    if claim_analyzer is None:
+        regulatory_standards = load_json_data('data/regulatory_standards.json')
+        domain_classifier = DomainClassifier.from_file(DOMAIN_KEYWORDS_PATH)
+        claim_analyzer = ClaimAnalyzer(regulatory_standards, domain_classifier)
     
-    # Initialize RAG engine and claim analyzer
-    rag_engine = RAGEngine(evidence_data)
-    claim_analyzer = ClaimAnalyzer(regulatory_standards)
+    if rag_engine is None:
+        # Open the evidence index snapshot (rebuilt if the evidence data changed),
+        # or partition the index across shard processes
+        snapshot_path = os.environ.get("EVIDENCE_INDEX_PATH", DEFAULT_SNAPSHOT_PATH)
+        search_shards = int(os.environ.get("SEARCH_SHARDS", 1))
+        options = engine_options()
+        if search_shards > 1:
+            if fork_safe:
+                logger.info("Sharded retrieval is started in each worker, not preloaded")
+                return False
+            # Shards only rank with BM25; hybrid and phrase scoring need the whole index
+            unsupported = [name for name in ('hybrid', 'positional') if options.pop(name)]
+            if unsupported:
+                logger.warning(f"Sharded retrieval does not support {' or '.join(unsupported)} "
+                               f"scoring; RETRIEVAL_HYBRID and RETRIEVAL_PHRASES are ignored "
+                               f"with SEARCH_SHARDS > 1")
+            engine = ShardedRAGEngine(EVIDENCE_PATH, search_shards)
+        else:
+            engine = load_engine(EVIDENCE_PATH, snapshot_path)
+        
+        for name, value in options.items():
+            setattr(engine, name, value)
+        
+        # Build lazily computed search structures before serving traffic
+        engine.warm_up()
+        rag_engine = engine
     
     logger.info("NLP components initialized successfully")
+    return True
+
+def _warm_up():
+    """Build the components in the background and mark the app ready"""
+    global warmup_error
+    try:
+        build_components()
+        _start_watcher()
+    except Exception as e:
+        warmup_error = str(e)
+        logger.exception("Error initializing NLP components")
+    finally:
+        components_ready.set()
+
+def _start_warmup():
+    """Start building the components in this process unless already done or underway"""
+    global _warmup_pid
+    with _lifecycle_lock:
+        if components_ready.is_set() or _warmup_pid == os.getpid():
+            return
+        _warmup_pid = os.getpid()
+    threading.Thread(target=_warm_up, name='warmup', daemon=True).start()
+
+def _start_watcher():
+    """Hot-reload the evidence database when it changes on disk"""
+    global evidence_watcher
+    with _lifecycle_lock:
+        if evidence_watcher is not None or rag_engine is None:
+            return
+        watch_interval = float(os.environ.get("EVIDENCE_WATCH_INTERVAL", 5))
+        if isinstance(rag_engine, ShardedRAGEngine):
+            logger.info("Evidence hot reload is not available with sharded retrieval")
+        elif watch_interval > 0:
+            snapshot_path = os.environ.get("EVIDENCE_INDEX_PATH", DEFAULT_SNAPSHOT_PATH)
+            evidence_watcher = EvidenceWatcher(
+                rag_engine, EVIDENCE_PATH, snapshot_path, watch_interval
+            ).start()
+
+def _start_services():
+    """Start this process's threads and connections (once per worker process)"""
+    global _services_pid, result_cache, analysis_writer, near_duplicates, analysis_jobs, profiler
+    if _services_pid == os.getpid():
+        return
+    with _lifecycle_lock:
+        if _services_pid == os.getpid():
+            return
+        import models
+        
+        if result_cache is None:
+            result_cache = create_result_cache()
+        
+        # Start the background writer for analyses
+        if analysis_writer is None:
+            analysis_writer = AnalysisWriter(app, db, models.Claim, models.Evidence)
+        
+        # Detect paraphrases of earlier claims; history is indexed in the background
+        if near_duplicates is None and os.environ.get("NEAR_DUPLICATES", "1") != "0":
+            near_duplicates = NearDuplicateIndex(
+                load=analysis_writer.get,
+                threshold=float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", DEFAULT_THRESHOLD))
+            )
+            threading.Thread(target=load_claim_history, args=(near_duplicates,),
+                             name='claim-history', daemon=True).start()
+        
+        if PROFILING and profiler is None:
+            profiler = SamplingProfiler(
+                interval=float(os.environ.get("PROFILE_INTERVAL", DEFAULT_INTERVAL)),
+                rate=float(os.environ.get("PROFILE_RATE", DEFAULT_RATE))
+            ).start()
+        
+        if ASYNC_ANALYSIS and analysis_jobs is None:
+            analysis_jobs = JobQueue(
+                _run_job,
+                workers=int(os.environ.get("ANALYSIS_JOB_WORKERS", DEFAULT_WORKERS)),
+                max_queued=int(os.environ.get("ANALYSIS_QUEUE_SIZE", DEFAULT_MAX_QUEUED)),
+                store=JobStore(app, db, models.AnalysisJob)
+            )
+        
+        if components_ready.is_set():
+            _start_watcher()
+        else:
+            _start_warmup()
+        _services_pid = os.getpid()
+
+def _index_claims(index, after_id):
+    """
+    Add stored analyses with a row id above after_id to the near-duplicate index
+    
+    Returns:
+        (number of claims indexed, highest row id seen)
+    """
+    from models import Claim
+    with app.app_context():
+        try:
+            last_id = db.session.query(db.func.max(Claim.id)).scalar() or 0
+            rows = db.session.query(Claim.public_id, Claim.brand_name, Claim.claim_text).filter(
+                Claim.id > after_id,
+                Claim.id <= last_id,
+                Claim.public_id.isnot(None),
+                Claim.duplicate_of.is_(None),
+                Claim.verdict != 'Error'
+            ).order_by(Claim.id).yield_per(10000)
+            return index.add_many(rows), last_id
+        finally:
+            db.session.remove()
+
+def load_claim_history(index):
+    """
+    Add stored analyses to the near-duplicate index (runs in a background thread)
+    
+    After the initial load, claims stored since (e.g. by other worker
+    processes) are added every NEAR_DUPLICATE_SYNC seconds. Recent rows are
+    read again because concurrent transactions can commit out of id order;
+    claims already indexed are skipped.
+    """
+    interval = float(os.environ.get("NEAR_DUPLICATE_SYNC", 10))
+    last_id = 0
+    try:
+        count, last_id = _index_claims(index, last_id)
+        logger.info(f"Indexed {count} earlier claims for near-duplicate detection")
+    except Exception as e:
+        logger.error(f"Error loading claim history: {e}")
+    
+    while interval > 0:
+        time.sleep(interval)
+        try:
+            count, newest_id = _index_claims(index, max(0, last_id - CLAIM_SYNC_OVERLAP))
+            last_id = max(last_id, newest_id)
+            if count:
+                logger.debug("Indexed %d claims stored by other workers", count)
+        except Exception as e:
+            logger.warning(f"Error syncing claim history: {e}")
+
+def create_app(preload=None):
+    """
+    Application factory: create the tables and initialize the NLP components
+    
+    Importing this module has no side effects; servers call create_app()
+    (e.g. gunicorn 'app:create_app()'). Worker threads, database connections
+    and caches are started lazily in each worker process on its first request.
+    
+    Args:
+        preload: Build the components synchronously and freeze them with
+            gc.freeze() so workers forked afterwards (gunicorn --preload) share
+            their memory copy-on-write. Otherwise they are built in a background
+            thread and /readyz reports 503 until they are done. Defaults to
+            the PRELOAD_COMPONENTS environment variable.
+            
+    Returns:
+        The Flask app
+    """
+    global _app_created
+    if preload is None:
+        preload = os.environ.get("PRELOAD_COMPONENTS", "0") == "1"
+    
+    with _lifecycle_lock:
+        if _app_created:
+            return app
+        _app_created = True
+        
+        with app.app_context():
+            import models
+            
+            # Create tables, and add columns and indexes missing from older databases
+            db.create_all()
+            upgrade_schema(db.engine, db.metadata)
+            
+            # Keep the verdict and rating rollups current as claims and feedback are inserted
+            rollups.track_inserts(db.session, models.Claim, models.Feedback,
+                                  models.VerdictRollup, models.RatingRollup)
+            
+            if preload:
+                # Connections must not be shared with forked workers
+                db.engine.dispose()
+    
+    if preload:
+        if build_components(fork_safe=True):
+            components_ready.set()
+        # Keep the garbage collector from touching (and so copying) the shared objects
+        gc.collect()
+        gc.freeze()
+    else:
+        _start_warmup()
+    return app
+
+def requires_components(view):
+    """Wait for warmup before running a view; answer 503 if it is not done in time"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not components_ready.wait(WARMUP_TIMEOUT) or warmup_error:
+            return jsonify({'error': 'Service is not ready', 'detail': warmup_error}), 503, {
+                'Retry-After': '5'
+            }
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.before_request
+def ensure_services():
+    _start_services()
+
+def _profiler_authorized():
+    """Whether the request carries the profiler token in X-Profiler-Token"""
+    # Bytes, since compare_digest rejects str with non-ASCII characters
+    return hmac.compare_digest(request.headers.get('X-Profiler-Token', '').encode('utf-8'),
+                               PROFILER_TOKEN.encode('utf-8'))
+
+@app.before_request
+def start_profiling():
+    # A fraction of requests, plus those sent with "X-Profile: 1" and the profiler token
+    if profiler is None:
+        return
+    forced = request.headers.get('X-Profile') == '1' and _profiler_authorized()
+    if profiler.should_profile(forced):
+        rule = request.url_rule.rule if request.url_rule else request.path
+        profiler.begin(f"{request.method} {rule}")
+        g.profiled = True
+
+@app.teardown_request
+def stop_profiling(exc):
+    if g.get('profiled'):
+        profiler.end()
+
+def analyze_and_store(analysis_id, brand_name, tagline, claim):
+    """
+    Analyze a claim and persist the results
+    
+    Args:
+        analysis_id: Public id to store the analysis under, or None for a new one
+        brand_name: Name of the brand
+        tagline: Marketing tagline
+        claim: The raw claim text
+        
+    Returns:
+        Public id of the analysis
+    """
+    analysis_results = run_analysis(
+        brand_name,
+        tagline,
+        claim,
+        rag_engine,
+        claim_analyzer,
+        result_cache=result_cache,
+        near_duplicates=near_duplicates
+    )
+    
+    # Persist the analysis; the session only carries its id
+    with metrics.stage_seconds.time('persist'):
+        analysis_id = analysis_writer.submit(analysis_results, analysis_id)
+    
+    # Later paraphrases of this claim can reuse its verdict
+    if (near_duplicates is not None and analysis_results['verdict'] != 'Error'
+            and not analysis_results.get('near_duplicate_of')):
+        near_duplicates.add(analysis_id, brand_name, claim)
+    return analysis_id
+
+def _run_job(job_id, brand_name, tagline, claim, profile=False):
+    """Run an asynchronous analysis (in a job worker thread)"""
+    sampling = profiler.profile('JOB /analyze') if profile and profiler else contextlib.nullcontext()
+    with app.app_context(), sampling:
+        analyze_and_store(job_id, brand_name, tagline, claim)
+
+def _wants_json():
+    accept = request.accept_mimetypes
+    return accept.best_match(['application/json', 'text/html']) == 'application/json'
 
 # Routes
 @app.route('/')
 def index():
-    indian_brands = load_json_data('data/indian_brands.json')
-    return render_template('index.html', brands=indian_brands)
+    return render_template('index.html', brands=brand_catalog.current().data)
 
 @app.route('/analyze', methods=['POST'])
+@requires_components
 def analyze():
     if request.method == 'POST':
         brand_name = request.form.get('brand_name', '')
@@ -77,33 +504,36 @@ def analyze():
             flash('Please fill in all fields', 'danger')
             return redirect(url_for('index'))
         
+        if analysis_jobs is not None:
+            # Queue the analysis; the job id is also the id its results are stored under
+            try:
+                job = analysis_jobs.submit(brand_name, tagline, claim, g.get('profiled', False))
+            except QueueFull as e:
+                if _wants_json():
+                    return jsonify({'error': 'Too many analyses queued', 'detail': str(e)}), 429, {
+                        'Retry-After': '1'
+                    }
+                flash('The server is busy analyzing other claims. Please try again in a moment.',
+                      'warning')
+                return render_template('index.html', brands=brand_catalog.current().data), 429, {
+                    'Retry-After': '1'
+                }
+            session['analysis_id'] = job.id
+            if _wants_json():
+                return jsonify(_job_status(job.to_dict())), 202, {
+                    'Location': url_for('job_status', job_id=job.id)
+                }
+            return redirect(url_for('results', analysis_id=job.id))
+        
         try:
-            # Preprocess the inputs
-            processed_claim = preprocess_text(claim)
-            
-            # Get relevant evidence using RAG
-            evidence = rag_engine.retrieve_evidence(brand_name, tagline, processed_claim)
-            
-            # Analyze the claim against evidence
-            verdict, score, explanation = claim_analyzer.analyze_claim(
-                brand_name, 
-                tagline, 
-                processed_claim, 
-                evidence
-            )
+            analysis_id = analyze_and_store(None, brand_name, tagline, claim)
+            session['analysis_id'] = analysis_id
             
-            # Store analysis results in session
-            session['analysis_results'] = {
-                'brand_name': brand_name,
-                'tagline': tagline,
-                'claim': claim,
-                'verdict': verdict,
-                'score': score,
-                'explanation': explanation,
-                'evidence': evidence
-            }
-            
-            return redirect(url_for('results'))
+            # The results page may be served by another worker, which only sees
+            # committed analyses; one whose write failed is shown from here
+            if not analysis_writer.wait(analysis_id, PERSIST_WAIT):
+                return render_template('results.html', results=analysis_writer.get(analysis_id))
+            return redirect(url_for('results', analysis_id=analysis_id))
             
         except Exception as e:
             logger.error(f"Error analyzing claim: {e}")
@@ -111,24 +541,219 @@ def analyze():
             return redirect(url_for('index'))
 
 @app.route('/results')
-def results():
-    analysis_results = session.get('analysis_results', None)
+@app.route('/results/<analysis_id>')
+def results(analysis_id=None):
+    analysis_id = analysis_id or session.get('analysis_id')
+    analysis_results = analysis_writer.get(analysis_id) if analysis_id else None
+    if not analysis_results and analysis_jobs is not None and analysis_id:
+        job = analysis_jobs.get(analysis_id)
+        # A finished job's analysis may still be on its way to the database
+        if job is not None and job['status'] in ('queued', 'running', 'done'):
+            return render_template('pending.html', job=job)
+        if job is not None and job['status'] == 'failed':
+            flash(f"An error occurred while analyzing the claim: {job['error']}", 'danger')
+            return redirect(url_for('index'))
     if not analysis_results:
         flash('No analysis results found. Please submit a claim for analysis.', 'warning')
         return redirect(url_for('index'))
     
     return render_template('results.html', results=analysis_results)
 
-@app.route('/about')
-def about():
-    return render_template('about.html')
+def _job_status(job):
+    """Add the status and results URLs to a job's state"""
+    return dict(job,
+                status_url=url_for('job_status', job_id=job['id']),
+                results_url=url_for('results', analysis_id=job['id']))
+
+@app.route('/api/jobs')
+def jobs():
+    """Size and occupancy of this worker's analysis job queue"""
+    if analysis_jobs is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(analysis_jobs.stats(), enabled=True))
 
-with app.app_context():
-    # Import models
-    import models  # noqa: F401
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Status of an analysis job, with the analysis once it is done
     
-    # Create tables
-    db.create_all()
+    Job states are shared by all workers through the database; a job
+    whose state was purged is found through its stored analysis. The
+    result is null until the finished analysis has been written.
+    """
+    job = analysis_jobs.get(job_id) if analysis_jobs is not None else None
+    result = None
+    if job is None or job['status'] == 'done':
+        result = analysis_writer.get(job_id)
+        if job is None:
+            if result is None:
+                return jsonify({'error': 'Unknown job'}), 404
+            job = {'id': job_id, 'status': 'done'}
     
-    # Initialize NLP components
-    initialize_nlp_components()
+    response = jsonify(dict(_job_status(job), result=result))
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/api/analyze/batch', methods=['POST'])
+@requires_components
+def analyze_batch():
+    """
+    Analyze many claims in one request
+    
+    Accepts a JSON array (or {"claims": [...]}), JSONL, or CSV with a header row.
+    Results are streamed back as JSONL in input order, followed by a summary line.
+    """
+    chunk_size = request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int)
+    if chunk_size < 1:
+        return jsonify({'error': 'chunk_size must be positive'}), 400
+    
+    if request.mimetype == 'application/json':
+        payload = request.get_json(silent=True)
+        records = payload.get('claims') if isinstance(payload, dict) else payload
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a JSON array of claims'}), 400
+    elif request.mimetype == 'text/csv':
+        records = read_records(io.StringIO(request.get_data(as_text=True)), 'csv')
+    else:
+        records = read_records(request.get_data(as_text=True).splitlines())
+    
+    workers = app.config["BATCH_WORKERS"]
+    summary = BatchSummary(workers, chunk_size)
+    # Workers are restarted when the live index was hot-reloaded
+    pool = shared_executor(workers, rag_engine.version, EVIDENCE_PATH, DOMAIN_KEYWORDS_PATH,
+                           engine_options())
+    
+    def generate():
+        with pool as executor:
+            for result in run_batch(records, executor, workers, chunk_size, summary):
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+        yield json.dumps({'summary': summary.to_dict()}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _cacheable_json(payload, etag, max_age=CATALOG_MAX_AGE):
+    """JSON response with an ETag that answers If-None-Match with 304"""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+@app.route('/api/brands')
+def brands():
+    """The full brand catalog"""
+    catalog = brand_catalog.current()
+    return _cacheable_json(catalog.data, catalog.etag)
+
+@app.route('/api/suggest')
+def suggest():
+    """
+    Autocomplete brand names, taglines and common claims
+    
+    Query parameters: q (prefix), limit, and optionally kind (brand, tagline
+    or claim).
+    """
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', DEFAULT_SUGGESTION_LIMIT, type=int), MAX_SUGGESTION_LIMIT)
+    kind = request.args.get('kind')
+    catalog = brand_catalog.current()
+    suggestions = catalog.suggestions.suggest(query, limit, kind)
+    etag = hashlib.sha256(f"{catalog.etag}|{query}|{limit}|{kind}".encode('utf-8')).hexdigest()[:32]
+    return _cacheable_json({'query': query, 'suggestions': suggestions}, etag)
+
+@app.route('/api/stats')
+def stats():
+    """
+    Daily verdict distribution, average score and average feedback rating
+    
+    Query parameters: dimension (brand, domain or all), optionally key (one
+    brand or domain), since and until (YYYY-MM-DD), limit, and cursor (the
+    'next' value of the previous page).
+    """
+    import models
+    
+    try:
+        dimension = request.args.get('dimension', 'brand')
+        since = request.args.get('since')
+        until = request.args.get('until')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', rollups.DEFAULT_PAGE_SIZE, type=int)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        page, next_cursor = rollups.query_stats(
+            db.session, models.VerdictRollup, models.RatingRollup,
+            dimension=dimension,
+            key=request.args.get('key'),
+            since=date.fromisoformat(since) if since else None,
+            until=date.fromisoformat(until) if until else None,
+            after=rollups.decode_cursor(cursor) if cursor else None,
+            limit=min(limit, rollups.MAX_PAGE_SIZE)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    payload = {'dimension': dimension, 'stats': page, 'next': next_cursor}
+    etag = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+    return _cacheable_json(payload, etag, STATS_MAX_AGE)
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/api/index/status')
+@requires_components
+def index_status():
+    status = rag_engine.status()
+    status['watcher'] = evidence_watcher.status() if evidence_watcher else None
+    return jsonify(status)
+
+@app.route('/api/index/memory')
+@requires_components
+def index_memory():
+    return jsonify(rag_engine.memory_report())
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the NLP components are built and requests can be analyzed"""
+    if not components_ready.is_set():
+        return jsonify({'status': 'warming_up'}), 503
+    if warmup_error:
+        return jsonify({'status': 'failed', 'error': warmup_error}), 503
+    return jsonify({'status': 'ready', 'generation': rag_engine.generation})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Per-stage latency histograms and counters in Prometheus text format"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profile')
+def profile_dump():
+    """
+    Stacks sampled from profiled requests in this worker, in collapsed format
+    
+    Feed the output to flamegraph.pl or speedscope. Query parameters:
+    format=json for the sampler's counters instead, reset=1 to clear the
+    stacks after reading them.
+    """
+    if profiler is None:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not _profiler_authorized():
+        return jsonify({'error': 'Invalid profiler token'}), 403
+    
+    if request.args.get('format') == 'json':
+        response = jsonify(profiler.stats())
+    else:
+        response = Response(profiler.collapsed(), mimetype='text/plain')
+    if request.args.get('reset') == '1':
+        profiler.reset()
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/about')
+def about():
+    return render_template('about.html')
@@ -0,0 +1,101 @@
+"""
+Benchmark: hashed dense vectors and hybrid retrieval.
+
+Builds the dense matrix for a synthetic corpus, then times cosine search
+one query at a time against one batched matrix multiply for all queries,
+and keyword-only against hybrid retrieve_evidence, reporting how many of
+the hybrid top-k documents the keyword ranking also returned.
+
+Usage:
+    python -m benchmarks.bench_dense [--documents 100000] [-k 5]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticCorpus, claim_triples
+from utils.nlp_processor import preprocess_text
+from utils.rag_engine import RAGEngine
+
+
+def percentiles(latencies):
+    milliseconds = np.array(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(milliseconds, 50)), 3),
+        'p99_ms': round(float(np.percentile(milliseconds, 99)), 3),
+        'mean_ms': round(float(milliseconds.mean()), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpus = SyntheticCorpus(args.seed)
+    engine = RAGEngine(list(corpus.evidence(args.documents)))
+    triples = [
+        (brand_name, tagline, preprocess_text(claim))
+        for brand_name, tagline, claim in claim_triples(corpus.catalog(max(1, args.queries // 3)))
+    ]
+
+    started = time.perf_counter()
+    dense = engine._current.dense.get()
+    report = {
+        'documents': args.documents,
+        'queries': len(triples),
+        'k': args.k,
+        'dimensions': dense.vectorizer.dim,
+        'build_seconds': round(time.perf_counter() - started, 2),
+        'matrix_bytes': dense.nbytes,
+    }
+
+    query_vectors = np.stack([
+        dense.embed(engine.tokenizer.analyze(' '.join(triple)).tokens) for triple in triples
+    ])
+    latencies = []
+    single = []
+    for query_vector in query_vectors:
+        started = time.perf_counter()
+        single.append(dense.search(query_vector, args.k))
+        latencies.append(time.perf_counter() - started)
+    report['dense_single'] = percentiles(latencies)
+
+    started = time.perf_counter()
+    batched = dense.search_many(query_vectors, args.k)
+    elapsed = time.perf_counter() - started
+    report['dense_batched'] = {
+        'total_ms': round(elapsed * 1000, 3),
+        'per_query_ms': round(elapsed * 1000 / len(triples), 3),
+        # float32 sums may round differently in the batched multiply, so near
+        # ties can swap places; compare the returned documents
+        'same_documents_ratio': round(sum(
+            {doc for doc, _ in a} == {doc for doc, _ in b} for a, b in zip(single, batched)
+        ) / len(triples), 4),
+    }
+
+    rankings = {}
+    for name, hybrid in (('keyword', False), ('hybrid', True)):
+        engine.hybrid = hybrid
+        latencies = []
+        rankings[name] = []
+        for triple in triples:
+            started = time.perf_counter()
+            results = engine.retrieve_evidence(*triple, k=args.k)
+            latencies.append(time.perf_counter() - started)
+            rankings[name].append({item['metadata']['id'] for item in results})
+        report[name] = percentiles(latencies)
+
+    shared = sum(len(a & b) for a, b in zip(rankings['keyword'], rankings['hybrid']))
+    returned = sum(len(b) for b in rankings['hybrid'])
+    report['hybrid_overlap_with_keyword'] = round(shared / returned, 4) if returned else 0.0
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
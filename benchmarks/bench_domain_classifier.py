@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: compiled DomainClassifier vs. the previous substring scan.
+
+Usage:
+    python -m benchmarks.bench_domain_classifier [--iterations N]
+"""
+import argparse
+import json
+import random
+import time
+
+from utils.domain_classifier import DomainClassifier, DEFAULT_KEYWORDS_PATH
+
+
+def legacy_determine_domain(domain_keywords, brand_name, tagline, claim):
+    """The original ClaimAnalyzer._determine_domain substring scan"""
+    all_text = f"{brand_name} {tagline} {claim}".lower()
+    domain_scores = {}
+    for domain, keywords in domain_keywords.items():
+        domain_scores[domain] = sum(1 for keyword in keywords if keyword in all_text)
+    if sum(domain_scores.values()) > 0:
+        return max(domain_scores.items(), key=lambda x: x[1])[0]
+    return "general"
+
+
+def load_samples():
+    """Brand/tagline/claim triples from the bundled brand catalog"""
+    with open('data/indian_brands.json', 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+    samples = []
+    for category in catalog.get('categories', []):
+        for brand in category.get('brands', []):
+            for tagline in brand.get('taglines', []):
+                for claim in brand.get('common_claims', []):
+                    samples.append((brand['name'], tagline, claim))
+    return samples
+
+
+def time_per_call(fn, samples, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for sample in samples:
+            fn(*sample)
+    return (time.perf_counter() - start) / (iterations * len(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--padding', type=int, default=0,
+                        help="Extra random words appended to each claim")
+    args = parser.parse_args()
+
+    with open(DEFAULT_KEYWORDS_PATH, 'r', encoding='utf-8') as f:
+        domain_keywords = json.load(f)
+    classifier = DomainClassifier(domain_keywords)
+
+    samples = load_samples()
+    if args.padding:
+        vocabulary = [w for s in samples for w in ' '.join(s).split()]
+        random.seed(0)
+        samples = [(b, t, c + ' ' + ' '.join(random.choices(vocabulary, k=args.padding)))
+                   for b, t, c in samples]
+
+    legacy = time_per_call(
+        lambda b, t, c: legacy_determine_domain(domain_keywords, b, t, c), samples, args.iterations
+    )
+    compiled = time_per_call(
+        lambda b, t, c: classifier.classify(f"{b} {t} {c}"), samples, args.iterations
+    )
+    agreement = sum(
+        legacy_determine_domain(domain_keywords, *s) == classifier.classify(' '.join(s))
+        for s in samples
+    ) / len(samples)
+
+    print(json.dumps({
+        'samples': len(samples),
+        'legacy_us_per_call': round(legacy * 1e6, 2),
+        'compiled_us_per_call': round(compiled * 1e6, 2),
+        'speedup': round(legacy / compiled, 2),
+        'agreement': round(agreement, 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: MaxScore dynamic pruning vs. exhaustive BM25 scoring.
+
+Runs the same synthetic queries through InvertedIndex.search with and
+without pruning, checks that the top-k lists are identical and reports
+latency plus the share of postings that pruning skipped.
+
+Usage:
+    python -m benchmarks.bench_pruning [--documents 100000] [-k 5]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticCorpus, claim_triples
+from utils.nlp_processor import preprocess_text
+from utils.rag_engine import RAGEngine, query_term_weights
+
+
+def time_search(index, queries, k, prune):
+    """Return (per-query latencies, results, summed stats)"""
+    latencies = []
+    results = []
+    totals = {'postings_scanned': 0, 'postings_skipped': 0, 'candidates_scored': 0}
+    for term_weights in queries:
+        stats = {}
+        started = time.perf_counter()
+        results.append(index.search(term_weights, k, stats=stats, prune=prune))
+        latencies.append(time.perf_counter() - started)
+        for key in totals:
+            totals[key] += stats[key]
+    return latencies, results, totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpus = SyntheticCorpus(args.seed)
+    engine = RAGEngine(list(corpus.evidence(args.documents)))
+    queries = []
+    for brand_name, tagline, claim in claim_triples(corpus.catalog(max(1, args.queries // 3))):
+        tokenized = engine.tokenizer.analyze(f"{brand_name} {tagline} {preprocess_text(claim)}")
+        token_weights = query_term_weights(tokenized)
+        queries.append({
+            term_id: token_weights[token] for token, term_id in tokenized.term_ids.items()
+        })
+
+    report = {'documents': args.documents, 'queries': len(queries), 'k': args.k}
+    baseline = None
+    for name, prune in (('exhaustive', False), ('maxscore', True)):
+        # Warm-up pass (also computes the per-term upper bounds)
+        time_search(engine.index, queries[:10], args.k, prune)
+        latencies, results, totals = time_search(engine.index, queries, args.k, prune)
+        milliseconds = np.array(latencies) * 1000
+        total = totals['postings_scanned'] + totals['postings_skipped']
+        report[name] = {
+            'p50_ms': round(float(np.percentile(milliseconds, 50)), 3),
+            'p99_ms': round(float(np.percentile(milliseconds, 99)), 3),
+            'mean_ms': round(float(milliseconds.mean()), 3),
+            'postings_skipped_ratio': round(totals['postings_skipped'] / total, 4) if total else 0.0,
+            'candidates_per_query': round(totals['candidates_scored'] / len(queries), 1),
+        }
+        if baseline is None:
+            baseline = results
+        else:
+            report[name]['identical_results'] = results == baseline
+
+    report['speedup'] = round(report['exhaustive']['mean_ms'] / report['maxscore']['mean_ms'], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
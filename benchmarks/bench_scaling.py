@@ -0,0 +1,238 @@
+"""
+Scaling benchmark for retrieval and claim analysis on synthetic corpora.
+
+Each corpus size runs in a fresh process so peak RSS is measured per size.
+For every size it reports index build time, peak RSS, retrieval p50/p99
+latency, ClaimAnalyzer.analyze_claim throughput and Flask /analyze
+requests/sec through the test client.
+
+Usage:
+    python -m benchmarks.bench_scaling [--sizes 1000 10000 100000] [-o results.json]
+    python -m benchmarks.bench_scaling --baseline benchmarks/baseline_scaling.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_BASELINE = 'benchmarks/baseline_scaling.json'
+DEFAULT_TOLERANCE = 0.2
+
+# Whether a larger value of each metric is better, used when comparing to a baseline
+METRICS = {
+    'build_seconds': False,
+    'peak_rss_mb': False,
+    'retrieval_p50_ms': False,
+    'retrieval_p99_ms': False,
+    'analyze_claims_per_sec': True,
+    'flask_requests_per_sec': True,
+}
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _percentiles_ms(samples):
+    p50, p99 = np.percentile(np.array(samples) * 1000, [50, 99])
+    return round(float(p50), 3), round(float(p99), 3)
+
+
+def _bench_flask(engine, triples, requests):
+    """Requests/sec of POST /analyze through the Flask test client"""
+    # Configure the app before importing it: throwaway database, no watcher
+    db_dir = tempfile.mkdtemp(prefix='tbt-bench-')
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ['EVIDENCE_WATCH_INTERVAL'] = '0'
+    os.environ['NEAR_DUPLICATES'] = '0'
+    os.environ.pop('RESULT_CACHE_PATH', None)
+
+    import app as app_module
+    from utils.result_cache import ResultCache
+
+    app_module.rag_engine = engine
+    # Every request should run the pipeline rather than hit the result cache
+    app_module.result_cache = ResultCache(max_entries=0)
+    client = app_module.create_app(preload=True).test_client()
+
+    started = time.perf_counter()
+    for i in range(requests):
+        brand_name, tagline, claim = triples[i % len(triples)]
+        response = client.post('/analyze', data={
+            'brand_name': brand_name, 'tagline': tagline, 'claim': claim,
+        })
+        if response.status_code != 302:
+            raise RuntimeError(f"/analyze returned {response.status_code}")
+    app_module.analysis_writer.flush()
+    return requests / (time.perf_counter() - started)
+
+
+def run_size(size, queries, requests, seed):
+    """
+    Benchmark one corpus size (meant to run in its own process)
+
+    Args:
+        size: Number of synthetic evidence documents
+        queries: Number of retrieval queries / analyzed claims
+        requests: Number of /analyze requests (0 skips the Flask benchmark)
+        seed: Random seed for the synthetic data
+
+    Returns:
+        Dict of measurements for this size
+    """
+    from benchmarks.synthetic import SyntheticCorpus, claim_triples
+    from utils.claim_analyzer import ClaimAnalyzer
+    from utils.nlp_processor import preprocess_text
+    from utils.rag_engine import RAGEngine
+
+    corpus = SyntheticCorpus(seed)
+    evidence = list(corpus.evidence(size))
+    triples = claim_triples(corpus.catalog(max(1, queries // 3)))
+    rss_before_build = _peak_rss_mb()
+
+    started = time.perf_counter()
+    engine = RAGEngine(evidence)
+    build_seconds = time.perf_counter() - started
+    del evidence
+
+    with open('data/regulatory_standards.json', 'r', encoding='utf-8') as f:
+        analyzer = ClaimAnalyzer(json.load(f))
+
+    processed = [(b, t, preprocess_text(c)) for b, t, c in triples[:queries]]
+
+    # Warm up caches and lazily built structures before timing
+    for brand_name, tagline, claim in processed[:10]:
+        analyzer.analyze_claim(brand_name, tagline, claim,
+                               engine.retrieve_evidence(brand_name, tagline, claim))
+
+    latencies = []
+    retrieved = []
+    for brand_name, tagline, claim in processed:
+        started = time.perf_counter()
+        evidence_items = engine.retrieve_evidence(brand_name, tagline, claim)
+        latencies.append(time.perf_counter() - started)
+        retrieved.append(evidence_items)
+    p50, p99 = _percentiles_ms(latencies)
+
+    started = time.perf_counter()
+    for (brand_name, tagline, claim), evidence_items in zip(processed, retrieved):
+        analyzer.analyze_claim(brand_name, tagline, claim, evidence_items)
+    analyze_rate = len(processed) / (time.perf_counter() - started)
+
+    result = {
+        'documents': size,
+        'terms': len(engine.index.vocabulary),
+        'postings': engine.index.num_postings,
+        'queries': len(processed),
+        'build_seconds': round(build_seconds, 3),
+        'rss_before_build_mb': round(rss_before_build, 1),
+        'retrieval_p50_ms': p50,
+        'retrieval_p99_ms': p99,
+        'analyze_claims_per_sec': round(analyze_rate, 1),
+    }
+    if requests:
+        result['flask_requests_per_sec'] = round(_bench_flask(engine, triples, requests), 1)
+    result['peak_rss_mb'] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results with a baseline run
+
+    Args:
+        results: Output of this benchmark
+        baseline: Earlier output of this benchmark
+        tolerance: Relative change treated as a regression (0.2 = 20%)
+
+    Returns:
+        List of comparison dicts, one per metric present in both runs
+    """
+    baseline_by_size = {entry['documents']: entry for entry in baseline.get('results', [])}
+    comparisons = []
+    for entry in results['results']:
+        previous = baseline_by_size.get(entry['documents'])
+        if previous is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in entry or not previous.get(metric):
+                continue
+            ratio = entry[metric] / previous[metric]
+            change = ratio - 1 if higher_is_better else 1 - ratio
+            comparisons.append({
+                'documents': entry['documents'],
+                'metric': metric,
+                'baseline': previous[metric],
+                'current': entry[metric],
+                'ratio': round(ratio, 3),
+                'regression': change < -tolerance,
+            })
+    return comparisons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Evidence corpus sizes (up to 1000000)")
+    parser.add_argument('--queries', type=int, default=300, help="Claims per size")
+    parser.add_argument('--requests', type=int, default=200,
+                        help="/analyze requests per size (0 to skip)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="Write results JSON to this file")
+    parser.add_argument('--baseline', help=f"Compare with a stored run, e.g. {DEFAULT_BASELINE}")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'scaling',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'seed': args.seed,
+        'results': [],
+    }
+
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            entry = executor.submit(run_size, size, args.queries, args.requests, args.seed).result()
+        results['results'].append(entry)
+        print(json.dumps(entry), file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            results['comparison'] = compare(results, json.load(f), args.tolerance)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    regressions = [c for c in results.get('comparison', []) if c['regression']]
+    for c in regressions:
+        print(f"REGRESSION {c['metric']} at {c['documents']} docs: "
+              f"{c['baseline']} -> {c['current']}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark: sharded retrieval speedup vs. shard count.
+
+Builds a synthetic evidence corpus, then measures query latency and
+throughput of the single-process RAGEngine and of ShardedRAGEngine with each
+requested shard count, and checks that every configuration returns the same
+evidence. Speedup only appears once per-shard scoring outweighs the
+inter-process round trip, i.e. on large corpora with enough free cores.
+
+Usage:
+    python -m benchmarks.bench_shards [--documents 200000] [--shards 1 2 4 8]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticCorpus, claim_triples
+from utils.nlp_processor import preprocess_text
+from utils.rag_engine import RAGEngine
+from utils.sharded_engine import ShardedRAGEngine
+
+
+def time_queries(engine, queries):
+    """Return (per-query latencies in seconds, retrieved evidence ids)"""
+    for query in queries[:10]:
+        engine.retrieve_evidence(*query)
+
+    latencies = []
+    retrieved = []
+    for query in queries:
+        started = time.perf_counter()
+        results = engine.retrieve_evidence(*query)
+        latencies.append(time.perf_counter() - started)
+        retrieved.append([item['metadata']['id'] for item in results])
+    return latencies, retrieved
+
+
+def summarize(latencies):
+    seconds = np.array(latencies)
+    return {
+        'p50_ms': round(float(np.percentile(seconds, 50)) * 1000, 3),
+        'p99_ms': round(float(np.percentile(seconds, 99)) * 1000, 3),
+        'queries_per_sec': round(len(seconds) / float(seconds.sum()), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=200000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpus = SyntheticCorpus(args.seed)
+    evidence = list(corpus.evidence(args.documents))
+    queries = [(b, t, preprocess_text(c))
+               for b, t, c in claim_triples(corpus.catalog(max(1, args.queries // 3)))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        evidence_path = os.path.join(tmp, 'evidence.json')
+        with open(evidence_path, 'w', encoding='utf-8') as f:
+            json.dump(evidence, f)
+
+        started = time.perf_counter()
+        engine = RAGEngine(evidence)
+        build_seconds = time.perf_counter() - started
+        del evidence
+        latencies, expected = time_queries(engine, queries)
+        single = dict(summarize(latencies), build_seconds=round(build_seconds, 3))
+        del engine
+
+        runs = []
+        for num_shards in args.shards:
+            started = time.perf_counter()
+            sharded = ShardedRAGEngine(evidence_path, num_shards)
+            build_seconds = time.perf_counter() - started
+            latencies, retrieved = time_queries(sharded, queries)
+            sharded.close()
+
+            run = dict(summarize(latencies), shards=num_shards,
+                       build_seconds=round(build_seconds, 3))
+            run['speedup'] = round(run['queries_per_sec'] / single['queries_per_sec'], 2)
+            run['matches_single_process'] = retrieved == expected
+            runs.append(run)
+            print(json.dumps(run), file=sys.stderr)
+
+    print(json.dumps({
+        'documents': args.documents,
+        'queries': len(queries),
+        'cpu_count': os.cpu_count(),
+        'single_process': single,
+        'sharded': runs,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
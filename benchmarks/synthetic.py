@@ -0,0 +1,144 @@
+"""
+Synthetic evidence corpora and claim sets for benchmarks.
+
+Evidence items have the same fields as data/evidence_database.json and claim
+catalogs the same shape as data/indian_brands.json. Words are drawn from a
+Zipf distribution over the bundled data's vocabulary plus generated filler
+terms, so document frequencies and posting list lengths look like real text
+rather than uniform noise.
+"""
+import json
+import random
+
+import numpy as np
+
+EVIDENCE_PATH = 'data/evidence_database.json'
+BRANDS_PATH = 'data/indian_brands.json'
+KEYWORDS_PATH = 'data/domain_keywords.json'
+
+# Zipf exponent for word frequencies (close to 1 for English text)
+ZIPF_EXPONENT = 1.07
+# Generated terms added to the real vocabulary
+FILLER_TERMS = 20000
+# Words per evidence item (the bundled items average ~40)
+DOC_LENGTH_RANGE = (25, 60)
+CLAIM_LENGTH_RANGE = (3, 8)
+
+
+def _load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class SyntheticCorpus:
+    """Generator of evidence items and claims over a shared vocabulary"""
+
+    def __init__(self, seed=0):
+        """
+        Args:
+            seed: Seed for all random choices, so runs are reproducible
+        """
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._random = random.Random(seed)
+
+        evidence = _load(EVIDENCE_PATH)
+        catalog = _load(BRANDS_PATH)
+        self.domain_keywords = _load(KEYWORDS_PATH)
+        self.sources = sorted({item['source'] for item in evidence})
+
+        # Real words first, so they get the most frequent ranks
+        words = []
+        seen = set()
+        texts = [item['content'] for item in evidence]
+        for category in catalog.get('categories', []):
+            for brand in category.get('brands', []):
+                texts.extend(brand.get('taglines', []))
+                texts.extend(brand.get('common_claims', []))
+        for text in texts:
+            for word in text.split():
+                word = word.strip('.,;:()\'"').lower()
+                if word and word not in seen:
+                    seen.add(word)
+                    words.append(word)
+        self._random.shuffle(words)
+        words.extend(f"term{i:05d}" for i in range(FILLER_TERMS))
+        self.vocabulary = np.array(words, dtype=object)
+
+        ranks = np.arange(1, len(words) + 1, dtype=np.float64)
+        weights = ranks ** -ZIPF_EXPONENT
+        self._probabilities = weights / weights.sum()
+
+        self.categories = catalog.get('categories', [])
+
+    def _sentences(self, count, length_range):
+        """Return count random word sequences with lengths in length_range"""
+        lengths = self._rng.integers(length_range[0], length_range[1] + 1, size=count)
+        word_ids = self._rng.choice(
+            len(self.vocabulary), size=int(lengths.sum()), p=self._probabilities
+        )
+        words = self.vocabulary[word_ids]
+        ends = np.cumsum(lengths)
+        return [' '.join(words[end - length:end]) for end, length in zip(ends, lengths)]
+
+    def evidence(self, count, batch_size=50000):
+        """
+        Generate evidence items shaped like data/evidence_database.json
+
+        Args:
+            count: Number of items
+            batch_size: Items generated per vectorized batch
+
+        Yields:
+            Evidence dicts with id, domain, content, source, url, publication_date
+        """
+        domains = sorted(self.domain_keywords)
+        produced = 0
+        while produced < count:
+            batch = min(batch_size, count - produced)
+            texts = self._sentences(batch, DOC_LENGTH_RANGE)
+            for offset, text in enumerate(texts):
+                number = produced + offset
+                domain = domains[number % len(domains)]
+                keyword = self._random.choice(self.domain_keywords[domain])
+                yield {
+                    'id': f"s{number:07d}",
+                    'domain': domain,
+                    'content': f"{text} {keyword}.",
+                    'source': self.sources[number % len(self.sources)],
+                    'url': f"https://example.org/evidence/{number}",
+                    'publication_date': f"20{10 + number % 15:02d}-{1 + number % 12:02d}-15",
+                }
+            produced += batch
+
+    def catalog(self, brand_count):
+        """
+        Generate a brand catalog shaped like data/indian_brands.json
+
+        Args:
+            brand_count: Number of brands across all categories
+
+        Returns:
+            Dict with a 'categories' list of brands, taglines and common claims
+        """
+        names = [category['name'] for category in self.categories] or ['General']
+        categories = [{'name': name, 'brands': []} for name in names]
+        phrases = self._sentences(brand_count * 5, CLAIM_LENGTH_RANGE)
+        for i in range(brand_count):
+            tagline_a, tagline_b, *claims = phrases[i * 5:(i + 1) * 5]
+            categories[i % len(categories)]['brands'].append({
+                'name': f"Brand{i:05d}",
+                'taglines': [tagline_a.title(), tagline_b.title()],
+                'common_claims': [claim.capitalize() for claim in claims],
+            })
+        return {'categories': categories}
+
+
+def claim_triples(catalog):
+    """Flatten a brand catalog into (brand_name, tagline, claim) triples"""
+    triples = []
+    for category in catalog.get('categories', []):
+        for brand in category.get('brands', []):
+            for tagline, claim in zip(brand['taglines'] * 2, brand['common_claims']):
+                triples.append((brand['name'], tagline, claim))
+    return triples
@@ -1,5 +1,7 @@
 import logging
-from app import app
+from app import create_app
+
+app = create_app()
 
 # Set up logging for debugging
 logging.basicConfig(level=logging.DEBUG)
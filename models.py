@@ -3,34 +3,76 @@ from datetime import datetime
 
 class Claim(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    brand_name = db.Column(db.String(100), nullable=False)
+    public_id = db.Column(db.String(32), unique=True, index=True, nullable=True)  # Opaque id used in URLs
+    brand_name = db.Column(db.String(100), nullable=False, index=True)
     tagline = db.Column(db.String(200), nullable=False)
     claim_text = db.Column(db.Text, nullable=False)
-    verdict = db.Column(db.String(20), nullable=True)  # Substantiated, Partially True, Misleading
+    verdict = db.Column(db.String(50), nullable=True)  # Substantiated, Partially True, Misleading
+    domain = db.Column(db.String(50), nullable=True)  # Claim domain, e.g. health or finance
     score = db.Column(db.Float, nullable=True)
     explanation = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Public id of the earlier analysis whose verdict was reused, if any
+    duplicate_of = db.Column(db.String(32), nullable=True)
+    duplicate_similarity = db.Column(db.Float, nullable=True)
+    # Version of the evidence corpus the verdict was reached with
+    corpus_version = db.Column(db.String(64), nullable=True)
     
     def __repr__(self):
         return f'<Claim {self.brand_name}: {self.tagline}>'
+    
+    def to_results(self):
+        """Return the analysis in the shape rendered by results.html"""
+        return {
+            'id': self.public_id,
+            'brand_name': self.brand_name,
+            'tagline': self.tagline,
+            'claim': self.claim_text,
+            'domain': self.domain,
+            'corpus_version': self.corpus_version,
+            'verdict': self.verdict,
+            'score': self.score,
+            'explanation': self.explanation,
+            'evidence': [evidence.to_result() for evidence in self.evidences],
+            'near_duplicate_of': {
+                'id': self.duplicate_of,
+                'similarity': self.duplicate_similarity
+            } if self.duplicate_of else None
+        }
 
 class Evidence(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    claim_id = db.Column(db.Integer, db.ForeignKey('claim.id'), nullable=False)
+    claim_id = db.Column(db.Integer, db.ForeignKey('claim.id'), nullable=False, index=True)
     source = db.Column(db.String(200), nullable=False)
     text = db.Column(db.Text, nullable=False)
     relevance_score = db.Column(db.Float, nullable=False)
+    url = db.Column(db.String(500), nullable=True)
+    domain = db.Column(db.String(50), nullable=True)
+    publication_date = db.Column(db.String(20), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship
-    claim = db.relationship('Claim', backref=db.backref('evidences', lazy=True))
+    claim = db.relationship('Claim', backref=db.backref('evidences', lazy=True, order_by='Evidence.id'))
     
     def __repr__(self):
         return f'<Evidence for Claim {self.claim_id} from {self.source}>'
+    
+    def to_result(self):
+        """Return the evidence in the shape produced by RAGEngine.retrieve_evidence"""
+        return {
+            'text': self.text,
+            'metadata': {
+                'source': self.source,
+                'url': self.url,
+                'domain': self.domain,
+                'publication_date': self.publication_date
+            },
+            'relevance_score': self.relevance_score
+        }
 
 class Feedback(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    claim_id = db.Column(db.Integer, db.ForeignKey('claim.id'), nullable=False)
+    claim_id = db.Column(db.Integer, db.ForeignKey('claim.id'), nullable=False, index=True)
     user_rating = db.Column(db.Integer, nullable=False)  # 1-5 rating
     comments = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -40,3 +82,59 @@ class Feedback(db.Model):
     
     def __repr__(self):
         return f'<Feedback for Claim {self.claim_id}: {self.user_rating}/5>'
+
+class AnalysisJob(db.Model):
+    """State of an asynchronous analysis, shared by all worker processes"""
+    id = db.Column(db.String(32), primary_key=True)  # Also the public id of its analysis
+    status = db.Column(db.String(10), nullable=False)  # queued, running, done or failed
+    submitted_at = db.Column(db.Float, nullable=False)
+    started_at = db.Column(db.Float, nullable=True)
+    finished_at = db.Column(db.Float, nullable=True, index=True)
+    wait_seconds = db.Column(db.Float, nullable=True)
+    run_seconds = db.Column(db.Float, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    
+    def __repr__(self):
+        return f'<AnalysisJob {self.id}: {self.status}>'
+    
+    def to_dict(self):
+        """Return the state in the shape of Job.to_dict"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'wait_seconds': self.wait_seconds,
+            'run_seconds': self.run_seconds,
+            'error': self.error,
+        }
+
+class VerdictRollup(db.Model):
+    """Claims per verdict for one brand, domain or the total ('all') on one day"""
+    __table_args__ = (db.UniqueConstraint('dimension', 'key', 'day', 'verdict'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(10), nullable=False)  # all, brand or domain
+    key = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    verdict = db.Column(db.String(50), nullable=False)
+    claims = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<VerdictRollup {self.dimension}={self.key} {self.day} {self.verdict}: {self.claims}>'
+
+class RatingRollup(db.Model):
+    """Feedback ratings for one brand, domain or the total ('all') on one day"""
+    __table_args__ = (db.UniqueConstraint('dimension', 'key', 'day'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(10), nullable=False)  # all, brand or domain
+    key = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    ratings = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<RatingRollup {self.dimension}={self.key} {self.day}: {self.ratings}>'
@@ -22,6 +22,41 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // Autocomplete brand names and taglines from the catalog
+    const suggestInputs = document.querySelectorAll('[data-suggest-kind]');
+    suggestInputs.forEach(input => {
+        const datalist = document.getElementById(input.getAttribute('list'));
+        let timer = null;
+        
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = input.value.trim();
+            if (!query) {
+                datalist.innerHTML = '';
+                return;
+            }
+            
+            // Wait for a pause in typing before asking the server
+            timer = setTimeout(() => {
+                const params = new URLSearchParams({
+                    q: query,
+                    kind: input.getAttribute('data-suggest-kind')
+                });
+                fetch('/api/suggest?' + params.toString())
+                    .then(response => response.json())
+                    .then(data => {
+                        datalist.innerHTML = '';
+                        data.suggestions.forEach(suggestion => {
+                            const option = document.createElement('option');
+                            option.value = suggestion.text;
+                            datalist.appendChild(option);
+                        });
+                    })
+                    .catch(() => {});
+            }, 150);
+        });
+    });
+    
     // Initialize tooltips
     const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
     tooltipTriggerList.map(function (tooltipTriggerEl) {
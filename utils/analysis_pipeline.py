@@ -0,0 +1,91 @@
+import logging
+from utils import metrics
+from utils.nlp_processor import preprocess_text
+from utils.result_cache import make_key
+
+logger = logging.getLogger(__name__)
+
+
+def run_analysis(brand_name, tagline, claim, rag_engine, claim_analyzer, k=5,
+                 result_cache=None, near_duplicates=None):
+    """
+    Run the full analysis pipeline for a single claim
+
+    Args:
+        brand_name: Name of the brand
+        tagline: Marketing tagline
+        claim: The raw claim text
+        rag_engine: RAGEngine used to retrieve evidence
+        claim_analyzer: ClaimAnalyzer used to assign the verdict
+        k: Number of evidence items to retrieve
+        result_cache: Optional ResultCache consulted before running the pipeline
+        near_duplicates: Optional NearDuplicateIndex; the verdict of an earlier
+            analysis of a near-identical claim with the same tagline and
+            evidence corpus version is reused instead of running retrieval
+
+    Returns:
+        Dict with the inputs, domain, corpus version, verdict, score, explanation and
+        evidence, plus 'near_duplicate_of' if an earlier analysis was reused
+    """
+    # Preprocess the inputs
+    with metrics.stage_seconds.time('preprocessing'):
+        processed_claim = preprocess_text(claim)
+
+    # Serve repeated claims from the cache
+    if result_cache is not None:
+        cache_key = make_key(brand_name, tagline, processed_claim, rag_engine.version)
+        cached = result_cache.get(cache_key, rag_engine.version)
+        if cached is not None:
+            metrics.analyses_total.inc('cache')
+            return dict(cached, brand_name=brand_name, tagline=tagline, claim=claim)
+
+    # Reuse the analysis of a paraphrase of this claim
+    if near_duplicates is not None:
+        with metrics.stage_seconds.time('near_duplicate'):
+            duplicate = near_duplicates.find(brand_name, tagline, claim, rag_engine.version)
+        if duplicate is not None:
+            metrics.analyses_total.inc('near_duplicate')
+            return dict(duplicate, brand_name=brand_name, tagline=tagline, claim=claim)
+
+    # Classify the claim so retrieval can search that domain's evidence first
+    domain = claim_analyzer.determine_domain(brand_name, tagline, processed_claim)
+
+    # Get relevant evidence using RAG
+    with metrics.stage_seconds.time('retrieval'):
+        evidence = rag_engine.retrieve_evidence(
+            brand_name, tagline, processed_claim, k=k, domain=domain
+        )
+
+    # Analyze the claim against evidence
+    verdict, score, explanation = claim_analyzer.analyze_claim(
+        brand_name,
+        tagline,
+        processed_claim,
+        evidence,
+        domain=domain
+    )
+
+    # Cached index features are only meaningful inside this process
+    evidence = [
+        {key: value for key, value in item.items() if key != 'features'}
+        for item in evidence
+    ]
+
+    analysis_results = {
+        'brand_name': brand_name,
+        'tagline': tagline,
+        'claim': claim,
+        'domain': domain,
+        'corpus_version': rag_engine.version,
+        'verdict': verdict,
+        'score': score,
+        'explanation': explanation,
+        'evidence': evidence
+    }
+
+    if result_cache is not None and verdict != "Error":
+        result_cache.set(cache_key, rag_engine.version, analysis_results)
+
+    metrics.analyses_total.inc('pipeline')
+
+    return analysis_results
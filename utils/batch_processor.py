@@ -0,0 +1,349 @@
+"""
+Batch claim analysis.
+
+Claims are read from JSONL or CSV, split into chunks and analyzed in a
+process pool. Every worker process opens its own RAGEngine/ClaimAnalyzer
+once (from the memory-mapped index snapshot) and reuses it for all chunks.
+
+Command line usage:
+    python -m utils.batch_processor claims.jsonl -o results.jsonl --workers 4
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from utils.analysis_pipeline import run_analysis
+from utils.claim_analyzer import ClaimAnalyzer
+from utils.domain_classifier import DomainClassifier, DEFAULT_KEYWORDS_PATH
+from utils.index_snapshot import load_engine, DEFAULT_SNAPSHOT_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 32
+DEFAULT_EVIDENCE_PATH = 'data/evidence_database.json'
+DEFAULT_STANDARDS_PATH = 'data/regulatory_standards.json'
+REQUIRED_FIELDS = ('brand_name', 'tagline', 'claim')
+
+# Workers are started from a clean server process rather than forked from the
+# caller, whose other threads (e.g. in the web app) may hold locks
+MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+
+class InvalidInput(ValueError):
+    """An input line that could not be parsed into a record"""
+
+
+# Per-process analysis components, created by _init_worker
+_rag_engine = None
+_claim_analyzer = None
+
+
+def _init_worker(evidence_path, snapshot_path, standards_path, keywords_path=DEFAULT_KEYWORDS_PATH,
+                 engine_options=None):
+    """Process pool initializer that loads one engine/analyzer per worker"""
+    global _rag_engine, _claim_analyzer
+
+    engine = load_engine(evidence_path, snapshot_path)
+    for name, value in (engine_options or {}).items():
+        setattr(engine, name, value)
+    engine.warm_up()
+    _rag_engine = engine
+    with open(standards_path, 'r', encoding='utf-8') as f:
+        _claim_analyzer = ClaimAnalyzer(json.load(f), DomainClassifier.from_file(keywords_path))
+
+
+def analyze_record(record, rag_engine, claim_analyzer):
+    """
+    Analyze one input record
+
+    Args:
+        record: Dict with brand_name, tagline and claim (and an optional id),
+            or an InvalidInput from read_records
+        rag_engine: RAGEngine used to retrieve evidence
+        claim_analyzer: ClaimAnalyzer used to assign the verdict
+
+    Returns:
+        Result dict; contains an 'error' key if the record is invalid
+    """
+    if isinstance(record, InvalidInput):
+        return {'error': str(record)}
+    if not isinstance(record, dict):
+        return {'error': 'Expected an object with brand_name, tagline and claim'}
+
+    missing = [field for field in REQUIRED_FIELDS if not record.get(field)]
+    not_strings = [field for field in REQUIRED_FIELDS
+                   if field not in missing and not isinstance(record[field], str)]
+    if missing:
+        result = {'error': f"Missing fields: {', '.join(missing)}"}
+    elif not_strings:
+        result = {'error': f"Fields must be strings: {', '.join(not_strings)}"}
+    else:
+        try:
+            result = run_analysis(
+                record['brand_name'],
+                record['tagline'],
+                record['claim'],
+                rag_engine,
+                claim_analyzer
+            )
+        except Exception as e:
+            logger.error(f"Error analyzing batch record: {e}")
+            result = {'error': str(e)}
+
+    if 'id' in record:
+        result['id'] = record['id']
+    return result
+
+
+def _analyze_chunk(records):
+    """Analyze a chunk of records inside a worker process"""
+    return [analyze_record(record, _rag_engine, _claim_analyzer) for record in records]
+
+
+def read_records(stream, fmt='jsonl'):
+    """
+    Parse input records from a text stream
+
+    Args:
+        stream: Iterable of text lines
+        fmt: 'jsonl' or 'csv'
+
+    Yields:
+        Record dicts, or an InvalidInput for every line that is not valid JSON
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield InvalidInput(f"Invalid JSON on line {line_number}: {e}")
+
+
+def _chunks(records, chunk_size):
+    """Group an iterable of records into lists of at most chunk_size"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BatchSummary:
+    """Counts and throughput for one batch run"""
+
+    def __init__(self, workers, chunk_size):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.total = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def record(self, result):
+        self.total += 1
+        if 'error' in result:
+            self.errors += 1
+        self.elapsed = time.perf_counter() - self.started
+
+    def to_dict(self):
+        claims_per_sec = self.total / self.elapsed if self.elapsed > 0 else 0.0
+        return {
+            'claims': self.total,
+            'errors': self.errors,
+            'elapsed_sec': round(self.elapsed, 3),
+            'workers': self.workers,
+            'cpu_count': os.cpu_count(),
+            'chunk_size': self.chunk_size,
+            'claims_per_sec': round(claims_per_sec, 2),
+            'claims_per_sec_per_worker': round(claims_per_sec / self.workers, 2),
+        }
+
+
+def create_executor(workers=None, evidence_path=DEFAULT_EVIDENCE_PATH,
+                    snapshot_path=DEFAULT_SNAPSHOT_PATH,
+                    standards_path=DEFAULT_STANDARDS_PATH,
+                    keywords_path=DEFAULT_KEYWORDS_PATH, engine_options=None):
+    """
+    Create a process pool whose workers each hold an engine and analyzer
+
+    Args:
+        workers: Number of worker processes (default: CPU count)
+        evidence_path: Evidence file the engines are built from
+        snapshot_path: Index snapshot shared with other processes
+        standards_path: Regulatory standards JSON
+        keywords_path: Domain keywords JSON for the claim analyzer
+        engine_options: Dict of RAGEngine attributes to set, e.g. pruning or hybrid
+
+    Returns:
+        ProcessPoolExecutor
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=MP_CONTEXT,
+        initializer=_init_worker,
+        initargs=(evidence_path, snapshot_path, standards_path, keywords_path, engine_options),
+    )
+
+
+def run_batch(records, executor, workers, chunk_size=DEFAULT_CHUNK_SIZE, summary=None):
+    """
+    Analyze records in parallel, yielding results in input order
+
+    At most two chunks per worker are in flight at once, so arbitrarily
+    large inputs are streamed with bounded memory.
+
+    Args:
+        records: Iterable of record dicts
+        executor: Executor created by create_executor
+        workers: Number of worker processes in the executor
+        chunk_size: Number of records sent to a worker per task
+        summary: Optional BatchSummary updated as results are produced
+
+    Yields:
+        Result dicts
+    """
+    max_pending = 2 * workers
+    pending = deque()
+
+    def drain():
+        for result in pending.popleft().result():
+            if summary is not None:
+                summary.record(result)
+            yield result
+
+    for chunk in _chunks(records, chunk_size):
+        pending.append(executor.submit(_analyze_chunk, chunk))
+        if len(pending) >= max_pending:
+            yield from drain()
+
+    while pending:
+        yield from drain()
+
+
+class _SharedPool:
+    """Executor of the web API and the batches currently using it"""
+
+    __slots__ = ('executor', 'version', 'users')
+
+    def __init__(self, executor, version):
+        self.executor = executor
+        self.version = version
+        self.users = 0
+
+
+# Shared pool used by the web API
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@contextmanager
+def shared_executor(workers, version=None, evidence_path=DEFAULT_EVIDENCE_PATH,
+                    keywords_path=DEFAULT_KEYWORDS_PATH, engine_options=None):
+    """
+    Use the process-wide executor, creating it on first use
+
+    The web app passes its own evidence path and engine settings, so batch
+    results match /analyze and the workers open the same snapshot. When
+    version (the live index version) changes, e.g. after a hot reload, a new
+    pool is started for later batches; batches still running on the old
+    pool finish there, and it is shut down after the last one.
+
+    Args:
+        workers: Number of worker processes
+        version: Version of the index the workers must serve
+        evidence_path: Evidence file the engines are built from
+        keywords_path: Domain keywords JSON for the claim analyzer
+        engine_options: Dict of RAGEngine attributes to set
+
+    Yields:
+        ProcessPoolExecutor
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None or _pool.version != version:
+            if _pool is not None:
+                logger.info("Index version changed; restarting the batch workers")
+                if _pool.users == 0:
+                    _pool.executor.shutdown(wait=False)
+            _pool = _SharedPool(
+                create_executor(
+                    workers,
+                    evidence_path=evidence_path,
+                    snapshot_path=os.environ.get("EVIDENCE_INDEX_PATH", DEFAULT_SNAPSHOT_PATH),
+                    keywords_path=keywords_path,
+                    engine_options=engine_options,
+                ),
+                version,
+            )
+        pool = _pool
+        pool.users += 1
+
+    try:
+        yield pool.executor
+    finally:
+        with _pool_lock:
+            pool.users -= 1
+            retired = pool is not _pool and pool.users == 0
+        if retired:
+            pool.executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze marketing claims in bulk")
+    parser.add_argument('input', help="JSONL or CSV file with brand_name, tagline, claim ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file (default: stdout)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="Input format (default: by extension)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Records per task")
+    parser.add_argument('--evidence', default=DEFAULT_EVIDENCE_PATH, help="Evidence database JSON")
+    parser.add_argument('--snapshot', default=DEFAULT_SNAPSHOT_PATH, help="Index snapshot path")
+    parser.add_argument('--standards', default=DEFAULT_STANDARDS_PATH, help="Regulatory standards JSON")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.input.endswith('.csv') else 'jsonl')
+    # Build the snapshot once up front so workers only have to map it
+    load_engine(args.evidence, args.snapshot)
+
+    infile = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8', newline='')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    summary = BatchSummary(args.workers, args.chunk_size)
+
+    try:
+        with create_executor(args.workers, args.evidence, args.snapshot, args.standards) as executor:
+            for result in run_batch(read_records(infile, fmt), executor, args.workers,
+                                    args.chunk_size, summary):
+                outfile.write(json.dumps(result, ensure_ascii=False) + '\n')
+        outfile.write(json.dumps({'summary': summary.to_dict()}) + '\n')
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    print(json.dumps(summary.to_dict()), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,174 @@
+"""
+Brand catalog with change detection and prefix autocomplete.
+
+The catalog JSON is parsed once and re-read only when the file's
+modification time or size changes. Every load also builds a
+SuggestionIndex: a sorted array of normalized keys searched with bisect,
+so completing a prefix costs two binary searches plus ranking the matches.
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = 'data/indian_brands.json'
+DEFAULT_SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 50
+
+# Suggestion kinds in ranking order
+KINDS = ('brand', 'tagline', 'claim')
+
+# One loaded version of the catalog:
+#   data: parsed JSON
+#   etag: content hash of the file
+#   suggestions: SuggestionIndex built from data
+CatalogVersion = namedtuple('CatalogVersion', ['data', 'etag', 'suggestions'])
+
+
+def _normalize(text):
+    """Lowercase and collapse whitespace"""
+    return ' '.join(text.lower().split())
+
+
+class SuggestionIndex:
+    """
+    Prefix completion over brand names, taglines and common claims
+
+    Every entry is indexed under its full text and under each later word,
+    so "butter" completes "Utterly Butterly Delicious". Matches are ranked
+    by kind (brands first), then by whether the prefix matched the start of
+    the text, then by length and alphabetically.
+    """
+
+    def __init__(self, catalog):
+        """
+        Args:
+            catalog: Parsed brand catalog (dict with a 'categories' list)
+        """
+        entries = []
+        seen = set()
+        for category in catalog.get('categories', []):
+            for brand in category.get('brands', []):
+                name = brand.get('name', '')
+                items = [('brand', name)]
+                items += [('tagline', tagline) for tagline in brand.get('taglines', [])]
+                items += [('claim', claim) for claim in brand.get('common_claims', [])]
+                for kind, text in items:
+                    if not text or (kind, text, name) in seen:
+                        continue
+                    seen.add((kind, text, name))
+                    entries.append((kind, text, name, category.get('name')))
+
+        keys = []
+        for entry_id, (kind, text, _, _) in enumerate(entries):
+            words = _normalize(text).split()
+            for position in range(len(words)):
+                # (key, rank, entry id); rank orders matches within one prefix range
+                rank = (KINDS.index(kind), position > 0, len(text), text.lower())
+                keys.append((' '.join(words[position:]), rank, entry_id))
+        keys.sort()
+
+        self.entries = entries
+        self._keys = [key for key, _, _ in keys]
+        self._ranks = [(rank, entry_id) for _, rank, entry_id in keys]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def suggest(self, prefix, limit=DEFAULT_SUGGESTION_LIMIT, kind=None):
+        """
+        Return ranked completions for a prefix
+
+        Args:
+            prefix: Text typed so far
+            limit: Maximum number of suggestions
+            kind: Optional 'brand', 'tagline' or 'claim' to restrict results
+
+        Returns:
+            List of dicts with text, kind, brand and category
+        """
+        prefix = _normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + '\uffff', start)
+        kind_rank = KINDS.index(kind) if kind in KINDS else None
+        matches = (
+            ranked for ranked in self._ranks[start:end]
+            if kind_rank is None or ranked[0][0] == kind_rank
+        )
+
+        suggestions = []
+        seen = set()
+        # An entry can match under several of its words; keep its best rank
+        for _, entry_id in heapq.nsmallest(limit * 4, matches):
+            if entry_id in seen:
+                continue
+            seen.add(entry_id)
+            kind_name, text, brand, category = self.entries[entry_id]
+            suggestions.append({
+                'text': text,
+                'kind': kind_name,
+                'brand': brand,
+                'category': category,
+            })
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+
+class BrandCatalog:
+    """Brand catalog that is reloaded only when its file changes"""
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        """
+        Args:
+            path: Path to the brand catalog JSON
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._current = CatalogVersion({}, None, SuggestionIndex({}))
+
+    def current(self):
+        """
+        Return the current catalog, reloading it if the file changed
+
+        Returns:
+            CatalogVersion whose data, etag and suggestions always belong together
+        """
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            logger.error(f"Error loading {self.path}: {e}")
+            return self._current
+        if signature == self._signature:
+            return self._current
+
+        with self._lock:
+            if signature != self._signature:
+                self._load(signature)
+        return self._current
+
+    def _load(self, signature):
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            data = json.loads(raw)
+        except (OSError, ValueError) as e:
+            # Keep serving the last good version until the file changes again
+            logger.error(f"Error loading {self.path}: {e}")
+            self._signature = signature
+            return
+        suggestions = SuggestionIndex(data)
+        self._current = CatalogVersion(data, hashlib.sha256(raw).hexdigest()[:32], suggestions)
+        self._signature = signature
+        logger.info(f"Loaded brand catalog with {len(suggestions)} entries")
@@ -1,24 +1,38 @@
 import logging
 import re
 import random
+import numpy as np
+from utils import metrics
+from utils.domain_classifier import DomainClassifier
 from utils.nlp_processor import preprocess_text, tokenize
+from utils.positional_index import claim_phrases
 
 logger = logging.getLogger(__name__)
 
+# Words that flip the meaning of a statement
+NEGATION_WORDS = {"not", "no", "never", "cannot", "doesn't", "isn't", "don't", "won't"}
+
+# With token positions, evidence negates a claim only if a negation word is
+# at most this many tokens away from one of the claim's phrases
+NEGATION_WINDOW = 8
+
 class ClaimAnalyzer:
     """Analyzes marketing claims against evidence and assigns a verdict"""
     
-    def __init__(self, regulatory_standards):
+    def __init__(self, regulatory_standards, domain_classifier=None):
         """
         Initialize the claim analyzer
         
         Args:
             regulatory_standards: Dict of regulatory standards by domain/industry
+            domain_classifier: DomainClassifier to use; loaded from
+                data/domain_keywords.json if not given
         """
         self.regulatory_standards = regulatory_standards
+        self.domain_classifier = domain_classifier or DomainClassifier.from_file()
         logger.info("Initialized simplified ClaimAnalyzer")
     
-    def analyze_claim(self, brand_name, tagline, claim, evidences):
+    def analyze_claim(self, brand_name, tagline, claim, evidences, domain=None):
         """
         Analyze a claim against retrieved evidences
         
@@ -27,6 +41,7 @@ class ClaimAnalyzer:
             tagline: Marketing tagline
             claim: The preprocessed claim
             evidences: List of relevant evidence items
+            domain: Domain of the claim if already known (see determine_domain)
             
         Returns:
             verdict, score, explanation
@@ -36,35 +51,15 @@ class ClaimAnalyzer:
         
         try:
             # Determine the domain/industry of the claim
-            domain = self._determine_domain(brand_name, tagline, claim)
+            if domain is None:
+                domain = self.determine_domain(brand_name, tagline, claim)
             
             # Get applicable regulatory standards
             standards = self._get_applicable_standards(domain)
             
             # Calculate simple entailment scores for each evidence item
-            entailment_results = []
-            
-            for evidence in evidences:
-                premise = evidence['text']
-                hypothesis = claim
-                
-                # Skip if evidence text is too short
-                if len(premise.split()) < 5:
-                    continue
-                    
-                # Calculate simplified entailment scores using keyword matching
-                result = self._check_entailment(premise, hypothesis)
-                
-                # Adjust the score based on evidence relevance 
-                adjusted_score = result['score'] * evidence['relevance_score']
-                
-                # Add to results
-                entailment_results.append({
-                    'evidence': evidence,
-                    'entailment': result['label'],
-                    'score': adjusted_score,
-                    'original_score': result['score']
-                })
+            with metrics.stage_seconds.time('entailment'):
+                entailment_results = self._score_evidences(claim, evidences)
             
             # If we have no results after filtering
             if not entailment_results:
@@ -75,13 +70,62 @@ class ClaimAnalyzer:
                 claim, entailment_results, standards
             )
             
-            logger.info(f"Claim analysis complete: {verdict} ({score:.2f})")
+            logger.debug("Claim analysis complete: %s (%.2f)", verdict, score)
             return verdict, score, explanation
         
         except Exception as e:
             logger.error(f"Error analyzing claim: {e}")
             return "Error", 0.0, f"An error occurred during analysis: {str(e)}"
     
+    def _score_evidences(self, claim, evidences):
+        """
+        Calculate entailment results for every usable evidence item
+        
+        Args:
+            claim: The preprocessed claim
+            evidences: List of relevant evidence items
+            
+        Returns:
+            List of dicts with the evidence, entailment label and adjusted score
+        """
+        entailment_results = []
+        
+        # Skip evidence whose text is too short
+        candidates = []
+        for evidence in evidences:
+            features = evidence.get('features')
+            word_count = features.word_count if features is not None else len(evidence['text'].split())
+            if word_count >= 5:
+                candidates.append(evidence)
+        
+        # Score evidence with cached index features in one vectorized pass
+        claim_tokens = tokenize(preprocess_text(claim.lower()))
+        hypothesis_tokens = set(claim_tokens)
+        batch_results = iter(self._check_entailment_batch(
+            [e['features'] for e in candidates if e.get('features') is not None],
+            hypothesis_tokens, claim_tokens
+        ))
+        
+        for evidence in candidates:
+            # Calculate simplified entailment scores using keyword matching
+            if evidence.get('features') is not None:
+                result = next(batch_results)
+            else:
+                result = self._check_entailment(evidence['text'], claim)
+            
+            # Adjust the score based on evidence relevance 
+            adjusted_score = result['score'] * evidence['relevance_score']
+            
+            # Add to results
+            entailment_results.append({
+                'evidence': evidence,
+                'entailment': result['label'],
+                'score': adjusted_score,
+                'original_score': result['score']
+            })
+        
+        return entailment_results
+    
     def _check_entailment(self, premise, hypothesis):
         """
         Check if hypothesis is entailed by, contradicts, or is neutral to premise
@@ -111,13 +155,117 @@ class ClaimAnalyzer:
             similarity = len(common_words) / len(premise_tokens.union(hypothesis_tokens))
         
         # Check for negation words
-        negation_words = {"not", "no", "never", "cannot", "doesn't", "isn't", "don't", "won't"}
-        premise_has_negation = any(neg in premise_tokens for neg in negation_words)
-        hypothesis_has_negation = any(neg in hypothesis_tokens for neg in negation_words)
+        premise_has_negation = any(neg in premise_tokens for neg in NEGATION_WORDS)
+        hypothesis_has_negation = any(neg in hypothesis_tokens for neg in NEGATION_WORDS)
         
         # If one has negation and the other doesn't, they likely contradict
         contradiction_signal = premise_has_negation != hypothesis_has_negation
         
+        return self._label_entailment(similarity, len(common_words), contradiction_signal)
+    
+    def _check_entailment_batch(self, features_list, hypothesis_tokens, claim_tokens=None):
+        """
+        Vectorized _check_entailment over many evidence documents at once
+        
+        Uses the cached token ids of each document, so the cost does not depend
+        on evidence text length. Produces exactly the same labels and scores as
+        _check_entailment on the raw texts, unless the features carry token
+        positions: then a document only counts as negated if a negation word
+        occurs within NEGATION_WINDOW tokens of a claim phrase, rather than
+        anywhere in it.
+        
+        Args:
+            features_list: List of DocumentFeatures, one per evidence item
+            hypothesis_tokens: Set of claim tokens
+            claim_tokens: Claim tokens in order, for phrase matching
+            
+        Returns:
+            List of dicts with entailment label and score, parallel to features_list
+        """
+        results = [None] * len(features_list)
+        hypothesis_has_negation = any(neg in hypothesis_tokens for neg in NEGATION_WORDS)
+        
+        # Documents from the same index share a vocabulary and are scored together
+        groups = {}
+        for position, features in enumerate(features_list):
+            groups.setdefault(id(features.index), []).append(position)
+        
+        for positions in groups.values():
+            index = features_list[positions[0]].index
+            token_arrays = [features_list[p].token_ids for p in positions]
+            doc_sizes = np.array([len(t) for t in token_arrays], dtype=np.int64)
+            doc_of_token = np.repeat(np.arange(len(positions)), doc_sizes)
+            all_tokens = np.concatenate(token_arrays) if token_arrays else np.zeros(0, dtype=np.int32)
+            
+            # Per-document counts of claim words and negation words
+            common = np.bincount(
+                doc_of_token, weights=np.isin(all_tokens, index.encode(hypothesis_tokens)),
+                minlength=len(positions)
+            ).astype(np.int64)
+            positional = features_list[positions[0]].positional
+            if positional is not None and claim_tokens:
+                premise_has_negation = self._negated_phrases(
+                    positional, [features_list[p].doc_idx for p in positions], claim_tokens
+                )
+            else:
+                premise_has_negation = np.bincount(
+                    doc_of_token, weights=np.isin(all_tokens, index.encode(NEGATION_WORDS)),
+                    minlength=len(positions)
+                ) > 0
+            
+            # Jaccard similarity (intersection over union)
+            union = doc_sizes + len(hypothesis_tokens) - common
+            valid = (doc_sizes > 0) & bool(hypothesis_tokens)
+            similarity = np.divide(common, union, out=np.zeros(len(positions)), where=valid)
+            
+            # If one has negation and the other doesn't, they likely contradict
+            contradiction_signal = premise_has_negation != hypothesis_has_negation
+            
+            # Same thresholds as _label_entailment
+            entails = (similarity > 0.4) & ~contradiction_signal
+            contradicts = ~entails & (similarity > 0.3) & contradiction_signal
+            scores = np.where(entails | contradicts, 0.5 + similarity / 2, 0.5 - similarity / 2)
+            
+            for i, position in enumerate(positions):
+                label = "entailment" if entails[i] else "contradiction" if contradicts[i] else "neutral"
+                results[position] = {
+                    "label": label,
+                    "score": float(scores[i]),
+                    "details": {
+                        "similarity": float(similarity[i]),
+                        "common_words": int(common[i]),
+                        "contradiction_signal": bool(contradiction_signal[i])
+                    }
+                }
+        
+        return results
+    
+    def _negated_phrases(self, positional, doc_ids, claim_tokens):
+        """
+        Check which documents mention a claim phrase near a negation word
+        
+        Args:
+            positional: PositionalIndex the documents belong to
+            doc_ids: Document ids in the index
+            claim_tokens: Claim tokens in order
+            
+        Returns:
+            Boolean array parallel to doc_ids
+        """
+        vocabulary = positional.index.vocabulary
+        phrases = [
+            tuple(vocabulary.get(token) for token in phrase)
+            for phrase in claim_phrases(claim_tokens)
+        ]
+        doc_ids = np.array(doc_ids, dtype=np.int64)
+        unique_ids = np.unique(doc_ids)
+        negated = positional.near(
+            phrases, positional.index.encode(NEGATION_WORDS).tolist(), NEGATION_WINDOW, unique_ids
+        )
+        return negated[np.searchsorted(unique_ids, doc_ids)]
+    
+    def _label_entailment(self, similarity, common_words, contradiction_signal):
+        """Assign the entailment label and score from overlap statistics"""
         # High overlap and same negation status - likely entailment
         if similarity > 0.4 and not contradiction_signal:
             label = "entailment"
@@ -136,41 +284,20 @@ class ClaimAnalyzer:
             "score": score,
             "details": {
                 "similarity": similarity,
-                "common_words": len(common_words),
+                "common_words": common_words,
                 "contradiction_signal": contradiction_signal
             }
         }
     
-    def _determine_domain(self, brand_name, tagline, claim):
+    def determine_domain(self, brand_name, tagline, claim):
         """
         Determine the domain/industry of the claim
-        This is a simplified implementation - would be more robust in production
+        using the keyword classifier built at construction time
         """
-        # Common Indian industry keywords
-        domain_keywords = {
-            "food": ["food", "drink", "beverage", "taste", "delicious", "nutrition", "healthy", "organic", "natural"],
-            "beauty": ["beauty", "skin", "hair", "cosmetic", "makeup", "fairness", "glow", "radiant"],
-            "health": ["health", "medicine", "ayurvedic", "ayurveda", "herbal", "supplement", "vitamin", "cure", "treatment"],
-            "tech": ["technology", "app", "digital", "smartphone", "gadget", "electronics", "device"],
-            "finance": ["bank", "finance", "insurance", "investment", "mutual fund", "loan", "credit", "saving"],
-            "automotive": ["car", "bike", "vehicle", "mileage", "performance", "engine", "drive"]
-        }
-        
         # Combine all text
-        all_text = f"{brand_name} {tagline} {claim}".lower()
+        all_text = f"{brand_name} {tagline} {claim}"
         
-        # Count domain keyword matches
-        domain_scores = {}
-        for domain, keywords in domain_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in all_text)
-            domain_scores[domain] = score
-        
-        # Get domain with highest score
-        if sum(domain_scores.values()) > 0:
-            return max(domain_scores.items(), key=lambda x: x[1])[0]
-        
-        # Default domain if no match
-        return "general"
+        return self.domain_classifier.classify(all_text)
     
     def _get_applicable_standards(self, domain):
         """Get regulatory standards applicable to the domain"""
@@ -190,6 +317,19 @@ class ClaimAnalyzer:
         Returns:
             verdict, score, explanation
         """
+        with metrics.stage_seconds.time('verdict'):
+            verdict, final_score = self._score_verdict(entailment_results)
+        
+        # Generate explanation
+        with metrics.stage_seconds.time('explanation'):
+            explanation = self._generate_explanation(
+                claim, entailment_results, verdict, standards
+            )
+        
+        return verdict, final_score, explanation
+    
+    def _score_verdict(self, entailment_results):
+        """Compute the verdict label and final score from entailment results"""
         # Count evidence supporting, contradicting, or neutral to the claim
         support_count = sum(1 for r in entailment_results if r['entailment'] == 'entailment')
         contradict_count = sum(1 for r in entailment_results if r['entailment'] == 'contradiction')
@@ -217,12 +357,7 @@ class ClaimAnalyzer:
         else:
             verdict = "❌ Misleading"
         
-        # Generate explanation
-        explanation = self._generate_explanation(
-            claim, entailment_results, verdict, standards
-        )
-        
-        return verdict, final_score, explanation
+        return verdict, final_score
     
     def _generate_explanation(self, claim, entailment_results, verdict, standards):
         """Generate a human-readable explanation for the verdict"""
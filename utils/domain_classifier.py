@@ -0,0 +1,112 @@
+import json
+import logging
+import string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEYWORDS_PATH = 'data/domain_keywords.json'
+
+# Punctuation becomes whitespace, so splitting yields whole words only
+PUNCTUATION_TABLE = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+
+
+def _split_words(text):
+    """Lowercase text and split it into words"""
+    return text.lower().translate(PUNCTUATION_TABLE).split()
+
+
+class DomainClassifier:
+    """
+    Classifies text into an industry domain using keyword lists
+
+    Keywords are compiled once into a lookup table keyed by whole words (and
+    word n-grams for multi-word keywords such as "mutual fund"). Text is split
+    into words with one cached translation table and all domains are scored from a
+    single set intersection, so keywords no longer match inside other words
+    ("car" in "scarce"). A plural ending in "s" counts as the keyword.
+
+    As before, a domain's score is the number of its distinct keywords that
+    appear in the text.
+    """
+
+    def __init__(self, domain_keywords):
+        """
+        Build the classifier
+
+        Args:
+            domain_keywords: Dict mapping domain -> list of keywords
+        """
+        self.domains = list(domain_keywords)
+        # Word form -> set of (domain, keyword) pairs it counts towards
+        self.lookup = {}
+        # First word of a multi-word keyword -> its longest phrase length
+        self.phrase_starts = {}
+
+        for domain, keywords in domain_keywords.items():
+            for keyword in keywords:
+                words = _split_words(keyword)
+                if not words:
+                    continue
+                phrase = ' '.join(words)
+                for form in (phrase, phrase + 's'):
+                    self.lookup.setdefault(form, set()).add((domain, phrase))
+                if len(words) > 1:
+                    length = self.phrase_starts.get(words[0], 0)
+                    self.phrase_starts[words[0]] = max(length, len(words))
+
+        self.single_words = frozenset(form for form in self.lookup if ' ' not in form)
+        logger.info(f"Compiled domain classifier with {len(self.lookup)} keyword forms")
+
+    @classmethod
+    def from_file(cls, file_path=DEFAULT_KEYWORDS_PATH):
+        """Build a classifier from a JSON file of domain -> keywords"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def hit_counts(self, text):
+        """
+        Count distinct keyword hits per domain
+
+        Args:
+            text: Text to classify
+
+        Returns:
+            Dict mapping every domain to its number of matched keywords
+        """
+        words = _split_words(text)
+        forms = set(self.single_words.intersection(words))
+
+        # Multi-word keywords are only checked where their first word occurs
+        if self.phrase_starts and not self.phrase_starts.keys().isdisjoint(words):
+            for i, word in enumerate(words):
+                for n in range(2, self.phrase_starts.get(word, 0) + 1):
+                    phrase = ' '.join(words[i:i + n])
+                    if phrase in self.lookup:
+                        forms.add(phrase)
+
+        matched = set()
+        for form in forms:
+            matched |= self.lookup[form]
+
+        counts = dict.fromkeys(self.domains, 0)
+        for domain, _ in matched:
+            counts[domain] += 1
+        return counts
+
+    def classify(self, text, default="general"):
+        """
+        Return the domain with the most keyword hits
+
+        Ties go to the domain listed first in the keyword file.
+
+        Args:
+            text: Text to classify
+            default: Domain returned when no keyword matches
+
+        Returns:
+            Domain name
+        """
+        counts = self.hit_counts(text)
+        if sum(counts.values()) > 0:
+            return max(counts.items(), key=lambda x: x[1])[0]
+        return default
@@ -0,0 +1,487 @@
+"""
+Streaming ingestion of evidence corpora.
+
+Records are read one at a time from JSONL, CSV or JSON array files (an
+array is decoded element by element from a bounded buffer), validated and
+normalized to the evidence schema, and deduplicated by a hash of their
+normalized content and of their id. The index is built in chunks: each
+chunk is tokenized, turned into compact posting arrays and packed document
+columns, and its token lists are dropped; the chunks are merged into one
+index at the end. Peak memory is therefore the final index plus one chunk,
+instead of several times the size of the source file. Deduplication keeps
+two 64-bit hashes per unique document (16 bytes), the only state that grows
+with the corpus while records stream through.
+"""
+import bisect
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import string
+import time
+from array import array
+from datetime import date, datetime
+
+import numpy as np
+
+from utils.evidence_store import EvidenceMetadata, StringColumn
+from utils.inverted_index import InvertedIndex, DEFAULT_K1, DEFAULT_B
+from utils.nlp_processor import default_tokenizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 20000
+
+# Log progress every this many records read
+PROGRESS_INTERVAL = 100000
+
+# Fields of a normalized evidence record
+SCHEMA = ('id', 'domain', 'content', 'source', 'url', 'publication_date')
+
+# Accepted publication date formats, normalized to ISO 8601 dates
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%dT%H:%M:%S', '%Y%m%d')
+
+# Hashes added to a HashSet before they are merged into its sorted array
+MIN_HASH_TAIL = 65536
+
+# Characters of a JSON array file read at a time
+JSON_READ_SIZE = 1 << 20
+
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Punctuation is ignored when fingerprinting contents
+_PUNCTUATION = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+
+
+class InvalidRecord(ValueError):
+    """A source record that cannot be turned into an evidence item"""
+
+
+def _iter_json_array(f, path):
+    """
+    Yield the elements of a JSON array from a text file without parsing it whole
+
+    Args:
+        f: Text file positioned at the start of the array
+        path: Path of the file, for error messages
+
+    Yields:
+        Decoded array elements
+
+    Raises:
+        ValueError: The file is not a JSON array or is not valid JSON
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = f.read(JSON_READ_SIZE)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def next_char():
+        # Skip whitespace and return the next character ('' at the end of the file)
+        nonlocal pos
+        while True:
+            pos = _JSON_WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or not read_more():
+                return buffer[pos:pos + 1]
+
+    if next_char() != '[':
+        raise ValueError(f"{path} must contain a JSON array of evidence items")
+    pos += 1
+    if next_char() == ']':
+        return
+
+    while True:
+        # A value that ends at the end of the buffer may be cut off (e.g. a number)
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    break
+            except ValueError as e:
+                if eof:
+                    raise ValueError(f"{path} is not valid JSON: {e}") from None
+            read_more()
+        yield value
+        pos = end
+
+        separator = next_char()
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"{path} is not valid JSON: expected ',' or ']' at offset {pos}")
+        pos += 1
+        next_char()
+
+
+def read_records(path):
+    """
+    Yield raw records from an evidence file, one at a time
+
+    The format follows the extension: .jsonl/.ndjson (one JSON object per
+    line), .csv (header row with the field names) or .json (an array,
+    decoded incrementally).
+
+    Args:
+        path: Path to the evidence file
+
+    Yields:
+        (position, record) tuples; position is the line or array index and
+        record is a dict, or an InvalidRecord for a line that could not be parsed
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, InvalidRecord(f"invalid JSON: {e}")
+    elif extension == '.csv':
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row_number, row in enumerate(csv.DictReader(f), 2):
+                yield row_number, row
+    elif extension == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from enumerate(_iter_json_array(f, path))
+    else:
+        raise ValueError(f"Unsupported evidence file format: {path}")
+
+
+def _clean(value):
+    """Return a stripped string, or None for missing and blank values"""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        if isinstance(value, (dict, list)):
+            raise InvalidRecord(f"unexpected {type(value).__name__} value")
+        value = str(value)
+    value = value.strip()
+    return value or None
+
+
+def _normalize_date(value):
+    """Return an ISO 8601 date for a supported date string, else None"""
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_record(record):
+    """
+    Validate a raw record and normalize it to the evidence schema
+
+    Strings are stripped and blank values become None, ids are strings,
+    domains are lowercase and publication dates ISO 8601 (None if they
+    cannot be parsed). Fields outside the schema are dropped.
+
+    Args:
+        record: Raw record dict
+
+    Returns:
+        Dict with exactly the SCHEMA fields
+
+    Raises:
+        InvalidRecord: The record is not an object or has no content
+    """
+    if not isinstance(record, dict):
+        raise InvalidRecord(f"expected an object, got {type(record).__name__}")
+    item = {field: _clean(record.get(field)) for field in SCHEMA}
+    if item['content'] is None:
+        raise InvalidRecord("missing content")
+    if item['domain'] is not None:
+        item['domain'] = item['domain'].lower()
+    item['publication_date'] = _normalize_date(item['publication_date'])
+    return item
+
+
+def content_fingerprint(text):
+    """
+    Return a 64-bit hash of text that ignores case, punctuation and spacing
+
+    Texts that differ only in those respects (near-exact duplicates, e.g. the
+    same article scraped twice) get the same fingerprint.
+    """
+    normalized = ' '.join(text.casefold().translate(_PUNCTUATION).split())
+    return int.from_bytes(hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class HashSet:
+    """
+    Set of 64-bit hashes stored in 8 bytes each
+
+    Hashes live in a sorted uint64 array, binary-searched through a
+    memoryview (much faster per lookup than a NumPy call), plus a small
+    Python set of recent additions that is merged into the array
+    when it reaches a quarter of the array's size (amortized O(log n) per
+    addition).
+    """
+
+    def __init__(self):
+        self._sorted = np.empty(0, dtype=np.uint64)
+        self._view = memoryview(self._sorted)
+        self._tail = set()
+
+    def __len__(self):
+        return len(self._sorted) + len(self._tail)
+
+    def __contains__(self, value):
+        if value in self._tail:
+            return True
+        view = self._view
+        position = bisect.bisect_left(view, value)
+        return position < len(view) and view[position] == value
+
+    def add(self, value):
+        self._tail.add(value)
+        if len(self._tail) >= max(MIN_HASH_TAIL, len(self._sorted) // 4):
+            tail = np.fromiter(self._tail, dtype=np.uint64, count=len(self._tail))
+            self._sorted = np.union1d(self._sorted, tail)
+            self._view = memoryview(self._sorted)
+            self._tail = set()
+
+
+def id_hash(item_id):
+    """Return a 64-bit hash of an evidence id"""
+    digest = hashlib.blake2b(str(item_id).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class IngestStats:
+    """Counters of one ingestion run"""
+
+    def __init__(self):
+        self.read = 0
+        self.invalid = 0
+        self.duplicate_content = 0
+        self.duplicate_ids = 0
+        self.indexed = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def seconds(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def docs_per_second(self):
+        return self.indexed / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'read': self.read,
+            'invalid': self.invalid,
+            'duplicate_content': self.duplicate_content,
+            'duplicate_ids': self.duplicate_ids,
+            'indexed': self.indexed,
+            'seconds': round(self.seconds, 3),
+            'docs_per_second': round(self.docs_per_second, 1),
+        }
+
+
+def iter_evidence(records, stats=None, dedupe=True):
+    """
+    Normalize and deduplicate a stream of raw records
+
+    Invalid records are logged and skipped. With dedupe, a record is also
+    skipped if its content fingerprint or its id was already seen; the
+    first occurrence wins. Seen fingerprints and ids are kept as 64-bit
+    hashes in HashSets, so memory grows by 16 bytes per unique document.
+
+    Args:
+        records: Iterable of (position, record) tuples, as from read_records
+        stats: Optional IngestStats to update
+        dedupe: Drop duplicate contents and ids
+
+    Yields:
+        Normalized evidence items
+    """
+    stats = stats if stats is not None else IngestStats()
+    fingerprints = HashSet()
+    ids = HashSet()
+    for position, record in records:
+        stats.read += 1
+        if stats.read % PROGRESS_INTERVAL == 0:
+            logger.info(f"Read {stats.read} records, indexed {stats.indexed} "
+                        f"({stats.docs_per_second:.0f} docs/s)")
+        try:
+            if isinstance(record, InvalidRecord):
+                raise record
+            item = normalize_record(record)
+        except InvalidRecord as e:
+            stats.invalid += 1
+            logger.debug(f"Skipping evidence record {position}: {e}")
+            continue
+
+        if dedupe:
+            fingerprint = content_fingerprint(item['content'])
+            if fingerprint in fingerprints:
+                stats.duplicate_content += 1
+                continue
+            item_id = id_hash(item['id']) if item['id'] is not None else None
+            if item_id is not None and item_id in ids:
+                stats.duplicate_ids += 1
+                continue
+            fingerprints.add(fingerprint)
+            if item_id is not None:
+                ids.add(item_id)
+        yield item
+
+
+class ChunkedIndexBuilder:
+    """
+    Builds an inverted index and document store in bounded-memory chunks
+
+    Each chunk's tokens are converted to compact posting arrays right away
+    (term frequencies come from one np.unique over (document, term) keys);
+    finish() merges the chunks with one sort.
+    """
+
+    def __init__(self, k1=DEFAULT_K1, b=DEFAULT_B):
+        """
+        Args:
+            k1: BM25 term-frequency saturation parameter
+            b: BM25 document length normalization parameter
+        """
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self.num_docs = 0
+        self._postings = []
+        self._doc_lengths = []
+        self._texts = []
+        self._metadata = []
+        self._word_counts = []
+
+    def add_chunk(self, items):
+        """
+        Tokenize and index a chunk of normalized evidence items
+
+        Args:
+            items: List of normalized evidence items
+        """
+        vocabulary = self.vocabulary
+        tokens = []
+        doc_lengths = array('I')
+        texts = []
+        metadata = []
+        word_counts = array('i')
+
+        for item in items:
+            text = item['content']
+            doc_tokens = default_tokenizer.analyze(text, cache=False).tokens
+            doc_lengths.append(len(doc_tokens))
+            tokens.extend(doc_tokens)
+            texts.append(text)
+            metadata.append({field: item[field] for field in SCHEMA if field != 'content'})
+            word_counts.append(len(text.split()))
+
+        setdefault = vocabulary.setdefault
+        term_ids = np.fromiter(
+            (setdefault(token, len(vocabulary)) for token in tokens),
+            dtype=np.int64, count=len(tokens),
+        )
+        del tokens
+        doc_lengths = np.frombuffer(doc_lengths, dtype=np.uint32)
+        doc_of_token = np.repeat(np.arange(len(items), dtype=np.int64), doc_lengths)
+        keys, term_freqs = np.unique((doc_of_token << 32) | term_ids, return_counts=True)
+
+        self._postings.append((
+            (keys & 0xFFFFFFFF).astype(np.uint32),
+            ((keys >> 32) + self.num_docs).astype(np.uint32),
+            term_freqs.astype(np.float32),
+        ))
+        self._doc_lengths.append(doc_lengths.astype(np.float32))
+        self._texts.append(StringColumn.from_strings(texts))
+        self._metadata.append(EvidenceMetadata.from_records(metadata))
+        self._word_counts.append(np.frombuffer(word_counts, dtype=np.int32))
+        self.num_docs += len(items)
+
+    def finish(self):
+        """
+        Merge the chunks
+
+        Returns:
+            (index, texts, metadata, word_counts) in document order
+        """
+        if not self._postings:
+            self.add_chunk([])
+        term_ids, doc_ids, term_freqs = (
+            np.concatenate(parts) for parts in zip(*self._postings)
+        )
+        self._postings = None
+        index = InvertedIndex.from_postings(
+            self.vocabulary, term_ids, doc_ids, term_freqs,
+            np.concatenate(self._doc_lengths), k1=self.k1, b=self.b,
+        )
+        return (
+            index,
+            StringColumn.concat_all(self._texts),
+            EvidenceMetadata.concat_all(self._metadata),
+            np.concatenate(self._word_counts),
+        )
+
+
+def ingest(source, chunk_size=DEFAULT_CHUNK_SIZE, k1=DEFAULT_K1, b=DEFAULT_B, dedupe=True):
+    """
+    Stream an evidence file (or records) into an index
+
+    Args:
+        source: Path to a .jsonl, .csv or .json evidence file, or an
+            iterable of raw evidence dicts
+        chunk_size: Documents tokenized and indexed per chunk
+        k1: BM25 term-frequency saturation parameter
+        b: BM25 document length normalization parameter
+        dedupe: Drop duplicate contents and ids
+
+    Returns:
+        ((index, texts, metadata, word_counts), IngestStats)
+    """
+    records = read_records(source) if isinstance(source, (str, os.PathLike)) else enumerate(source)
+    stats = IngestStats()
+    builder = ChunkedIndexBuilder(k1=k1, b=b)
+    chunk = []
+    for item in iter_evidence(records, stats, dedupe=dedupe):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            builder.add_chunk(chunk)
+            stats.indexed += len(chunk)
+            chunk = []
+    if chunk:
+        builder.add_chunk(chunk)
+        stats.indexed += len(chunk)
+
+    components = builder.finish()
+    stats.finished = time.perf_counter()
+    logger.info(f"Ingested {stats.indexed} of {stats.read} evidence records in "
+                f"{stats.seconds:.1f}s ({stats.docs_per_second:.0f} docs/s, "
+                f"{stats.invalid} invalid, "
+                f"{stats.duplicate_content + stats.duplicate_ids} duplicates)")
+    return components, stats
+
+
+def load_evidence(path, dedupe=True):
+    """Return the normalized evidence items of a file as a list"""
+    return list(iter_evidence(read_records(path), dedupe=dedupe))
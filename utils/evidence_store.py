@@ -0,0 +1,310 @@
+"""
+Compact in-memory storage for evidence texts and metadata.
+
+Texts live in one contiguous UTF-8 buffer with an offsets array instead of
+one Python string per document. Metadata is stored column by column: ids and
+URLs as string buffers, and fields with few distinct values (source, domain,
+publication date) as interned values plus a small integer code per document.
+Rows are decoded on access, so only the handful of documents a query returns
+ever exist as Python objects.
+"""
+import mmap
+import sys
+
+import numpy as np
+
+# Metadata fields of an evidence item, in the order rows are returned
+FIELDS = ('id', 'source', 'url', 'domain', 'publication_date')
+
+# Fields whose values repeat across documents and are stored as codes
+CATEGORICAL_FIELDS = ('source', 'domain', 'publication_date')
+
+
+def _code_dtype(num_values):
+    """Return the smallest unsigned dtype that can index num_values values"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if num_values <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+def is_mapped(buffer):
+    """Return whether an array or buffer points into a memory-mapped file"""
+    while buffer is not None:
+        if isinstance(buffer, mmap.mmap):
+            return True
+        if isinstance(buffer, memoryview):
+            buffer = buffer.obj
+        else:
+            buffer = getattr(buffer, 'base', None)
+    return False
+
+
+class StringColumn:
+    """
+    Read-only sequence of strings stored as one UTF-8 buffer plus offsets
+
+    The buffer may be bytes or a memoryview into a mapped snapshot. Items
+    that were None are tracked in an optional boolean mask, and an optional
+    decode function is applied to every item read (e.g. json.loads).
+    """
+
+    __slots__ = ('buffer', 'offsets', 'nulls', '_decode')
+
+    def __init__(self, buffer, offsets, nulls=None, decode=None):
+        """
+        Args:
+            buffer: bytes-like object holding the encoded strings back to back
+            offsets: int64 array of len(items) + 1 positions into buffer
+            nulls: Optional bool array marking items that are None
+            decode: Optional function applied to every decoded string
+        """
+        self.buffer = buffer
+        self.offsets = offsets
+        self.nulls = nulls
+        self._decode = decode
+
+    @classmethod
+    def from_strings(cls, strings):
+        """Pack an iterable of strings (or None) into a column"""
+        encoded = []
+        nulls = []
+        for s in strings:
+            nulls.append(s is None)
+            encoded.append(b'' if s is None else s.encode('utf-8'))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(b''.join(encoded), offsets, np.array(nulls, dtype=bool) if any(nulls) else None)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i):
+        """Return the undecoded bytes of item i"""
+        return bytes(self.buffer[self.offsets[i]:self.offsets[i + 1]])
+
+    def _value(self, i, raw):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        value = raw.decode('utf-8')
+        return self._decode(value) if self._decode else value
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._value(i, self.raw(i))
+
+    def __iter__(self):
+        offsets = self.offsets.tolist()
+        buffer = self.buffer
+        for i in range(len(offsets) - 1):
+            yield self._value(i, bytes(buffer[offsets[i]:offsets[i + 1]]))
+
+    def select(self, mask):
+        """Return a new column holding the items where mask is True"""
+        mask = np.asarray(mask, dtype=bool)
+        lengths = np.diff(self.offsets)[mask]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Copy every run of consecutive kept items as one slice of the old buffer
+        edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+        run_starts = self.offsets[np.flatnonzero(edges == 1)].tolist()
+        run_ends = self.offsets[np.flatnonzero(edges == -1)].tolist()
+        buffer = b''.join(self.buffer[start:end] for start, end in zip(run_starts, run_ends))
+        nulls = self.nulls[mask] if self.nulls is not None else None
+        return StringColumn(buffer, offsets, nulls, self._decode)
+
+    def concat(self, other):
+        """Return a new column with the items of other appended"""
+        return StringColumn.concat_all([self, other])
+
+    @classmethod
+    def concat_all(cls, columns):
+        """Return one column holding the items of all columns in order, copied once"""
+        columns = list(columns)
+        parts = [np.zeros(1, dtype=np.int64)]
+        end = 0
+        for column in columns:
+            parts.append(column.offsets[1:] - column.offsets[0] + end)
+            end += int(column.offsets[-1] - column.offsets[0])
+        nulls = None
+        if any(column.nulls is not None for column in columns):
+            nulls = np.concatenate([
+                column.nulls if column.nulls is not None else np.zeros(len(column), dtype=bool)
+                for column in columns
+            ])
+        buffer = b''.join(
+            column.buffer[column.offsets[0]:column.offsets[-1]] for column in columns
+        )
+        decode = columns[0]._decode if columns else None
+        return cls(buffer, np.concatenate(parts), nulls, decode)
+
+    @property
+    def nbytes(self):
+        nulls = self.nulls.nbytes if self.nulls is not None else 0
+        return len(self.buffer) + self.offsets.nbytes + nulls
+
+    @property
+    def mapped(self):
+        return is_mapped(self.buffer)
+
+
+class CategoryColumn:
+    """
+    Sequence of repeated values, each distinct value stored once
+
+    Every item is a small unsigned integer code into a list of interned
+    values, so a domain shared by 100k documents costs one string plus one
+    byte per document.
+    """
+
+    __slots__ = ('values', 'codes')
+
+    def __init__(self, values, codes):
+        """
+        Args:
+            values: List of distinct values
+            codes: Unsigned integer array indexing values, one per item
+        """
+        self.values = values
+        self.codes = codes
+
+    @classmethod
+    def from_values(cls, values):
+        """Encode an iterable of hashable values into a column"""
+        lookup = {}
+        codes = [lookup.setdefault(value, len(lookup)) for value in values]
+        distinct = [sys.intern(v) if isinstance(v, str) else v for v in lookup]
+        return cls(distinct, np.array(codes, dtype=_code_dtype(len(distinct))))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes.tolist())
+
+    def masks(self):
+        """Yield (value, bool mask of its items) for every value that occurs"""
+        counts = np.bincount(self.codes, minlength=len(self.values))
+        for code, value in enumerate(self.values):
+            if counts[code]:
+                yield value, self.codes == code
+
+    def select(self, mask):
+        """Return a new column holding the items where mask is True"""
+        return CategoryColumn(self.values, self.codes[np.asarray(mask, dtype=bool)])
+
+    def concat(self, other):
+        """Return a new column with the items of other appended"""
+        return CategoryColumn.concat_all([self, other])
+
+    @classmethod
+    def concat_all(cls, columns):
+        """Return one column holding the items of all columns in order"""
+        lookup = {}
+        remaps = []
+        for column in columns:
+            remaps.append(np.array(
+                [lookup.setdefault(value, len(lookup)) for value in column.values], dtype=np.int64
+            ))
+        # lookup keeps insertion order: values of earlier columns first
+        values = [sys.intern(v) if isinstance(v, str) else v for v in lookup]
+        dtype = _code_dtype(len(values))
+        codes = [
+            remap[column.codes].astype(dtype) if len(remap) else np.zeros(0, dtype=dtype)
+            for column, remap in zip(columns, remaps)
+        ]
+        return cls(values, np.concatenate(codes) if codes else np.zeros(0, dtype=dtype))
+
+    @property
+    def nbytes(self):
+        return (self.codes.nbytes + sys.getsizeof(self.values)
+                + sum(sys.getsizeof(value) for value in self.values))
+
+    mapped = False
+
+
+class EvidenceMetadata:
+    """
+    Column-oriented table of evidence metadata
+
+    Behaves like a read-only sequence of metadata dicts with the keys in
+    FIELDS; each access builds a fresh dict from the columns.
+    """
+
+    __slots__ = ('columns',)
+
+    def __init__(self, columns):
+        """
+        Args:
+            columns: Dict field name -> StringColumn or CategoryColumn
+        """
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the table from an iterable of metadata dicts"""
+        values = {field: [] for field in FIELDS}
+        for record in records:
+            for field in FIELDS:
+                values[field].append(record.get(field))
+
+        columns = {}
+        for field in FIELDS:
+            field_values = values.pop(field)
+            if field not in CATEGORICAL_FIELDS and all(
+                    v is None or isinstance(v, str) for v in field_values):
+                columns[field] = StringColumn.from_strings(field_values)
+            else:
+                columns[field] = CategoryColumn.from_values(field_values)
+        return cls(columns)
+
+    def column(self, field):
+        """Return the column of one field"""
+        return self.columns[field]
+
+    def __len__(self):
+        return len(self.columns[FIELDS[0]])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return {field: self.columns[field][i] for field in FIELDS}
+
+    def __iter__(self):
+        for row in zip(*(self.columns[field] for field in FIELDS)):
+            yield dict(zip(FIELDS, row))
+
+    def select(self, mask):
+        """Return a new table holding the rows where mask is True"""
+        return EvidenceMetadata({field: column.select(mask) for field, column in self.columns.items()})
+
+    def concat(self, other):
+        """Return a new table with the rows of other appended"""
+        return EvidenceMetadata.concat_all([self, other])
+
+    @classmethod
+    def concat_all(cls, tables):
+        """Return one table holding the rows of all tables in order"""
+        tables = list(tables)
+        columns = {}
+        for field in FIELDS:
+            field_columns = [table.columns[field] for table in tables]
+            column_types = {type(column) for column in field_columns}
+            if len(column_types) > 1:
+                # The field's value types differ between the tables
+                field_columns = [CategoryColumn.from_values(column) for column in field_columns]
+            columns[field] = type(field_columns[0]).concat_all(field_columns)
+        return cls(columns)
+
+    def memory_usage(self):
+        """Return bytes per column"""
+        return {field: column.nbytes for field, column in self.columns.items()}
@@ -0,0 +1,143 @@
+"""
+Background hot reload of the evidence database.
+
+The watcher polls the evidence file. When its content hash changes it
+streams the items through the ingestion pipeline (normalized and
+deduplicated as at startup) and diffs them against the live index by
+evidence id and a digest of each item, keeping only the changed items in
+memory. The difference is applied with RAGEngine.update_documents, which
+builds the new generation off the request path and swaps it in
+atomically; large or id-less changes are rebuilt with the streaming ingest
+instead. The snapshot file is then rewritten so restarted workers start
+from the new data.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from utils.evidence_ingest import iter_evidence, read_records
+from utils.index_snapshot import content_hash, ingest_engine, write_snapshot
+from utils.rag_engine import _document_fields
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 5.0
+
+
+def _item_key(item):
+    """Identify an evidence item by id, falling back to its content"""
+    return item.get('id') if item.get('id') is not None else item.get('content', '')
+
+
+def _item_digest(text, metadata):
+    """Digest of a document's text and metadata, to detect changed items"""
+    payload = json.dumps([text, metadata], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).digest()
+
+
+class EvidenceWatcher:
+    """Polls an evidence file and hot-reloads a RAGEngine when it changes"""
+
+    def __init__(self, engine, source_path, snapshot_path=None, interval=DEFAULT_INTERVAL):
+        """
+        Args:
+            engine: RAGEngine to keep up to date
+            source_path: Path to the evidence file (.json, .jsonl or .csv)
+            snapshot_path: Optional index snapshot to rewrite after a reload
+            interval: Seconds between checks of the file's modification time
+        """
+        self.engine = engine
+        self.source_path = source_path
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.reloads = 0
+        self.last_error = None
+
+        self._stat = self._file_stat()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='evidence-watcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.source_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            stat = self._file_stat()
+            if stat is None or stat == self._stat:
+                continue
+            self._stat = stat
+            try:
+                self.check()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error reloading evidence from {self.source_path}: {e}")
+
+    def check(self):
+        """
+        Reload the evidence file if its contents changed
+
+        Returns:
+            True if a new index generation was published
+        """
+        source_hash = content_hash(self.source_path)
+        if source_hash.hex() == self.engine.version:
+            return False
+
+        # Digests of the live documents; changed items are removed and re-added
+        current = {}
+        for text, metadata in zip(self.engine.texts, self.engine.metadata):
+            current[_item_key(dict(metadata, content=text))] = _item_digest(text, dict(metadata))
+
+        added = []
+        seen = set()
+        missing_ids = False
+        for item in iter_evidence(read_records(self.source_path)):
+            key = _item_key(item)
+            seen.add(key)
+            missing_ids = missing_ids or item.get('id') is None
+            if current.get(key) != _item_digest(*_document_fields(item)):
+                added.append(item)
+
+        removed = [key for key in current if key not in seen]
+        removed += [_item_key(item) for item in added if _item_key(item) in current]
+
+        if missing_ids or len(set(removed)) > len(current) // 2:
+            # Large or id-less changes: a full rebuild is simpler and as fast
+            self.engine.replace_with(ingest_engine(self.source_path, source_hash))
+        else:
+            self.engine.update_documents(added, removed, version=source_hash.hex())
+
+        self.reloads += 1
+        self.last_error = None
+        logger.info(f"Reloaded evidence from {self.source_path} "
+                    f"in {self.engine.last_reload_seconds:.3f}s "
+                    f"(generation {self.engine.generation})")
+
+        if self.snapshot_path:
+            try:
+                write_snapshot(self.snapshot_path, self.engine.index, self.engine.texts,
+                               self.engine.metadata, self.engine.word_counts, source_hash)
+            except OSError as e:
+                logger.warning(f"Could not rewrite index snapshot {self.snapshot_path}: {e}")
+        return True
+
+    def status(self):
+        return {
+            'source': self.source_path,
+            'interval': self.interval,
+            'reloads': self.reloads,
+            'last_error': self.last_error,
+        }
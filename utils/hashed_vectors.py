@@ -0,0 +1,219 @@
+"""
+Hashed dense text vectors for CPU-only similarity search.
+
+Unigrams and bigrams are mapped into a fixed number of dimensions with
+signed feature hashing: the bucket comes from the feature's hash and the
+sign from its top bit, so colliding features tend to cancel rather than
+pile up. Counts are optionally weighted by inverse document frequency and
+every vector is L2-normalized. All document vectors live in one contiguous
+float32 matrix, so cosine similarity for one query or a batch of queries is
+a single matrix multiply followed by argpartition.
+"""
+import zlib
+
+import numpy as np
+
+from utils.inverted_index import top_k
+
+DEFAULT_DIM = 256
+
+# Documents vectorized per bincount pass, bounding temporary memory
+BUILD_CHUNK = 4096
+
+# Multiplier combining the hashes of the two tokens of a bigram
+_BIGRAM_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _finalize(x):
+    """splitmix64 finalizer, spreading hash bits over all 64 bits (in place)"""
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def l2_normalize(matrix):
+    """Scale the rows of a float matrix to unit length in place (zero rows stay zero)"""
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+    norms[norms == 0] = 1
+    matrix /= norms[:, None]
+    return matrix
+
+
+class HashingVectorizer:
+    """Maps token sequences to signed, hashed unigram and bigram count vectors"""
+
+    def __init__(self, dim=DEFAULT_DIM, bigrams=True, idf=None):
+        """
+        Args:
+            dim: Number of dimensions
+            bigrams: Also hash pairs of adjacent tokens
+            idf: Optional float32 array of per-dimension IDF weights
+        """
+        self.dim = dim
+        self.bigrams = bigrams
+        self.idf = idf
+
+    def _features(self, token_lists):
+        """Return (row, bucket, sign) arrays for all features of the documents"""
+        # crc32 is stable across processes, unlike hash() of a str
+        token_hashes = {}
+        rows = []
+        hashes = []
+        for row, tokens in enumerate(token_lists):
+            token_ids = []
+            for token in tokens:
+                h = token_hashes.get(token)
+                if h is None:
+                    h = token_hashes[token] = zlib.crc32(token.encode('utf-8'))
+                token_ids.append(h)
+            unigrams = np.array(token_ids, dtype=np.uint64)
+            hashes.append(unigrams)
+            if self.bigrams and len(unigrams) > 1:
+                hashes.append(unigrams[:-1] * _BIGRAM_MIX + unigrams[1:])
+            count = len(unigrams) + (max(len(unigrams) - 1, 0) if self.bigrams else 0)
+            rows.append(np.full(count, row, dtype=np.int64))
+
+        if not hashes:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float64)
+        features = _finalize(np.concatenate(hashes))
+        buckets = (features % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where(features >> np.uint64(63), -1.0, 1.0)
+        return np.concatenate(rows), buckets, signs
+
+    def counts(self, token_lists):
+        """Return the signed hashed feature counts of documents as a float32 matrix"""
+        matrix = np.zeros((len(token_lists), self.dim), dtype=np.float32)
+        for start in range(0, len(token_lists), BUILD_CHUNK):
+            chunk = token_lists[start:start + BUILD_CHUNK]
+            rows, buckets, signs = self._features(chunk)
+            matrix[start:start + len(chunk)] = np.bincount(
+                rows * self.dim + buckets, weights=signs, minlength=len(chunk) * self.dim
+            ).reshape(len(chunk), self.dim)
+        return matrix
+
+    def transform(self, token_lists):
+        """Return L2-normalized (and IDF-weighted, if fitted) document vectors"""
+        matrix = self.counts(token_lists)
+        if self.idf is not None:
+            matrix *= self.idf
+        return l2_normalize(matrix)
+
+    def fit_transform(self, token_lists, idf=True):
+        """
+        Vectorize a corpus, first fitting IDF weights on it if requested
+
+        IDF is computed per hashed dimension (smoothed, as in scikit-learn's
+        TfidfTransformer), so it is approximate where features collide.
+        """
+        matrix = self.counts(token_lists)
+        if idf:
+            doc_freqs = np.count_nonzero(matrix, axis=0)
+            self.idf = (np.log((1 + len(matrix)) / (1 + doc_freqs)) + 1).astype(np.float32)
+            matrix *= self.idf
+        return l2_normalize(matrix)
+
+
+class DenseIndex:
+    """Document vectors in one contiguous, L2-normalized float32 matrix"""
+
+    def __init__(self, vectorizer, matrix):
+        """
+        Args:
+            vectorizer: HashingVectorizer that produced the matrix
+            matrix: float32 array of shape (documents, vectorizer.dim)
+        """
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+
+    @classmethod
+    def build(cls, token_lists, dim=DEFAULT_DIM, idf=True):
+        """
+        Vectorize tokenized documents
+
+        Args:
+            token_lists: Sequence of token sequences, one per document
+            dim: Number of dimensions
+            idf: Weight features by inverse document frequency
+
+        Returns:
+            DenseIndex
+        """
+        vectorizer = HashingVectorizer(dim)
+        return cls(vectorizer, np.ascontiguousarray(vectorizer.fit_transform(token_lists, idf)))
+
+    @property
+    def num_docs(self):
+        return len(self.matrix)
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+    def embed(self, tokens):
+        """Return the query vector of a token sequence"""
+        return self.vectorizer.transform([tokens])[0]
+
+    def scores(self, query_vector):
+        """Return the cosine similarity of every document to a query vector"""
+        return self.matrix @ query_vector
+
+    def search(self, query_vector, k, doc_ids=None):
+        """
+        Return the k documents most similar to a query vector
+
+        Args:
+            query_vector: L2-normalized query vector
+            k: Number of documents to return
+            doc_ids: Optional array of document ids to restrict the search to
+
+        Returns:
+            List of (doc_idx, cosine similarity) tuples ordered by descending
+            similarity, ties broken by ascending document id
+        """
+        scores = self.scores(query_vector)
+        if doc_ids is None:
+            doc_ids = np.arange(len(scores))
+        else:
+            scores = scores[doc_ids]
+        return top_k(doc_ids, scores, k)
+
+    def search_many(self, query_vectors, k):
+        """
+        Return the k most similar documents for each of many query vectors
+
+        One matrix multiply scores every query against every document, and
+        argpartition selects each row's top k.
+
+        Args:
+            query_vectors: float32 array of shape (queries, dim)
+            k: Number of documents per query
+
+        Returns:
+            List with one list of (doc_idx, cosine similarity) tuples per query
+        """
+        k = min(k, self.num_docs)
+        if k <= 0:
+            return [[] for _ in range(len(query_vectors))]
+        scores = np.asarray(query_vectors, dtype=np.float32) @ self.matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.lexsort((top, -top_scores), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            list(zip(row_ids.tolist(), row_scores.tolist()))
+            for row_ids, row_scores in zip(top, top_scores)
+        ]
+
+    def with_changes(self, keep_mask, added_token_lists):
+        """
+        Return a new index without the unkept documents and with new ones appended
+
+        The IDF weights are not refitted; a full rebuild does that.
+        """
+        added = self.vectorizer.transform(added_token_lists)
+        return DenseIndex(self.vectorizer, np.concatenate([self.matrix[keep_mask], added]))
@@ -0,0 +1,423 @@
+"""
+On-disk snapshot of the evidence index.
+
+The snapshot is a single binary file holding the vocabulary, postings, BM25
+impacts, document texts and metadata. Workers open it with `mmap`, so the
+pages are shared between processes and no tokenization happens at startup.
+
+Layout (little endian):
+    magic (8 bytes) | content hash (32 bytes) | section count (uint32)
+    section table: name (16 bytes) | offset (uint64) | length (uint64)
+    section payloads, each aligned to 8 bytes
+
+A snapshot is reused only if the magic (the file layout), the content hash
+of the evidence file and the build parameters in its 'params' section all
+match: BM25 k1 and b, INDEX_VERSION and a fingerprint of the analyzer, so
+a change to tokenization, stemming or stopwords also triggers a rebuild.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from utils.evidence_store import StringColumn
+from utils.inverted_index import InvertedIndex, DEFAULT_K1, DEFAULT_B
+from utils.nlp_processor import STOPWORDS, default_tokenizer
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TBTIDX02'
+HEADER = struct.Struct('<8s32sI')
+SECTION = struct.Struct('<16sQQ')
+ALIGNMENT = 8
+
+# Array sections and their dtypes; every other section is raw bytes
+ARRAY_DTYPES = {
+    'vocab_offsets': np.int64,
+    'offsets': np.int64,
+    'doc_ids': np.int32,
+    'term_freqs': np.float32,
+    'impacts': np.float64,
+    'idf': np.float64,
+    'doc_lengths': np.float32,
+    'doc_term_offsets': np.int64,
+    'doc_terms': np.int32,
+    'word_counts': np.int32,
+    'text_offsets': np.int64,
+    'meta_offsets': np.int64,
+}
+
+DEFAULT_SNAPSHOT_PATH = 'data/evidence_index.bin'
+
+# Bump when ingestion (normalization, deduplication) or BM25 weighting changes
+# in a way that alters the index without changing the file layout
+INDEX_VERSION = 1
+
+# Text whose tokens fingerprint the analyzer; tokenizer and stemmer changes alter them
+_ANALYZER_PROBE = ("Clinically proven: boosts immunity 3x! Doctors' recommended, isn't it? "
+                   "Running shoes, 100% pure cow's ghee, शुद्ध देसी घी")
+
+
+def build_params(k1=DEFAULT_K1, b=DEFAULT_B):
+    """Return the parameters a snapshot is built with; snapshots with other ones are rebuilt"""
+    tokens = default_tokenizer.analyze(_ANALYZER_PROBE, cache=False).tokens
+    analyzer = json.dumps([list(tokens), sorted(STOPWORDS)], ensure_ascii=False)
+    return {
+        'k1': k1,
+        'b': b,
+        'index_version': INDEX_VERSION,
+        'analyzer': hashlib.sha256(analyzer.encode('utf-8')).hexdigest()[:16],
+    }
+
+
+def content_hash(file_path):
+    """Return the SHA-256 digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _pack_strings(strings):
+    """Encode strings into one UTF-8 blob plus an offsets array"""
+    # Packed columns are written as they are
+    if not isinstance(strings, StringColumn) or strings.nulls is not None:
+        strings = StringColumn.from_strings(strings)
+    start, end = strings.offsets[0], strings.offsets[-1]
+    return bytes(strings.buffer[start:end]), strings.offsets - start
+
+
+def write_snapshot(path, index, texts, metadata, word_counts, source_hash):
+    """
+    Serialize an index and its documents to a snapshot file
+
+    Terms are written in sorted byte order so the vocabulary can be looked
+    up with a binary search directly on the mapped file. The file is written
+    to a temporary name and renamed into place, so readers never observe a
+    partial snapshot.
+
+    Args:
+        path: Destination file path
+        index: InvertedIndex to serialize
+        texts: Sequence of document texts
+        metadata: Sequence of document metadata dicts
+        word_counts: Array with the raw word count of every document
+        source_hash: Content hash of the source evidence file
+    """
+    terms = sorted(index.vocabulary, key=lambda t: t.encode('utf-8'))
+    old_ids = np.array([index.vocabulary[t] for t in terms], dtype=np.int64)
+
+    # Reorder posting lists to follow the sorted term order
+    lengths = np.diff(index.offsets)[old_ids]
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    new_ids = np.empty(len(terms), dtype=np.int64)
+    new_ids[old_ids] = np.arange(len(terms))
+    posting_terms = np.repeat(new_ids, np.diff(index.offsets))
+    posting_order = np.argsort(posting_terms, kind='stable')
+
+    # Remap the forward index and restore term order within each document
+    doc_terms = new_ids[index.doc_terms]
+    doc_of_term = np.repeat(np.arange(index.num_docs), np.diff(index.doc_term_offsets))
+    doc_terms = doc_terms[np.lexsort((doc_terms, doc_of_term))]
+
+    vocab_blob, vocab_offsets = _pack_strings(terms)
+    text_blob, text_offsets = _pack_strings(texts)
+    meta_blob, meta_offsets = _pack_strings(
+        json.dumps(m, separators=(',', ':')) for m in metadata
+    )
+    params = json.dumps(build_params(index.k1, index.b)).encode('utf-8')
+
+    sections = [
+        ('params', params),
+        ('vocab_blob', vocab_blob),
+        ('vocab_offsets', vocab_offsets),
+        ('offsets', offsets),
+        ('doc_ids', index.doc_ids[posting_order]),
+        ('term_freqs', index.term_freqs[posting_order]),
+        ('impacts', index.impacts[posting_order]),
+        ('idf', index.idf[old_ids]),
+        ('doc_lengths', index.doc_lengths),
+        ('doc_term_offsets', index.doc_term_offsets),
+        ('doc_terms', doc_terms),
+        ('word_counts', word_counts),
+        ('text_blob', text_blob),
+        ('text_offsets', text_offsets),
+        ('meta_blob', meta_blob),
+        ('meta_offsets', meta_offsets),
+    ]
+
+    payloads = []
+    for name, data in sections:
+        if name in ARRAY_DTYPES:
+            data = np.ascontiguousarray(data, dtype=ARRAY_DTYPES[name]).tobytes()
+        payloads.append((name, data))
+
+    table = []
+    position = HEADER.size + SECTION.size * len(payloads)
+    for name, data in payloads:
+        position += -position % ALIGNMENT
+        table.append((name, position, len(data)))
+        position += len(data)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, source_hash, len(payloads)))
+            for name, offset, length in table:
+                f.write(SECTION.pack(name.encode('ascii'), offset, length))
+            for (name, offset, _), (_, data) in zip(table, payloads):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    logger.info(f"Wrote index snapshot to {path} ({position} bytes)")
+
+
+class MappedVocabulary:
+    """
+    Dict-like token -> term id mapping over a sorted, mapped term blob
+
+    Lookups binary-search the encoded terms in place, so opening a snapshot
+    does not materialize the vocabulary in every worker.
+    """
+
+    def __init__(self, terms):
+        self._terms = terms
+
+    def __len__(self):
+        return len(self._terms)
+
+    def get(self, token, default=None):
+        key = token.encode('utf-8')
+        lo, hi = 0, len(self._terms)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            term = self._terms.raw(mid)
+            if term < key:
+                lo = mid + 1
+            elif term > key:
+                hi = mid
+            else:
+                return mid
+        return default
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def __getitem__(self, token):
+        term_id = self.get(token)
+        if term_id is None:
+            raise KeyError(token)
+        return term_id
+
+    def __iter__(self):
+        return iter(self._terms)
+
+    def items(self):
+        return ((term, term_id) for term_id, term in enumerate(self._terms))
+
+    @property
+    def nbytes(self):
+        return self._terms.nbytes
+
+    @property
+    def mapped(self):
+        return self._terms.mapped
+
+
+class IndexSnapshot:
+    """A memory-mapped index snapshot"""
+
+    def __init__(self, path):
+        """
+        Open and map a snapshot file
+
+        Args:
+            path: Path to the snapshot file
+
+        Raises:
+            ValueError: If the file is not a valid snapshot
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.source_hash, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not an index snapshot")
+
+        self._sections = {}
+        for i in range(count):
+            name, offset, length = SECTION.unpack_from(
+                self._mmap, HEADER.size + i * SECTION.size
+            )
+            self._sections[name.rstrip(b'\0').decode('ascii')] = (offset, length)
+
+        self.params = json.loads(bytes(self._section('params')))
+        self.vocabulary = MappedVocabulary(
+            StringColumn(self._section('vocab_blob'), self._section('vocab_offsets'))
+        )
+        self.texts = StringColumn(self._section('text_blob'), self._section('text_offsets'))
+        self.metadata = StringColumn(
+            self._section('meta_blob'), self._section('meta_offsets'), decode=json.loads
+        )
+        self.word_counts = self._section('word_counts')
+
+    def _section(self, name):
+        """Return a zero-copy view of a section"""
+        offset, length = self._sections[name]
+        dtype = ARRAY_DTYPES.get(name)
+        if dtype is None:
+            return memoryview(self._mmap)[offset:offset + length]
+        return np.frombuffer(
+            self._mmap, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset
+        )
+
+    def load_index(self):
+        """Return an InvertedIndex whose arrays point into the mapped file"""
+        return InvertedIndex(
+            self.vocabulary,
+            self._section('offsets'),
+            self._section('doc_ids'),
+            self._section('term_freqs'),
+            self._section('doc_lengths'),
+            self._section('doc_term_offsets'),
+            self._section('doc_terms'),
+            k1=self.params['k1'],
+            b=self.params['b'],
+            impacts=self._section('impacts'),
+            idf=self._section('idf'),
+        )
+
+
+def open_snapshot(path, source_hash=None, params=None):
+    """
+    Open a snapshot if it exists and matches the source content hash
+
+    Args:
+        path: Path to the snapshot file
+        source_hash: Expected content hash of the source evidence file,
+            or None to skip the staleness check
+        params: Expected build parameters (see build_params), or None to
+            accept any
+
+    Returns:
+        IndexSnapshot, or None if the snapshot is missing, invalid or stale
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        snapshot = IndexSnapshot(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable index snapshot {path}: {e}")
+        return None
+
+    if source_hash is not None and snapshot.source_hash != source_hash:
+        logger.info(f"Index snapshot {path} is stale")
+        return None
+
+    if params is not None and snapshot.params != params:
+        logger.info(f"Index snapshot {path} was built with other parameters "
+                    f"({snapshot.params}, expected {params})")
+        return None
+
+    return snapshot
+
+
+def ingest_engine(source_path, source_hash=None):
+    """
+    Build an in-memory RAGEngine by streaming an evidence file
+
+    Args:
+        source_path: Path to the evidence file (.json, .jsonl or .csv)
+        source_hash: Precomputed content hash of source_path, if known
+
+    Returns:
+        RAGEngine
+    """
+    # Imported here to avoid a circular import with rag_engine
+    from utils.evidence_ingest import ingest
+    from utils.rag_engine import RAGEngine
+
+    if source_hash is None:
+        source_hash = content_hash(source_path)
+    (index, texts, metadata, word_counts), _ = ingest(source_path)
+    return RAGEngine.from_components(index, texts, metadata, word_counts, source_hash.hex())
+
+
+def build_snapshot(source_path, snapshot_path=DEFAULT_SNAPSHOT_PATH, source_hash=None):
+    """
+    Build a snapshot from an evidence file
+
+    Args:
+        source_path: Path to the evidence file (.json, .jsonl or .csv)
+        snapshot_path: Destination snapshot path
+        source_hash: Precomputed content hash of source_path, if known
+
+    Returns:
+        The in-memory RAGEngine that was serialized
+    """
+    if source_hash is None:
+        source_hash = content_hash(source_path)
+    engine = ingest_engine(source_path, source_hash)
+    write_snapshot(snapshot_path, engine.index, engine.texts, engine.metadata,
+                   engine.word_counts, source_hash)
+    return engine
+
+
+def load_engine(source_path, snapshot_path=DEFAULT_SNAPSHOT_PATH):
+    """
+    Return a RAGEngine backed by an up-to-date snapshot
+
+    The snapshot is rebuilt when it is missing, its content hash does not
+    match the source file or it was built with other parameters (see
+    build_params). If the snapshot cannot be written (for example on
+    a read-only filesystem) the freshly built in-memory engine is used.
+
+    Args:
+        source_path: Path to the evidence file (.json, .jsonl or .csv)
+        snapshot_path: Path to the snapshot file
+
+    Returns:
+        RAGEngine
+    """
+    from utils.rag_engine import RAGEngine
+
+    source_hash = content_hash(source_path)
+    params = build_params()
+    snapshot = open_snapshot(snapshot_path, source_hash, params)
+    if snapshot is None:
+        logger.info(f"Building index snapshot for {source_path}")
+        engine = ingest_engine(source_path, source_hash)
+        try:
+            write_snapshot(snapshot_path, engine.index, engine.texts, engine.metadata,
+                           engine.word_counts, source_hash)
+        except OSError as e:
+            logger.warning(f"Could not write index snapshot {snapshot_path}: {e}")
+            return engine
+        snapshot = open_snapshot(snapshot_path, source_hash, params)
+        if snapshot is None:
+            return engine
+
+    return RAGEngine.from_snapshot(snapshot)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data/evidence_database.json'
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SNAPSHOT_PATH
+    build_snapshot(source, target)
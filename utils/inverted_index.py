@@ -0,0 +1,571 @@
+import copy
+import logging
+from array import array
+from collections import Counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Default BM25 parameters
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+
+# Relative slack on MaxScore bounds so floating point rounding never prunes
+# a document whose exact score ties the k-th best
+PRUNE_SLACK = 1e-9
+
+
+class InvertedIndex:
+    """
+    BM25 inverted index with postings stored as compact NumPy arrays.
+
+    Postings for all terms live in two flat arrays (document ids and term
+    frequencies); `offsets[t]:offsets[t + 1]` is the slice belonging to term
+    id `t`. Per-posting BM25 impacts are precomputed so that scoring a query
+    is a single scatter-add over the concatenated posting slices.
+
+    A forward index keeps the sorted, unique term ids of every document
+    (`doc_terms[doc_term_offsets[d]:doc_term_offsets[d + 1]]`) so callers can
+    compare documents against a query without re-tokenizing their text.
+    """
+
+    def __init__(self, vocabulary, offsets, doc_ids, term_freqs, doc_lengths,
+                 doc_term_offsets, doc_terms, k1=DEFAULT_K1, b=DEFAULT_B,
+                 impacts=None, idf=None):
+        """
+        Initialize the index from prebuilt arrays
+
+        Args:
+            vocabulary: Dict mapping token -> term id
+            offsets: int64 array of length len(vocabulary) + 1
+            doc_ids: int32 array of document ids, grouped by term
+            term_freqs: float32 array of term frequencies, parallel to doc_ids
+            doc_lengths: float32 array with the token count of every document
+            doc_term_offsets: int64 array of length num_docs + 1
+            doc_terms: int32 array of sorted unique term ids, grouped by document
+            k1: BM25 term-frequency saturation parameter
+            b: BM25 length normalization parameter
+            impacts: Optional precomputed BM25 impacts, parallel to doc_ids
+            idf: Optional precomputed IDF per term id
+        """
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.doc_term_offsets = doc_term_offsets
+        self.doc_terms = doc_terms
+        self.k1 = k1
+        self.b = b
+        self._max_impacts = None
+
+        if impacts is None or idf is None:
+            self._compute_weights()
+        else:
+            self.impacts = impacts
+            self.idf = idf
+            self.avg_doc_length = float(doc_lengths.mean(dtype=np.float64)) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, token_lists, k1=DEFAULT_K1, b=DEFAULT_B):
+        """
+        Build an index from an iterable of per-document token lists
+
+        Args:
+            token_lists: Iterable yielding one list of tokens per document
+            k1: BM25 term-frequency saturation parameter
+            b: BM25 length normalization parameter
+
+        Returns:
+            InvertedIndex
+        """
+        vocabulary = {}
+        term_ids = array('I')
+        doc_ids = array('I')
+        term_freqs = array('f')
+        doc_lengths = array('f')
+
+        for doc_idx, tokens in enumerate(token_lists):
+            doc_lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                term_id = vocabulary.setdefault(token, len(vocabulary))
+                term_ids.append(term_id)
+                doc_ids.append(doc_idx)
+                term_freqs.append(count)
+
+        return cls.from_postings(
+            vocabulary,
+            np.frombuffer(term_ids, dtype=np.uint32),
+            np.frombuffer(doc_ids, dtype=np.uint32),
+            np.frombuffer(term_freqs, dtype=np.float32),
+            np.frombuffer(doc_lengths, dtype=np.float32).copy(),
+            k1=k1,
+            b=b,
+        )
+
+    @classmethod
+    def from_postings(cls, vocabulary, term_ids, doc_ids, term_freqs, doc_lengths,
+                      k1=DEFAULT_K1, b=DEFAULT_B):
+        """
+        Build an index from unordered (term id, doc id, term frequency) triples
+
+        Args:
+            vocabulary: Dict mapping token -> term id
+            term_ids: Array of term ids, one per posting
+            doc_ids: Array of document ids, parallel to term_ids
+            term_freqs: Array of term frequencies, parallel to term_ids
+            doc_lengths: float32 array with the token count of every document
+            k1: BM25 term-frequency saturation parameter
+            b: BM25 length normalization parameter
+
+        Returns:
+            InvertedIndex
+        """
+        num_docs = len(doc_lengths)
+
+        # Sorting by (term, doc) keeps document ids ascending within every posting list
+        order = np.lexsort((doc_ids, term_ids))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=offsets[1:])
+
+        # Forward index: sorted term ids within each document
+        forward_order = np.lexsort((term_ids, doc_ids))
+        doc_term_offsets = np.zeros(num_docs + 1, dtype=np.int64)
+        np.cumsum(np.bincount(doc_ids, minlength=num_docs), out=doc_term_offsets[1:])
+
+        return cls(
+            vocabulary,
+            offsets,
+            doc_ids[order].astype(np.int32),
+            term_freqs[order].astype(np.float32),
+            doc_lengths,
+            doc_term_offsets,
+            term_ids[forward_order].astype(np.int32),
+            k1=k1,
+            b=b,
+        )
+
+    def with_changes(self, keep_mask, added_token_lists):
+        """
+        Return a new index with documents removed and appended
+
+        The existing postings are reused as-is, so only the added documents
+        are tokenized. This index is left untouched (copy-on-write), and the
+        BM25 weights of the new index are recomputed for the new corpus.
+
+        Args:
+            keep_mask: Boolean array over current documents; False removes a document
+            added_token_lists: Token lists of documents appended after the kept ones
+
+        Returns:
+            InvertedIndex whose document ids are the kept documents in their
+            original order, followed by the added documents
+        """
+        # Existing postings, with document ids renumbered over the kept documents
+        new_doc_ids = np.cumsum(keep_mask) - 1
+        posting_terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        kept = keep_mask[self.doc_ids]
+        term_ids = [posting_terms[kept]]
+        doc_ids = [new_doc_ids[self.doc_ids[kept]]]
+        term_freqs = [self.term_freqs[kept]]
+        doc_lengths = [self.doc_lengths[keep_mask]]
+
+        vocabulary = dict(self.vocabulary.items())
+        first_new_doc = int(np.count_nonzero(keep_mask))
+        added_terms = array('I')
+        added_docs = array('I')
+        added_freqs = array('f')
+        added_lengths = array('f')
+        for offset, tokens in enumerate(added_token_lists):
+            added_lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                added_terms.append(vocabulary.setdefault(token, len(vocabulary)))
+                added_docs.append(first_new_doc + offset)
+                added_freqs.append(count)
+
+        term_ids.append(np.frombuffer(added_terms, dtype=np.uint32))
+        doc_ids.append(np.frombuffer(added_docs, dtype=np.uint32))
+        term_freqs.append(np.frombuffer(added_freqs, dtype=np.float32))
+        doc_lengths.append(np.frombuffer(added_lengths, dtype=np.float32))
+
+        return InvertedIndex.from_postings(
+            vocabulary,
+            np.concatenate(term_ids).astype(np.int64),
+            np.concatenate(doc_ids).astype(np.int64),
+            np.concatenate(term_freqs),
+            np.concatenate(doc_lengths).astype(np.float32),
+            k1=self.k1,
+            b=self.b,
+        )
+
+    @property
+    def num_docs(self):
+        return len(self.doc_lengths)
+
+    @property
+    def num_postings(self):
+        return len(self.doc_ids)
+
+    def arrays(self):
+        """Return the index's NumPy arrays by name (for memory accounting)"""
+        arrays = {
+            'offsets': self.offsets,
+            'doc_ids': self.doc_ids,
+            'term_freqs': self.term_freqs,
+            'impacts': self.impacts,
+            'idf': self.idf,
+            'doc_lengths': self.doc_lengths,
+            'doc_term_offsets': self.doc_term_offsets,
+            'doc_terms': self.doc_terms,
+        }
+        if self._max_impacts is not None:
+            arrays['max_impacts'] = self._max_impacts
+        return arrays
+
+    def _compute_weights(self, doc_freqs=None, num_docs=None, avg_doc_length=None):
+        """
+        Precompute IDF per term and the BM25 impact of every posting
+
+        Collection statistics default to this index's own. A shard of a
+        larger corpus passes the corpus-wide values instead, so its scores
+        are identical to those of a single index over all documents.
+        """
+        if doc_freqs is None:
+            doc_freqs = np.diff(self.offsets)
+            num_docs = self.num_docs
+            avg_doc_length = float(self.doc_lengths.mean(dtype=np.float64)) if num_docs else 0.0
+        doc_freqs = np.asarray(doc_freqs, dtype=np.float64)
+        # Lucene-style IDF, which stays positive for very common terms
+        self.idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+        self.avg_doc_length = avg_doc_length
+        if self.avg_doc_length > 0:
+            norm = 1 - self.b + self.b * self.doc_lengths / self.avg_doc_length
+        else:
+            norm = np.ones(self.num_docs, dtype=np.float64)
+
+        self._max_impacts = None
+        tf = self.term_freqs.astype(np.float64)
+        posting_idf = np.repeat(self.idf, np.diff(self.offsets))
+        self.impacts = posting_idf * tf * (self.k1 + 1) / (tf + self.k1 * norm[self.doc_ids])
+
+    def with_collection_stats(self, doc_freqs, num_docs, avg_doc_length):
+        """
+        Return a copy of this index weighted with external collection statistics
+
+        Args:
+            doc_freqs: Document frequency of every local term id in the whole corpus
+            num_docs: Number of documents in the whole corpus
+            avg_doc_length: Average document length in the whole corpus
+
+        Returns:
+            InvertedIndex sharing this index's postings, with new IDF and impacts
+        """
+        index = copy.copy(self)
+        index._compute_weights(doc_freqs, num_docs, avg_doc_length)
+        return index
+
+    def subset(self, doc_mask):
+        """
+        Return an index over a subset of the documents
+
+        The subset shares this index's vocabulary, so term ids are
+        interchangeable, and keeps its BM25 weights, so every document
+        scores exactly as it does here.
+
+        Args:
+            doc_mask: Boolean array over documents; True keeps a document
+
+        Returns:
+            (InvertedIndex, doc_map) where doc_map[local id] is the document
+            id in this index
+        """
+        doc_mask = np.asarray(doc_mask, dtype=bool)
+        doc_map = np.flatnonzero(doc_mask)
+        local_ids = np.cumsum(doc_mask) - 1
+
+        kept = doc_mask[self.doc_ids]
+        posting_terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        offsets = np.zeros(len(self.offsets), dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms[kept], minlength=len(self.offsets) - 1),
+                  out=offsets[1:])
+
+        terms_per_doc = np.diff(self.doc_term_offsets)
+        doc_term_offsets = np.zeros(len(doc_map) + 1, dtype=np.int64)
+        np.cumsum(terms_per_doc[doc_mask], out=doc_term_offsets[1:])
+
+        index = InvertedIndex(
+            self.vocabulary,
+            offsets,
+            local_ids[self.doc_ids[kept]].astype(np.int32),
+            self.term_freqs[kept],
+            self.doc_lengths[doc_mask],
+            doc_term_offsets,
+            self.doc_terms[np.repeat(doc_mask, terms_per_doc)],
+            k1=self.k1,
+            b=self.b,
+            impacts=self.impacts[kept],
+            idf=self.idf,
+        )
+        return index, doc_map
+
+    def term_postings(self, term_id):
+        """Return (doc_ids, impacts) slices for a term id"""
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.impacts[start:end]
+
+    def document_terms(self, doc_idx):
+        """Return the sorted unique term ids of a document"""
+        return self.doc_terms[self.doc_term_offsets[doc_idx]:self.doc_term_offsets[doc_idx + 1]]
+
+    def encode(self, tokens):
+        """
+        Map tokens to a sorted array of unique known term ids
+
+        Tokens that are not in the vocabulary are dropped.
+        """
+        vocabulary = self.vocabulary
+        term_ids = {vocabulary.get(token) for token in tokens}
+        term_ids.discard(None)
+        return np.array(sorted(term_ids), dtype=np.int32)
+
+    def score(self, term_weights):
+        """
+        Score every document against weighted query terms
+
+        Args:
+            term_weights: Dict mapping term id -> query weight
+
+        Returns:
+            float64 array of BM25 scores, one per document
+        """
+        if not term_weights or not self.num_docs:
+            return np.zeros(self.num_docs, dtype=np.float64)
+
+        docs = []
+        weights = []
+        for term_id, weight in term_weights.items():
+            term_docs, term_impacts = self.term_postings(term_id)
+            docs.append(term_docs)
+            weights.append(term_impacts * weight)
+
+        # Scatter-add all postings into a dense score vector in one pass
+        return np.bincount(
+            np.concatenate(docs),
+            weights=np.concatenate(weights),
+            minlength=self.num_docs,
+        )
+
+    @property
+    def max_impacts(self):
+        """Largest BM25 impact in every term's posting list (computed on first use)"""
+        if self._max_impacts is None:
+            max_impacts = np.zeros(len(self.offsets) - 1, dtype=np.float64)
+            nonempty = np.flatnonzero(np.diff(self.offsets))
+            if len(nonempty):
+                max_impacts[nonempty] = np.maximum.reduceat(self.impacts, self.offsets[nonempty])
+            self._max_impacts = max_impacts
+        return self._max_impacts
+
+    def search(self, term_weights, k, stats=None, prune=False):
+        """
+        Return the top-k documents for weighted query terms
+
+        Args:
+            term_weights: Dict mapping term id -> query weight
+            k: Number of documents to return
+            stats: Optional dict that receives 'postings_scanned',
+                'postings_skipped' and 'candidates_scored' counts for this query
+            prune: Use MaxScore dynamic pruning instead of scoring every
+                posting; the results are identical
+
+        Returns:
+            List of (doc_idx, score) tuples ordered by descending score
+        """
+        if prune and k > 0 and len(term_weights) > 1:
+            return self._search_maxscore(term_weights, k, stats)
+
+        scores = self.score(term_weights)
+        candidates = np.flatnonzero(scores > 0)
+        if stats is not None:
+            stats['postings_scanned'] = int(sum(
+                self.offsets[t + 1] - self.offsets[t] for t in term_weights
+            ))
+            stats['postings_skipped'] = 0
+            stats['candidates_scored'] = len(candidates)
+        return top_k(candidates, scores[candidates], k)
+
+    def _search_maxscore(self, term_weights, k, stats=None):
+        """
+        MaxScore top-k retrieval
+
+        Terms are processed in order of decreasing upper-bound contribution
+        (max impact * query weight). Posting lists are read in full only
+        until the bounds of the remaining terms add up to less than the
+        current k-th best partial score; after that no unseen document can
+        enter the top-k, so the remaining (typically very frequent) terms
+        are only probed for the surviving candidates, which are pruned as
+        soon as their upper bound falls below the threshold. Survivors are
+        rescored in the original term order, so scores are bit-for-bit those
+        of score().
+        """
+        terms = list(term_weights.items())
+        bounds = np.array([self.max_impacts[term_id] * weight for term_id, weight in terms])
+        order = np.argsort(-bounds, kind='stable')
+        # remaining[i]: upper bound of what the terms order[i:] can still add
+        remaining = np.append(np.cumsum(bounds[order][::-1])[::-1], 0.0)
+        total_postings = int(sum(self.offsets[t + 1] - self.offsets[t] for t, _ in terms))
+
+        # Essential terms: accumulate whole posting lists into a dense vector.
+        # Documents are unique within a posting list, so plain fancy-index
+        # addition is safe, and the k-th best partial score among one list's
+        # documents is a valid lower bound for the final threshold.
+        dense = np.zeros(self.num_docs, dtype=np.float64)
+        threshold = 0.0
+        scanned = 0
+        position = 0
+        while position < len(order):
+            term_id, weight = terms[order[position]]
+            term_docs, term_impacts = self.term_postings(term_id)
+            dense[term_docs] += term_impacts * weight
+            scanned += len(term_docs)
+            threshold = max(threshold, _kth_largest(dense[term_docs], k))
+            position += 1
+            if _cannot_reach(remaining[position], threshold):
+                break
+
+        # Candidates: documents seen so far that can still reach the threshold
+        reachable = ~_cannot_reach(dense + remaining[position], threshold)
+        reachable[:] &= dense > 0
+        candidates = np.flatnonzero(reachable)
+
+        # Non-essential terms: only look up the candidates that can still make
+        # it, by binary search when that is cheaper than reading the list
+        for position in range(position, len(order)):
+            keep = ~_cannot_reach(dense[candidates] + remaining[position], threshold)
+            candidates = candidates[keep]
+            term_id, weight = terms[order[position]]
+            term_docs, term_impacts = self.term_postings(term_id)
+            if len(candidates) * np.log2(len(term_docs) + 1) < len(term_docs):
+                positions, found = _lookup(term_docs, candidates)
+                dense[candidates[found]] += term_impacts[positions[found]] * weight
+                scanned += len(candidates)
+            else:
+                dense[term_docs] += term_impacts * weight
+                scanned += len(term_docs)
+            threshold = max(threshold, _kth_largest(dense[candidates], k))
+
+        candidates = candidates[~_cannot_reach(dense[candidates], threshold)]
+
+        # Exact scores, accumulated in the same order as score()
+        scores = np.zeros(len(candidates), dtype=np.float64)
+        for term_id, weight in terms:
+            term_docs, term_impacts = self.term_postings(term_id)
+            positions, found = _lookup(term_docs, candidates)
+            scores[found] += term_impacts[positions[found]] * weight
+
+        if stats is not None:
+            scanned = min(scanned, total_postings)
+            stats['postings_scanned'] = scanned
+            stats['postings_skipped'] = total_postings - scanned
+            stats['candidates_scored'] = len(candidates)
+        positive = scores > 0
+        return top_k(candidates[positive], scores[positive], k)
+
+
+def _kth_largest(scores, k):
+    """Return the k-th largest score, or 0 if there are fewer than k"""
+    if len(scores) < k:
+        return 0.0
+    return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+
+def _cannot_reach(bound, threshold):
+    """Whether an upper bound is safely below the k-th best score"""
+    return bound * (1 + PRUNE_SLACK) < threshold * (1 - PRUNE_SLACK)
+
+
+def _lookup(sorted_docs, doc_ids):
+    """
+    Locate doc_ids in a sorted posting list
+
+    Returns:
+        (positions, found): positions into sorted_docs and a mask of the
+        doc_ids that are present
+    """
+    positions = np.searchsorted(sorted_docs, doc_ids)
+    if not len(sorted_docs):
+        return positions, np.zeros(len(doc_ids), dtype=bool)
+    positions[positions == len(sorted_docs)] = 0
+    return positions, sorted_docs[positions] == doc_ids
+
+
+def top_k(doc_ids, scores, k):
+    """
+    Select the k highest scoring documents
+
+    Ties are broken by ascending document id so results are deterministic
+    regardless of how the candidates were produced.
+
+    Args:
+        doc_ids: Array of candidate document ids
+        scores: Array of candidate scores, parallel to doc_ids
+        k: Number of documents to return
+
+    Returns:
+        List of (doc_idx, score) tuples ordered by descending score
+    """
+    if k <= 0 or len(scores) == 0:
+        return []
+
+    if len(scores) > k:
+        partition = np.argpartition(-scores, k - 1)[:k]
+        kth_score = scores[partition].min()
+        # Keep every candidate tied with the k-th score so tie-breaking is stable
+        selected = np.flatnonzero(scores >= kth_score)
+        doc_ids = doc_ids[selected]
+        scores = scores[selected]
+
+    order = np.lexsort((doc_ids, -scores))[:k]
+    return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+
+class DocumentFeatures:
+    """
+    Precomputed token features of one indexed document
+
+    Attached to retrieved evidence so the claim analyzer can measure overlap
+    against the index's cached token ids instead of re-tokenizing the text.
+    Every operation costs O(query terms * log(document terms)).
+    """
+
+    __slots__ = ('index', 'token_ids', 'word_count', 'doc_idx', 'positional')
+
+    def __init__(self, index, token_ids, word_count, doc_idx=None, positional=None):
+        """
+        Args:
+            index: InvertedIndex the token ids belong to
+            token_ids: Sorted unique term ids of the document
+            word_count: Number of whitespace separated words in the raw text
+            doc_idx: Id of the document in index
+            positional: Optional PositionalIndex of index, for phrase and
+                proximity checks on this document
+        """
+        self.index = index
+        self.token_ids = token_ids
+        self.word_count = word_count
+        self.doc_idx = doc_idx
+        self.positional = positional
+
+    @property
+    def num_tokens(self):
+        return len(self.token_ids)
+
+    def count_common(self, query_ids):
+        """Count how many of the sorted query term ids occur in the document"""
+        if not len(query_ids) or not len(self.token_ids):
+            return 0
+        positions = np.searchsorted(self.token_ids, query_ids)
+        positions[positions == len(self.token_ids)] = 0
+        return int(np.count_nonzero(self.token_ids[positions] == query_ids))
@@ -0,0 +1,297 @@
+"""
+Asynchronous analysis jobs.
+
+In async mode /analyze hands the claim to a JobQueue and returns at once
+with the job id. A fixed pool of worker threads (they share the process's
+index and analyzer) takes jobs from a bounded queue; when the queue is full
+submit() raises QueueFull and the request is answered with 429 instead of
+piling up behind the load balancer. Job states are kept in memory, the
+most recent finished ones up to a limit, and with a JobStore also written to
+the database, so a status poll answered by another worker process (or
+host) finds the job too.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUED = 32
+
+# Finished jobs whose state is kept in memory for polling
+DEFAULT_RETAIN = 10000
+
+# Seconds finished jobs are kept in a JobStore
+DEFAULT_RETENTION = 86400
+
+# Finished jobs between purges of a JobStore
+PURGE_INTERVAL = 1000
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity"""
+
+
+class Job:
+    """State of one submitted job"""
+
+    __slots__ = ('id', 'status', 'submitted_at', 'started_at', 'finished_at',
+                 'wait_seconds', 'run_seconds', 'error', 'args', '_submitted')
+
+    def __init__(self, job_id, args):
+        self.id = job_id
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.wait_seconds = None
+        self.run_seconds = None
+        self.error = None
+        self.args = args
+        self._submitted = time.perf_counter()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'wait_seconds': self.wait_seconds,
+            'run_seconds': self.run_seconds,
+            'error': self.error,
+        }
+
+
+class JobStore:
+    """Job states in a database table shared by all worker processes"""
+
+    def __init__(self, app, db, model, retention=DEFAULT_RETENTION):
+        """
+        Args:
+            app: Flask app whose context is used for database access
+            db: Flask-SQLAlchemy extension
+            model: AnalysisJob model class
+            retention: Seconds finished jobs are kept
+        """
+        self.app = app
+        self.db = db
+        self.model = model
+        self.retention = retention
+
+    def save(self, state):
+        """Insert or update a job from its to_dict() state; errors are logged"""
+        with self.app.app_context():
+            session = self.db.session
+            try:
+                session.merge(self.model(**state))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.warning(f"Could not store the state of job {state['id']}: {e}")
+            finally:
+                session.remove()
+
+    def delete(self, job_id):
+        """Forget a job that was never queued"""
+        with self.app.app_context():
+            session = self.db.session
+            try:
+                session.query(self.model).filter(self.model.id == job_id).delete()
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.warning(f"Could not delete job {job_id}: {e}")
+            finally:
+                session.remove()
+
+    def load(self, job_id):
+        """Return a job's state as a dict, or None if unknown"""
+        with self.app.app_context():
+            session = self.db.session
+            try:
+                job = session.get(self.model, job_id)
+                return job.to_dict() if job is not None else None
+            except Exception as e:
+                logger.warning(f"Could not load the state of job {job_id}: {e}")
+                return None
+            finally:
+                session.remove()
+
+    def purge(self):
+        """Delete jobs that finished more than retention seconds ago"""
+        with self.app.app_context():
+            session = self.db.session
+            try:
+                session.query(self.model).filter(
+                    self.model.finished_at < time.time() - self.retention
+                ).delete(synchronize_session=False)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.warning(f"Could not purge finished jobs: {e}")
+            finally:
+                session.remove()
+
+
+class JobQueue:
+    """Bounded queue of jobs run by a pool of worker threads"""
+
+    def __init__(self, handler, workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED,
+                 retain=DEFAULT_RETAIN, store=None):
+        """
+        Args:
+            handler: Called as handler(job_id, *args) in a worker thread; an
+                exception marks the job failed
+            workers: Number of worker threads
+            max_queued: Jobs that may wait for a worker before submit() is refused
+            retain: Finished jobs kept in memory for get()
+            store: Optional JobStore that shares job states between processes
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retain = retain
+        self.store = store
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._finished = deque()
+        self._running = 0
+        self._completed = 0
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'analysis-job-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.close)
+
+    def submit(self, *args):
+        """
+        Queue a job
+
+        Args:
+            *args: Arguments passed to the handler after the job id
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFull: max_queued jobs are already waiting
+        """
+        # Refuse without touching the store when the queue is visibly full
+        if self._queue.full():
+            metrics.jobs_total.inc('rejected')
+            raise QueueFull(f"{self.max_queued} jobs are already queued")
+
+        job = Job(uuid.uuid4().hex, args)
+        # Stored before it is queued, so no worker can store 'running' first
+        if self.store is not None:
+            self.store.save(job.to_dict())
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            # Filled up by a concurrent submit since the check above
+            with self._lock:
+                del self._jobs[job.id]
+            if self.store is not None:
+                self.store.delete(job.id)
+            metrics.jobs_total.inc('rejected')
+            raise QueueFull(f"{self.max_queued} jobs are already queued")
+        return job
+
+    def get(self, job_id):
+        """Return a snapshot of a job's state as a dict, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        # Accepted by another process
+        return self.store.load(job_id) if self.store is not None else None
+
+    @property
+    def depth(self):
+        """Jobs waiting for a worker"""
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            running = self._running
+        return {
+            'workers': self.workers,
+            'max_queued': self.max_queued,
+            'queued': self.depth,
+            'running': running,
+        }
+
+    def close(self):
+        """Finish queued jobs and stop the workers"""
+        if any(thread.is_alive() for thread in self._threads):
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+
+            with self._lock:
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.wait_seconds = time.perf_counter() - job._submitted
+                self._running += 1
+                state = job.to_dict()
+            metrics.job_wait_seconds.observe(job.wait_seconds)
+            if self.store is not None:
+                self.store.save(state)
+
+            started = time.perf_counter()
+            try:
+                self.handler(job.id, *job.args)
+                status, error = DONE, None
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed")
+                status, error = FAILED, str(e)
+            run_seconds = time.perf_counter() - started
+            metrics.job_run_seconds.observe(run_seconds)
+            metrics.jobs_total.inc(status)
+
+            with self._lock:
+                job.status = status
+                job.error = error
+                job.finished_at = time.time()
+                job.run_seconds = run_seconds
+                job.args = None
+                self._running -= 1
+                self._completed += 1
+                purge = self._completed % PURGE_INTERVAL == 0
+                state = job.to_dict()
+                # Forget the oldest finished jobs beyond retain
+                self._finished.append(job.id)
+                while len(self._finished) > self.retain:
+                    del self._jobs[self._finished.popleft()]
+            if self.store is not None:
+                self.store.save(state)
+                if purge:
+                    self.store.purge()
+            self._queue.task_done()
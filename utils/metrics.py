@@ -0,0 +1,223 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Histograms keep cumulative bucket counts per label set, so observing a value
+is a bisect plus a few integer increments under a lock. Metrics are per
+process; with several workers each one reports its own values (scrape them
+individually or aggregate with the `instance` label).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from 50µs to 10s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Size buckets for counts such as postings scanned per query
+SIZE_BUCKETS = (
+    1, 10, 100, 1000, 10000, 100000, 1000000, 10000000,
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Prometheus-style histogram with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        """Record one observation for the given label values"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (+Inf last), sum and count
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        """Context manager that observes the elapsed wall time in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = [(labels, list(counts), total, count)
+                      for labels, (counts, total, count) in sorted(self._series.items())]
+        for labelvalues, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+
+class CallbackGauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, callback, metric_type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def render(self):
+        value = self.callback()
+        if value is None:
+            return []
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+            f'{self.name} {_format_value(value)}',
+        ]
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry and the analysis pipeline's metrics
+registry = MetricsRegistry()
+
+stage_seconds = registry.register(Histogram(
+    'tbt_stage_duration_seconds',
+    'Time spent in each stage of the claim analysis pipeline.',
+    labelnames=('stage',),
+))
+
+postings_scanned = registry.register(Histogram(
+    'tbt_retrieval_postings_scanned',
+    'Number of postings read by one retrieval query.',
+    buckets=SIZE_BUCKETS,
+))
+
+postings_skipped = registry.register(Histogram(
+    'tbt_retrieval_postings_skipped',
+    'Number of postings skipped by dynamic pruning in one retrieval query.',
+    buckets=SIZE_BUCKETS,
+))
+
+candidates_scored = registry.register(Histogram(
+    'tbt_retrieval_candidates_scored',
+    'Number of candidate documents ranked by one retrieval query.',
+    buckets=SIZE_BUCKETS,
+))
+
+retrieval_scope = registry.register(Counter(
+    'tbt_retrieval_scope_total',
+    'Retrieval queries by the part of the corpus that answered them.',
+    labelnames=('scope',),
+))
+
+analyses_total = registry.register(Counter(
+    'tbt_analyses_total',
+    'Completed claim analyses by where the result came from.',
+    labelnames=('source',),
+))
+
+persist_failures_total = registry.register(Counter(
+    'tbt_persist_failures_total',
+    'Analyses that could not be written to the database and are kept in memory only.',
+))
+
+job_wait_seconds = registry.register(Histogram(
+    'tbt_job_wait_seconds',
+    'Time asynchronous analysis jobs spent queued before a worker took them.',
+))
+
+job_run_seconds = registry.register(Histogram(
+    'tbt_job_run_seconds',
+    'Time asynchronous analysis jobs spent running.',
+))
+
+jobs_total = registry.register(Counter(
+    'tbt_jobs_total',
+    'Asynchronous analysis jobs by outcome (done, failed or rejected because the queue was full).',
+    labelnames=('status',),
+))
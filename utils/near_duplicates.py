@@ -0,0 +1,407 @@
+"""
+Near-duplicate claim detection over the history of analyses.
+
+Every analyzed claim is reduced to a MinHash signature over character
+shingles of its preprocessed tokens, so paraphrases that share most of
+their wording ("boosts immunity 3x" / "boosts your immunity by 3x") get
+signatures that agree in most positions. Signatures are split into bands
+and each band is hashed together with the brand, a standard LSH banding
+scheme: two claims of the same brand become candidates when any band
+matches, and candidates are confirmed by the fraction of agreeing
+signature positions, an unbiased estimate of their Jaccard similarity.
+Shingles cannot tell "contains no preservatives" from "contains
+preservatives", so a match only reuses the earlier verdict if both claims
+have the same negation words and the same numbers. The earlier analysis
+must also have the same tagline and have been made against the current
+evidence corpus version, so a hot reload invalidates reused verdicts just
+like cached results.
+
+Band keys are kept in one sorted NumPy array per band and looked up with
+binary search. New claims go to a small unsorted tail that is scanned
+with a vectorized comparison and merged into the sorted arrays once it
+fills up, so the index grows incrementally and a lookup stays well under
+a millisecond at a million claims. Memory is about 400 bytes per claim.
+Claims already indexed are skipped when added again, so the history of
+other worker processes can be re-read from the database periodically.
+"""
+import itertools
+import logging
+import re
+import threading
+
+import numpy as np
+
+from utils.claim_analyzer import NEGATION_WORDS
+from utils.nlp_processor import default_tokenizer
+from utils.result_cache import normalize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+SHINGLE_SIZE = 4
+
+# Claims appended since the last merge; scanned linearly on lookup
+MAX_TAIL = 1024
+
+# Claims hashed per vectorized batch when loading history
+BULK_CHUNK = 1024
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Odd 64-bit multiplier used to mix the rows of a band into one key
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def claim_bytes(text):
+    """
+    Return the normalized UTF-8 form of a claim that shingles are taken from
+
+    The text is tokenized like preprocess_text (lowercased, punctuation and
+    stopwords removed), so raw and preprocessed claims give the same bytes.
+    """
+    return ' '.join(default_tokenizer.analyze(text, cache=False).tokens).encode('utf-8')
+
+
+def claim_qualifiers(text):
+    """
+    Return the parts of a raw claim that flip or change its meaning
+
+    Args:
+        text: Raw claim text (preprocessing splits contractions like "isn't")
+
+    Returns:
+        (negation words, numbers): sorted tuples of the negation words
+        (NEGATION_WORDS and other "n't" contractions) and of the numbers
+        (thousands separators removed), repeats included, so "no X and no
+        Y" differs from "X and no Y"
+    """
+    text = text.lower().replace('\u2019', "'")
+    negations = tuple(sorted(
+        word for word in _WORD.findall(text) if word in NEGATION_WORDS or word.endswith("n't")
+    ))
+    numbers = tuple(sorted(number.replace(',', '') for number in _NUMBER.findall(text)))
+    return negations, numbers
+
+
+def shingle_hashes(encoded_claims):
+    """
+    Return the byte shingles of many claims as integers
+
+    Every window of SHINGLE_SIZE bytes is read as one big-endian integer;
+    claims shorter than that are zero-padded into a single shingle.
+
+    Args:
+        encoded_claims: Sequence of non-empty claim_bytes() values
+
+    Returns:
+        (values, starts): uint64 shingle values of all claims back to back,
+        and the index in values where each claim's shingles start
+    """
+    padded = [e.ljust(SHINGLE_SIZE, b'\0') for e in encoded_claims]
+    lengths = np.array([len(e) for e in padded], dtype=np.int64)
+    ends = np.cumsum(lengths)
+    buffer = np.frombuffer(b''.join(padded), dtype=np.uint8).astype(np.uint64)
+
+    windows = np.zeros(len(buffer) - SHINGLE_SIZE + 1, dtype=np.uint64)
+    for shift in range(SHINGLE_SIZE):
+        windows = (windows << np.uint64(8)) | buffer[shift:len(buffer) - SHINGLE_SIZE + 1 + shift]
+
+    # Keep the windows that lie within a single claim
+    counts = lengths - SHINGLE_SIZE + 1
+    starts = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    positions = np.arange(counts.sum()) + np.repeat(ends - lengths - starts, counts)
+    return windows[positions], starts
+
+
+class MinHasher:
+    """
+    MinHash signatures from num_perm random hash functions
+
+    Each function is a multiply-shift hash, (a * x + b) mod 2^64 keeping the
+    high 32 bits, which needs no division and vectorizes well.
+    """
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, encoded_claims):
+        """
+        Return the signatures of many claims
+
+        Args:
+            encoded_claims: Sequence of non-empty claim_bytes() values
+
+        Returns:
+            uint32 array of shape (len(encoded_claims), num_perm)
+        """
+        values, starts = shingle_hashes(encoded_claims)
+        hashed = (self._a[:, None] * values[None, :] + self._b[:, None]) >> np.uint64(32)
+        return np.minimum.reduceat(hashed, starts, axis=1).T.astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """Incremental MinHash/LSH index of analyzed claims, grouped by brand"""
+
+    def __init__(self, load=None, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                 bands=DEFAULT_BANDS):
+        """
+        Args:
+            load: Optional function public id -> stored analysis dict (or None),
+                used by find()
+            threshold: Minimum estimated Jaccard similarity of a near-duplicate
+            num_perm: MinHash signature length
+            bands: Number of LSH bands; must divide num_perm. More bands find
+                less similar candidates at the cost of more verification.
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        self.load = load
+        self.threshold = threshold
+        self.bands = bands
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+
+        self._count = 0
+        # Analysis ids (public ids are 32 hex characters)
+        self._keys = np.empty(0, dtype='S32')
+        self._brands = np.empty(0, dtype=np.int32)
+        # Low 16 bits of every signature position, enough to estimate similarity
+        self._signatures = np.empty((0, num_perm), dtype=np.uint16)
+        self._brand_codes = {}
+        self._indexed = set()
+
+        self._sorted_keys = [np.empty(0, dtype=np.uint32) for _ in range(bands)]
+        self._sorted_ids = [np.empty(0, dtype=np.int32) for _ in range(bands)]
+        self._tail_keys = np.empty((MAX_TAIL, bands), dtype=np.uint32)
+        self._tail_ids = np.empty(MAX_TAIL, dtype=np.int32)
+        self._tail_count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return key in self._indexed
+
+    def _band_keys(self, signatures, brand_codes):
+        """Hash every band of each signature, mixed with the claim's brand"""
+        rows = signatures.reshape(len(signatures), self.bands, -1).astype(np.uint64)
+        keys = brand_codes.astype(np.uint64)[:, None] + np.arange(self.bands, dtype=np.uint64)
+        for position in range(rows.shape[2]):
+            keys = (keys * _MIX) ^ rows[:, :, position]
+        return ((keys ^ (keys >> np.uint64(32))) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    def _grow(self, needed):
+        capacity = len(self._keys)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        keys = np.empty(capacity, dtype=self._keys.dtype)
+        keys[:self._count] = self._keys[:self._count]
+        brands = np.empty(capacity, dtype=np.int32)
+        brands[:self._count] = self._brands[:self._count]
+        signatures = np.empty((capacity, self._signatures.shape[1]), dtype=np.uint16)
+        signatures[:self._count] = self._signatures[:self._count]
+        self._keys, self._brands, self._signatures = keys, brands, signatures
+
+    def add(self, key, brand_name, claim):
+        """
+        Index one analyzed claim
+
+        Args:
+            key: Public id of the analysis
+            brand_name: Brand the claim was made for
+            claim: Raw or preprocessed claim text
+        """
+        self.add_many([(key, brand_name, claim)])
+
+    def add_many(self, entries):
+        """
+        Index an iterable of (key, brand_name, claim) tuples
+
+        Claims become visible to queries when the call returns; a large
+        batch is merged into the band arrays in one pass.
+
+        Returns:
+            Number of claims indexed (claims without tokens or with a key
+            that is already indexed are skipped)
+        """
+        entries = iter(entries)
+        new_band_keys = []
+        new_ids = []
+        while True:
+            batch = list(itertools.islice(entries, BULK_CHUNK))
+            if not batch:
+                break
+            chunk = []
+            for key, brand_name, claim in batch:
+                if key in self._indexed:
+                    continue
+                encoded = claim_bytes(claim)
+                if encoded:
+                    chunk.append((key, normalize(brand_name), encoded))
+            if not chunk:
+                continue
+            signatures = self.hasher.signatures([encoded for _, _, encoded in chunk])
+            with self._lock:
+                # Another thread may have indexed some of the keys meanwhile
+                fresh = [i for i, (key, _, _) in enumerate(chunk) if key not in self._indexed]
+                if not fresh:
+                    continue
+                chunk = [chunk[i] for i in fresh]
+                band_keys, ids = self._store(chunk, signatures[fresh])
+            new_band_keys.append(band_keys)
+            new_ids.append(ids)
+
+        if not new_ids:
+            return 0
+        band_keys = np.concatenate(new_band_keys)
+        ids = np.concatenate(new_ids)
+        with self._lock:
+            if self._tail_count + len(ids) > MAX_TAIL:
+                self._merge(band_keys, ids)
+            else:
+                tail_end = self._tail_count + len(ids)
+                self._tail_keys[self._tail_count:tail_end] = band_keys
+                self._tail_ids[self._tail_count:tail_end] = ids
+                self._tail_count = tail_end
+        return len(ids)
+
+    def _store(self, chunk, signatures):
+        """Append claims to the row arrays and return their (band keys, row ids)"""
+        start = self._count
+        end = start + len(chunk)
+        self._grow(end)
+        brand_codes = np.array(
+            [self._brand_codes.setdefault(brand, len(self._brand_codes)) for _, brand, _ in chunk],
+            dtype=np.int32,
+        )
+        self._keys[start:end] = [key.encode('ascii') for key, _, _ in chunk]
+        self._indexed.update(key for key, _, _ in chunk)
+        self._brands[start:end] = brand_codes
+        self._signatures[start:end] = signatures & 0xFFFF
+        self._count = end
+        return self._band_keys(signatures, brand_codes), np.arange(start, end, dtype=np.int32)
+
+    def _merge(self, band_keys=None, ids=None):
+        """Merge the tail (plus optional new rows) into the sorted band arrays"""
+        tail_keys = self._tail_keys[:self._tail_count]
+        tail_ids = self._tail_ids[:self._tail_count]
+        if band_keys is not None:
+            tail_keys = np.concatenate([tail_keys, band_keys])
+            tail_ids = np.concatenate([tail_ids, ids])
+
+        for band in range(self.bands):
+            order = np.argsort(tail_keys[:, band], kind='stable')
+            new_keys = tail_keys[order, band]
+            positions = np.searchsorted(self._sorted_keys[band], new_keys, side='right')
+            self._sorted_keys[band] = np.insert(self._sorted_keys[band], positions, new_keys)
+            self._sorted_ids[band] = np.insert(self._sorted_ids[band], positions, tail_ids[order])
+        self._tail_count = 0
+
+    def query(self, brand_name, claim, threshold=None):
+        """
+        Find earlier claims of the same brand that are near-duplicates
+
+        Args:
+            brand_name: Brand the claim is made for
+            claim: Raw or preprocessed claim text
+            threshold: Minimum estimated Jaccard similarity (defaults to the
+                index threshold)
+
+        Returns:
+            List of (key, similarity) tuples, most similar first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        brand_code = self._brand_codes.get(normalize(brand_name))
+        encoded = claim_bytes(claim)
+        if brand_code is None or not encoded:
+            return []
+        signature = self.hasher.signatures([encoded])
+        band_keys = self._band_keys(signature, np.array([brand_code]))[0]
+
+        with self._lock:
+            candidates = [self._tail_ids[:self._tail_count][
+                (self._tail_keys[:self._tail_count] == band_keys).any(axis=1)
+            ]]
+            for band in range(self.bands):
+                # Search with a uint32 array; a Python int would cast the whole array
+                band_key = band_keys[band:band + 1]
+                sorted_keys = self._sorted_keys[band]
+                lo = sorted_keys.searchsorted(band_key, side='left')[0]
+                hi = sorted_keys.searchsorted(band_key, side='right')[0]
+                candidates.append(self._sorted_ids[band][lo:hi])
+            ids = np.unique(np.concatenate(candidates))
+            # Band keys can collide across brands
+            ids = ids[self._brands[ids] == brand_code]
+            similarities = (self._signatures[ids] == (signature[0] & 0xFFFF)).mean(axis=1)
+            keys = self._keys[ids]
+
+        order = np.argsort(-similarities, kind='stable')
+        return [
+            (keys[i].decode('ascii'), float(similarities[i]))
+            for i in order if similarities[i] >= threshold
+        ]
+
+    def find(self, brand_name, tagline, claim, version):
+        """
+        Return the stored analysis of the closest near-duplicate claim
+
+        Only matches with the same tagline, the same evidence corpus version
+        and the same negation words and numbers as the claim (see
+        claim_qualifiers) are reused; for others the caller should run the
+        full analysis.
+
+        Args:
+            brand_name: Brand the claim is made for
+            tagline: Marketing tagline of the claim
+            claim: Raw claim text
+            version: Current evidence corpus version (RAGEngine.version)
+
+        Returns:
+            Analysis dict of the earlier claim with 'near_duplicate_of' set to
+            {'id', 'claim', 'similarity'}, or None
+        """
+        if self.load is None:
+            return None
+        qualifiers = None
+        for key, similarity in self.query(brand_name, claim):
+            prior = self.load(key)
+            if prior is None or prior.get('verdict') == 'Error':
+                continue
+            if prior.get('corpus_version') != version:
+                logger.debug(f"Near-duplicate {key} ({similarity:.2f}) used other evidence")
+                continue
+            if normalize(prior.get('tagline') or '') != normalize(tagline):
+                continue
+            if qualifiers is None:
+                qualifiers = claim_qualifiers(claim)
+            if claim_qualifiers(prior.get('claim') or '') != qualifiers:
+                logger.debug(f"Near-duplicate {key} ({similarity:.2f}) differs in negations or numbers")
+                continue
+            results = {name: value for name, value in prior.items() if name != 'id'}
+            results['near_duplicate_of'] = {
+                'id': key,
+                'claim': prior.get('claim'),
+                'similarity': round(similarity, 4),
+            }
+            return results
+        return None
+
+    def stats(self):
+        """Return the index size and configuration"""
+        with self._lock:
+            return {
+                'claims': self._count,
+                'brands': len(self._brand_codes),
+                'threshold': self.threshold,
+                'num_perm': self.hasher.num_perm,
+                'bands': self.bands,
+                'unmerged': self._tail_count,
+            }
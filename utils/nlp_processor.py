@@ -1,7 +1,10 @@
 import re
 import logging
 import string
-from collections import Counter
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+from utils.hashed_vectors import HashingVectorizer
 
 logger = logging.getLogger(__name__)
 
@@ -34,26 +37,101 @@ def normalize_indian_text(text):
     """
     # For this simplified version, we just return the text as is
     # but keep track of any Devanagari characters
-    has_devanagari = bool(re.search(r'[\u0900-\u097F]', text))
-    logger.info(f"Text contains Devanagari script: {has_devanagari}")
+    if logger.isEnabledFor(logging.DEBUG):
+        has_devanagari = bool(re.search(r'[\u0900-\u097F]', text))
+        logger.debug("Text contains Devanagari script: %s", has_devanagari)
     return text
 
-def tokenize(text):
-    """Simple tokenizer function"""
-    # Convert to lowercase
-    text = text.lower()
+# Translation table mapping punctuation to spaces, built once
+PUNCTUATION_TABLE = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+
+# Default size of the per-tokenizer LRU cache
+DEFAULT_CACHE_SIZE = 4096
+
+# Result of a single tokenizer pass:
+#   tokens: tuple of tokens in order, stopwords removed
+#   counts: Counter of token -> occurrences (do not mutate, it may be cached)
+#   term_ids: dict of token -> vocabulary id for tokens known to the vocabulary
+TokenizedText = namedtuple('TokenizedText', ['tokens', 'counts', 'term_ids'])
+
+class Tokenizer:
+    """
+    Reusable single-pass tokenizer
+    
+    Lowercases, strips punctuation with a precompiled translation table and
+    removes stopwords, producing the token sequence, token counts and (when
+    bound to an index vocabulary) term ids in one pass. Results for repeated
+    inputs such as popular taglines are served from a bounded LRU cache.
+    """
     
-    # Replace punctuation with spaces
-    translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-    text = text.translate(translator)
+    def __init__(self, vocabulary=None, cache_size=DEFAULT_CACHE_SIZE, stopwords=STOPWORDS):
+        """
+        Initialize the tokenizer
+        
+        Args:
+            vocabulary: Optional dict-like token -> term id mapping to intern against
+            cache_size: Maximum number of cached inputs (0 disables caching)
+            stopwords: Set of tokens to drop
+        """
+        self.vocabulary = vocabulary
+        self.stopwords = stopwords
+        if cache_size:
+            self._analyze_cached = lru_cache(maxsize=cache_size)(self._analyze)
+        else:
+            self._analyze_cached = self._analyze
     
-    # Split by whitespace
-    tokens = text.split()
+    def _analyze(self, text):
+        stopwords = self.stopwords
+        tokens = tuple(
+            t for t in text.lower().translate(PUNCTUATION_TABLE).split()
+            if t not in stopwords
+        )
+        counts = Counter(tokens)
+        
+        term_ids = None
+        if self.vocabulary is not None:
+            term_ids = {}
+            for token in counts:
+                term_id = self.vocabulary.get(token)
+                if term_id is not None:
+                    term_ids[token] = term_id
+        
+        return TokenizedText(tokens, counts, term_ids)
     
-    # Remove stopwords
-    tokens = [t for t in tokens if t not in STOPWORDS]
+    def analyze(self, text, cache=True):
+        """
+        Tokenize text in a single pass
+        
+        Args:
+            text: Text to tokenize
+            cache: Whether to use the LRU cache (disable for one-off bulk input)
+            
+        Returns:
+            TokenizedText
+        """
+        if cache:
+            return self._analyze_cached(text)
+        return self._analyze(text)
     
-    return tokens
+    def tokenize(self, text, cache=True):
+        """Return the list of tokens in text"""
+        return list(self.analyze(text, cache).tokens)
+    
+    def keywords(self, text, n=5):
+        """Return the n most frequent tokens in text"""
+        return [word for word, count in self.analyze(text).counts.most_common(n)]
+    
+    def cache_info(self):
+        """Return LRU cache statistics, or None if caching is disabled"""
+        cache_info = getattr(self._analyze_cached, 'cache_info', None)
+        return cache_info() if cache_info else None
+
+# Shared tokenizer behind the module-level helpers
+default_tokenizer = Tokenizer()
+
+def tokenize(text):
+    """Simple tokenizer function"""
+    return default_tokenizer.tokenize(text)
 
 def preprocess_text(text):
     """
@@ -66,47 +144,33 @@ def preprocess_text(text):
     lang = detect_language(text)
     if lang == 'mixed':
         text = normalize_indian_text(text)
-        logger.info("Detected and normalized mixed language content")
+        logger.debug("Detected and normalized mixed language content")
     
-    # Basic cleaning
-    text = text.strip()
-    text = re.sub(r'\s+', ' ', text)  # Remove extra whitespace
-    
-    # Tokenize and filter
-    tokens = tokenize(text)
+    # Tokenize and filter (whitespace is collapsed by the tokenizer)
+    tokens = default_tokenizer.analyze(text).tokens
     
     # Join tokens back into text
     cleaned_text = ' '.join(tokens)
     
-    logger.debug(f"Preprocessed text: '{text}' -> '{cleaned_text}'")
+    logger.debug("Preprocessed text: '%s' -> '%s'", text, cleaned_text)
     return cleaned_text
 
 def extract_keywords(text, n=5):
     """Extract key terms from text using frequency-based approach"""
-    # Tokenize the text
-    tokens = tokenize(text)
-    
-    # Count token frequencies
-    counter = Counter(tokens)
-    
-    # Get the most common tokens
-    common_tokens = counter.most_common(n)
-    
-    # Extract just the keywords
-    keywords = [word for word, count in common_tokens]
-    
-    return keywords
+    return default_tokenizer.keywords(text, n)
 
 def get_text_embedding(text, model=None):
     """
-    Simplified embedding function for demo purposes
-    In a real implementation, this would use a proper embedding model
-    """
-    # For this simplified version, we just create a bag-of-words representation
-    tokens = tokenize(text)
-    unique_tokens = set(tokens)
+    Return a hashed dense embedding of text
     
-    # Create a simple "embedding" as a dictionary of token presence
-    embedding = {token: 1 for token in unique_tokens}
-    
-    return embedding
+    Args:
+        text: Text to embed
+        model: Optional utils.hashed_vectors.HashingVectorizer, e.g. the one of
+            a DenseIndex so the embedding uses its IDF weights
+        
+    Returns:
+        L2-normalized float32 vector of model.dim dimensions
+    """
+    if model is None:
+        model = HashingVectorizer()
+    return model.transform([default_tokenizer.analyze(text).tokens])[0]
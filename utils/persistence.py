@@ -0,0 +1,211 @@
+"""
+Write-behind persistence of analysis results.
+
+Requests hand finished analyses to an AnalysisWriter and return at once.
+A background thread drains the queue and writes each batch of claims and
+their evidence rows in a single transaction. Until a result is committed
+it is served from an in-memory pending map; wait() blocks until a given
+analysis is committed, so a request can redirect to a results page that
+another worker process may serve. If a batch fails, its analyses are
+retried one per transaction; the most recent ones that still fail are kept
+in memory (with the error recorded), the older ones are dropped.
+"""
+import atexit
+import logging
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+# Analyses whose write failed that are kept in memory
+DEFAULT_MAX_FAILED = 1000
+
+
+class AnalysisWriter:
+    """Background writer that bulk-inserts Claim and Evidence rows"""
+
+    def __init__(self, app, db, claim_model, evidence_model,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_failed=DEFAULT_MAX_FAILED):
+        """
+        Args:
+            app: Flask app whose context is used for database access
+            db: Flask-SQLAlchemy extension
+            claim_model: Claim model class
+            evidence_model: Evidence model class
+            batch_size: Maximum analyses written per transaction
+            flush_interval: Seconds to wait for more work before writing a batch
+            max_failed: Analyses whose write failed that are still served by get()
+        """
+        self.app = app
+        self.db = db
+        self.claim_model = claim_model
+        self.evidence_model = evidence_model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_failed = max_failed
+
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._failed = OrderedDict()
+        self._pending_lock = threading.Lock()
+        # Notified whenever analyses leave the pending map
+        self._written = threading.Condition(self._pending_lock)
+        self._thread = threading.Thread(target=self._run, name='analysis-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, analysis_results, public_id=None):
+        """
+        Queue an analysis for persistence
+
+        Args:
+            analysis_results: Dict produced by run_analysis
+            public_id: Id to store the analysis under (default: a new random id)
+
+        Returns:
+            Public id of the analysis, usable with get()
+        """
+        public_id = public_id or uuid.uuid4().hex
+        results = dict(analysis_results, id=public_id)
+        with self._pending_lock:
+            self._pending[public_id] = results
+        self._queue.put(results)
+        return public_id
+
+    def get(self, public_id):
+        """Return a stored or still-pending analysis, or None"""
+        with self._pending_lock:
+            results = self._pending.get(public_id) or self._failed.get(public_id)
+        if results is not None:
+            return results
+
+        claim = self.claim_model.query.filter_by(public_id=public_id).first()
+        return claim.to_results() if claim is not None else None
+
+    def wait(self, public_id, timeout=None):
+        """
+        Block until an analysis has been written
+
+        Args:
+            public_id: Id returned by submit()
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if the analysis is in the database, False if its write failed
+            or did not finish within timeout
+        """
+        with self._written:
+            written = self._written.wait_for(lambda: public_id not in self._pending, timeout)
+            return written and public_id not in self._failed
+
+    def flush(self):
+        """Block until everything queued so far has been written"""
+        self._queue.join()
+
+    def close(self):
+        """Write remaining analyses and stop the background thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Collect whatever else arrives shortly after, up to batch_size
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            stop = batch[-1] is None
+            analyses = [results for results in batch if results is not None]
+            if analyses:
+                self._write(analyses)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, analyses):
+        with metrics.stage_seconds.time('db_write'), self.app.app_context():
+            session = self.db.session
+            try:
+                if self._commit(session, analyses):
+                    logger.debug("Persisted %d analyses", len(analyses))
+                    written = analyses
+                elif len(analyses) == 1:
+                    written = []
+                else:
+                    # One bad row fails the whole batch; keep the others
+                    written = [results for results in analyses if self._commit(session, [results])]
+            finally:
+                session.remove()
+
+        failed = len(analyses) - len(written)
+        if failed:
+            metrics.persist_failures_total.inc(amount=failed)
+            logger.error(f"Could not persist {failed} of {len(analyses)} analyses; "
+                         f"the last {self.max_failed} failed ones are kept in memory only")
+        written_ids = {results['id'] for results in written}
+        with self._written:
+            for results in analyses:
+                pending = self._pending.pop(results['id'], None)
+                if pending is not None and results['id'] not in written_ids:
+                    self._failed[results['id']] = pending
+                    while len(self._failed) > self.max_failed:
+                        self._failed.popitem(last=False)
+            self._written.notify_all()
+
+    def _commit(self, session, analyses):
+        """Insert analyses in one transaction; on failure roll back, record the error and return False"""
+        try:
+            session.add_all([self._to_claim(results) for results in analyses])
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Error persisting {len(analyses)} analyses: {e}")
+            if len(analyses) == 1:
+                with self._pending_lock:
+                    if analyses[0]['id'] in self._pending:
+                        self._pending[analyses[0]['id']] = dict(analyses[0], persist_error=str(e))
+            return False
+
+    def _to_claim(self, results):
+        duplicate_of = results.get('near_duplicate_of') or {}
+        claim = self.claim_model(
+            public_id=results['id'],
+            brand_name=results['brand_name'],
+            tagline=results['tagline'],
+            claim_text=results['claim'],
+            domain=results.get('domain'),
+            corpus_version=results.get('corpus_version'),
+            verdict=results['verdict'],
+            score=results['score'],
+            explanation=results['explanation'],
+            duplicate_of=duplicate_of.get('id'),
+            duplicate_similarity=duplicate_of.get('similarity')
+        )
+        claim.evidences = [
+            self.evidence_model(
+                source=item['metadata'].get('source') or 'Unknown',
+                text=item['text'],
+                relevance_score=item['relevance_score'],
+                url=item['metadata'].get('url'),
+                domain=item['metadata'].get('domain'),
+                publication_date=item['metadata'].get('publication_date')
+            )
+            for item in results['evidence']
+        ]
+        return claim
@@ -0,0 +1,295 @@
+"""
+Token positions of an inverted index, for phrase and proximity matching.
+
+Every posting (term, document) of an InvertedIndex gets the list of
+positions at which the term occurs in the document, stored as deltas from
+the previous position in one array of the smallest unsigned dtype that fits.
+The position lists are laid out in posting order, so posting i's positions
+are deltas[offsets[i]:offsets[i + 1]].
+
+Positions count tokens as the tokenizer emits them, i.e. after stopword
+removal: "cure for COVID-19" matches the phrase "cure covid 19".
+
+Phrase and proximity queries never read document text. They decode the
+position lists of the query terms, turn them into (document, position)
+keys and merge those sorted key arrays with NumPy set operations and
+binary searches.
+"""
+import numpy as np
+
+# Key of a position: doc_id * _STRIDE + position
+_STRIDE = np.int64(1 << 32)
+
+
+def _delta_dtype(max_delta):
+    """Return the smallest unsigned dtype holding deltas up to max_delta"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_delta <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def _find_sorted(haystack, needles):
+    """Return the indexes into sorted haystack of the sorted needles it contains"""
+    found = np.searchsorted(haystack, needles)
+    inside = found < len(haystack)
+    found = found[inside]
+    return found[haystack[found] == needles[inside]]
+
+
+def claim_phrases(tokens):
+    """
+    Split a token sequence into the phrases matched against documents
+
+    Args:
+        tokens: Sequence of claim tokens
+
+    Returns:
+        List of adjacent token pairs, or the single token of a one-word claim
+    """
+    tokens = list(tokens)
+    if len(tokens) == 1:
+        return [tuple(tokens)]
+    return list(zip(tokens, tokens[1:]))
+
+
+class PositionalIndex:
+    """Delta-encoded token positions for every posting of an InvertedIndex"""
+
+    __slots__ = ('index', 'offsets', 'deltas')
+
+    def __init__(self, index, offsets, deltas):
+        """
+        Args:
+            index: InvertedIndex whose postings the positions belong to
+            offsets: int64 array of num_postings + 1 positions into deltas
+            deltas: Unsigned array; the first delta of a posting is its first
+                position, every later one the gap to the previous position
+        """
+        self.index = index
+        self.offsets = offsets
+        self.deltas = deltas
+
+    @classmethod
+    def build(cls, index, token_lists):
+        """
+        Record the positions of every token of every document
+
+        Args:
+            index: InvertedIndex built from the same token lists
+            token_lists: Sequence of token sequences in document order
+
+        Returns:
+            PositionalIndex
+        """
+        vocabulary = index.vocabulary
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64,
+                              count=len(token_lists))
+        term_ids = np.fromiter(
+            (vocabulary[token] for tokens in token_lists for token in tokens),
+            dtype=np.int64, count=int(lengths.sum()),
+        )
+        return cls._from_occurrences(index, term_ids, lengths)
+
+    @classmethod
+    def _from_occurrences(cls, index, term_ids, lengths):
+        """Build from the term id of every token, documents back to back"""
+        doc_ids = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        starts = np.cumsum(lengths) - lengths
+        positions = np.arange(len(term_ids), dtype=np.int64) - np.repeat(starts, lengths)
+        return cls._from_triples(index, term_ids, doc_ids, positions)
+
+    @classmethod
+    def _from_triples(cls, index, term_ids, doc_ids, positions):
+        """Build from unordered (term id, doc id, position) occurrences"""
+        # Sorting by (term, doc, position) follows the index's posting order
+        order = np.lexsort((positions, doc_ids, term_ids))
+        term_ids = term_ids[order]
+        doc_ids = doc_ids[order]
+        positions = positions[order]
+
+        deltas = np.empty_like(positions)
+        if len(positions):
+            deltas[0] = positions[0]
+            deltas[1:] = positions[1:] - positions[:-1]
+            new_posting = np.ones(len(positions), dtype=bool)
+            new_posting[1:] = (term_ids[1:] != term_ids[:-1]) | (doc_ids[1:] != doc_ids[:-1])
+            deltas[new_posting] = positions[new_posting]
+        dtype = _delta_dtype(int(deltas.max()) if len(deltas) else 0)
+
+        offsets = np.zeros(index.num_postings + 1, dtype=np.int64)
+        np.cumsum(index.term_freqs.astype(np.int64), out=offsets[1:])
+        if offsets[-1] != len(positions):
+            raise ValueError("Token lists do not match the index postings")
+        return cls(index, offsets, deltas.astype(dtype))
+
+    def with_changes(self, index, keep_mask, added_token_lists):
+        """
+        Return the positions for the index produced by InvertedIndex.with_changes
+
+        Positions of kept documents are decoded and renumbered rather than
+        recomputed from text; only the added documents' tokens are read.
+
+        Args:
+            index: The new InvertedIndex
+            keep_mask: Boolean array over current documents; False removes a document
+            added_token_lists: Token lists of the documents appended after the kept ones
+
+        Returns:
+            PositionalIndex for index
+        """
+        old = self.index
+        tf = np.diff(self.offsets)
+        posting_terms = np.repeat(np.arange(len(old.offsets) - 1), np.diff(old.offsets))
+        doc_ids = np.repeat(old.doc_ids.astype(np.int64), tf)
+        term_ids = np.repeat(posting_terms, tf)
+        positions = self._decode(np.arange(old.num_postings), tf)
+
+        kept = keep_mask[doc_ids]
+        new_doc_ids = np.cumsum(keep_mask) - 1
+
+        # Term ids are stable across with_changes; new terms are appended
+        vocabulary = index.vocabulary
+        first_new_doc = int(np.count_nonzero(keep_mask))
+        lengths = np.fromiter((len(tokens) for tokens in added_token_lists), dtype=np.int64,
+                              count=len(added_token_lists))
+        added_terms = np.fromiter(
+            (vocabulary[token] for tokens in added_token_lists for token in tokens),
+            dtype=np.int64, count=int(lengths.sum()),
+        )
+        added_docs = first_new_doc + np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        starts = np.cumsum(lengths) - lengths
+        added_positions = np.arange(len(added_terms), dtype=np.int64) - np.repeat(starts, lengths)
+
+        return PositionalIndex._from_triples(
+            index,
+            np.concatenate([term_ids[kept], added_terms]),
+            np.concatenate([new_doc_ids[doc_ids[kept]], added_docs]),
+            np.concatenate([positions[kept], added_positions]),
+        )
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.deltas.nbytes
+
+    def _decode(self, postings, lengths):
+        """Return the absolute positions of the given postings, back to back"""
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+        gather = np.arange(total, dtype=np.int64) + np.repeat(self.offsets[postings] - starts, lengths)
+        running = np.cumsum(self.deltas[gather], dtype=np.int64)
+        # Restart the running sum at the first position of every posting
+        first = starts[lengths > 0]
+        base = running[first] - self.deltas[gather[first]].astype(np.int64)
+        return running - np.repeat(base, lengths[lengths > 0])
+
+    def term_positions(self, term_id, doc_ids=None):
+        """
+        Return the occurrences of a term
+
+        Args:
+            term_id: Term id, or None for an unknown term
+            doc_ids: Optional sorted array of document ids to restrict to
+
+        Returns:
+            (doc_ids, positions) arrays, sorted by document then position
+        """
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        start, end = self.index.offsets[term_id], self.index.offsets[term_id + 1]
+        posting_docs = self.index.doc_ids[start:end]
+        if doc_ids is None:
+            selected = np.arange(end - start)
+        else:
+            selected = _find_sorted(posting_docs, doc_ids)
+        postings = start + selected
+        lengths = self.offsets[postings + 1] - self.offsets[postings]
+        docs = np.repeat(posting_docs[selected].astype(np.int64), lengths)
+        return docs, self._decode(postings, lengths)
+
+    def phrase_occurrences(self, term_ids, doc_ids=None):
+        """
+        Return where a phrase occurs
+
+        Args:
+            term_ids: Term ids of the phrase in order (None for unknown terms)
+            doc_ids: Optional sorted array of document ids to restrict to
+
+        Returns:
+            (doc_ids, start positions) arrays of every occurrence, sorted
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        if not term_ids or any(term_id is None for term_id in term_ids):
+            return empty
+
+        # Only documents containing every term can contain the phrase
+        # (binary searches of the shortest list in the longer ones)
+        offsets = self.index.offsets
+        candidates = doc_ids
+        for term_id in sorted(set(term_ids), key=lambda t: offsets[t + 1] - offsets[t]):
+            postings = self.index.doc_ids[offsets[term_id]:offsets[term_id + 1]]
+            candidates = postings if candidates is None else postings[_find_sorted(postings, candidates)]
+            if not len(candidates):
+                return empty
+
+        # A phrase starts at p if term i occurs at p + i for every i
+        keys = None
+        for offset, term_id in enumerate(term_ids):
+            docs, positions = self.term_positions(term_id, candidates)
+            valid = positions >= offset
+            term_keys = docs[valid] * _STRIDE + (positions[valid] - offset)
+            keys = term_keys if keys is None else np.intersect1d(keys, term_keys, assume_unique=True)
+            if not len(keys):
+                return empty
+        return keys // _STRIDE, keys % _STRIDE
+
+    def phrase_counts(self, term_ids, doc_ids):
+        """
+        Count the occurrences of a phrase in each of the given documents
+
+        Args:
+            term_ids: Term ids of the phrase in order
+            doc_ids: Sorted array of unique document ids
+
+        Returns:
+            int64 array of counts, parallel to doc_ids
+        """
+        docs, _ = self.phrase_occurrences(term_ids, doc_ids)
+        return np.bincount(np.searchsorted(doc_ids, docs), minlength=len(doc_ids))[:len(doc_ids)]
+
+    def near(self, phrases, term_ids, window, doc_ids):
+        """
+        Find documents where a phrase occurs within window tokens of a term
+
+        Args:
+            phrases: List of phrases, each a sequence of term ids
+            term_ids: Term ids to look for around the phrases (e.g. negations)
+            window: Maximum number of tokens between the phrase and the term
+            doc_ids: Sorted array of unique document ids to check
+
+        Returns:
+            Boolean array parallel to doc_ids
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        found = np.zeros(len(doc_ids), dtype=bool)
+        target_keys = []
+        for term_id in set(term_ids):
+            docs, positions = self.term_positions(term_id, doc_ids)
+            target_keys.append(docs * _STRIDE + positions)
+        targets = np.sort(np.concatenate(target_keys)) if target_keys else np.zeros(0, dtype=np.int64)
+        if not len(targets):
+            return found
+
+        for phrase in phrases:
+            docs, starts = self.phrase_occurrences(list(phrase), doc_ids)
+            if not len(docs):
+                continue
+            low = docs * _STRIDE + np.maximum(starts - window, 0)
+            high = docs * _STRIDE + starts + len(phrase) - 1 + window
+            nearest = np.searchsorted(targets, low)
+            in_range = nearest < len(targets)
+            in_range[in_range] = targets[nearest[in_range]] <= high[in_range]
+            found[np.searchsorted(doc_ids, docs[in_range])] = True
+        return found
@@ -0,0 +1,167 @@
+"""
+Sampling profiler for production requests.
+
+When enabled, a configurable fraction of requests (and every request that
+asks for it with a header) is profiled: while such a request runs, a
+background thread reads its Python stack from sys._current_frames() every
+few milliseconds and counts it. Stacks are aggregated in memory in the
+collapsed format used by flamegraph.pl and speedscope ("frame;frame;frame
+count" per line), keyed by function rather than line so they stay few.
+
+Profiled code runs unmodified (no tracing hook is installed), so the cost
+to a profiled request is the sampler thread briefly holding the GIL; when
+profiling is disabled no profiler exists and requests pay nothing beyond a
+None check.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds between samples (200 Hz)
+DEFAULT_INTERVAL = 0.005
+
+# Fraction of requests profiled
+DEFAULT_RATE = 0.01
+
+# Distinct stacks kept; samples of further stacks are counted as dropped
+DEFAULT_MAX_STACKS = 20000
+
+# Stack frames kept per sample, innermost first
+MAX_DEPTH = 128
+
+
+class SamplingProfiler:
+    """Samples the stacks of selected threads and aggregates them"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, rate=DEFAULT_RATE,
+                 max_stacks=DEFAULT_MAX_STACKS):
+        """
+        Args:
+            interval: Seconds between samples
+            rate: Fraction of should_profile() calls that select a request
+            max_stacks: Maximum number of distinct stacks kept
+        """
+        self.interval = interval
+        self.rate = rate
+        self.max_stacks = max_stacks
+
+        self._active = {}
+        self._counts = {}
+        self._labels = {}
+        self._samples = 0
+        self._dropped = 0
+        self._profiled = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def should_profile(self, forced=False):
+        """Decide whether to profile a unit of work (forced, or with probability rate)"""
+        return forced or random.random() < self.rate
+
+    def begin(self, root):
+        """
+        Start sampling the calling thread
+
+        Args:
+            root: Frame name placed at the root of its stacks, e.g. the endpoint
+        """
+        with self._lock:
+            self._active[threading.get_ident()] = root
+            self._profiled += 1
+        self._wake.set()
+
+    def end(self):
+        """Stop sampling the calling thread"""
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    @contextmanager
+    def profile(self, root):
+        """Sample the calling thread inside the with block"""
+        self.begin(root)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def collapsed(self):
+        """Return the aggregated stacks in collapsed format, most frequent first"""
+        with self._lock:
+            counts = sorted(self._counts.items(), key=lambda item: -item[1])
+        return ''.join(f"{stack} {count}\n" for stack, count in counts)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'rate': self.rate,
+                'profiled': self._profiled,
+                'active': len(self._active),
+                'samples': self._samples,
+                'stacks': len(self._counts),
+                'dropped_samples': self._dropped,
+            }
+
+    def reset(self):
+        """Discard the aggregated stacks and counters"""
+        with self._lock:
+            self._counts = {}
+            self._samples = 0
+            self._dropped = 0
+            self._profiled = 0
+
+    def _label(self, code):
+        """Return the frame name of a code object: 'qualified name (file:first line)'"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(os.getcwd()):
+                filename = os.path.relpath(filename)
+            name = getattr(code, 'co_qualname', code.co_name)
+            label = self._labels[code] = f"{name} ({filename}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        while not self._stopped:
+            if not self._active:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+
+            frames = sys._current_frames()
+            with self._lock:
+                active = list(self._active.items())
+            stacks = []
+            for thread_id, root in active:
+                frame = frames.get(thread_id)
+                names = []
+                while frame is not None and len(names) < MAX_DEPTH:
+                    names.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                names.append(root)
+                stacks.append(';'.join(reversed(names)))
+            del frames
+
+            with self._lock:
+                for stack in stacks:
+                    self._samples += 1
+                    if stack in self._counts:
+                        self._counts[stack] += 1
+                    elif len(self._counts) < self.max_stacks:
+                        self._counts[stack] = 1
+                    else:
+                        self._dropped += 1
+            time.sleep(self.interval)
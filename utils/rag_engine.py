@@ -1,59 +1,712 @@
+import hashlib
+import json
 import logging
-import re
-from collections import Counter
-from utils.nlp_processor import preprocess_text, tokenize, extract_keywords
+import sys
+import threading
+import time
+import numpy as np
+from utils.inverted_index import InvertedIndex, DocumentFeatures, DEFAULT_K1, DEFAULT_B, top_k
+from utils import metrics
+from utils.evidence_store import CategoryColumn, EvidenceMetadata, StringColumn, is_mapped
+from utils.hashed_vectors import DenseIndex
+from utils.positional_index import PositionalIndex, claim_phrases
+from utils.nlp_processor import Tokenizer, default_tokenizer
 
 logger = logging.getLogger(__name__)
 
+# Minimum score relative to the best match for evidence to be returned
+RELEVANCE_THRESHOLD = 0.3
+
+# A domain-filtered search with fewer matches falls back to the whole corpus
+MIN_DOMAIN_MATCHES = 3
+
+# Weight of the dense cosine similarity in hybrid retrieval (BM25 gets the rest)
+DEFAULT_DENSE_WEIGHT = 0.3
+
+# Hybrid retrieval fuses the top k * HYBRID_CANDIDATES of each ranking
+HYBRID_CANDIDATES = 4
+
+# Documents without keyword matches need this cosine similarity to be fused;
+# below it, hashed vectors mostly agree by feature collisions
+MIN_DENSE_SIMILARITY = 0.25
+
+# Maximum relative score boost of a document containing every claim phrase
+PHRASE_BOOST = 0.5
+
+# Phrase matching reranks the top k * PHRASE_CANDIDATES keyword matches
+PHRASE_CANDIDATES = 4
+
+class DomainPartitions:
+    """
+    Per-domain sub-indexes of one index, built together on first use
+    
+    Sub-indexes keep the parent index's term ids and BM25 weights, so a
+    domain-filtered search ranks documents exactly as the full index would,
+    but only reads the postings of that domain's evidence.
+    """
+    
+    def __init__(self, index, metadata):
+        self._index = index
+        self._metadata = metadata
+        self._partitions = None
+        self._lock = threading.Lock()
+    
+    def get(self, domain):
+        """Return (sub_index, doc_map) for a domain, or None if no evidence has it"""
+        partitions = self._partitions
+        if partitions is None:
+            with self._lock:
+                if self._partitions is None:
+                    self._partitions = self._build()
+                partitions = self._partitions
+        return partitions.get(domain)
+    
+    def _build(self):
+        if isinstance(self._metadata, EvidenceMetadata):
+            domains = self._metadata.column('domain')
+        else:
+            domains = CategoryColumn.from_values(m.get('domain') for m in self._metadata)
+        partitions = {}
+        for domain, mask in domains.masks():
+            if domain:
+                partitions[domain] = self._index.subset(mask)
+        logger.info(f"Built domain sub-indexes for {len(partitions)} domains")
+        return partitions
+    
+    def warm_up(self, prune=False):
+        """Build the sub-indexes (and their pruning bounds) now rather than on first use"""
+        self.get(None)
+        if prune:
+            for sub_index, _ in self._partitions.values():
+                sub_index.max_impacts
+    
+    def memory_usage(self):
+        """Return bytes held by the sub-indexes beyond what they share with the index"""
+        shared = {id(array) for array in self._index.arrays().values()}
+        total = 0
+        for sub_index, doc_map in (self._partitions or {}).values():
+            arrays = [a for a in sub_index.arrays().values() if id(a) not in shared]
+            total += sum(a.nbytes for a in arrays) + doc_map.nbytes
+        return total
+    
+    def search(self, term_weights, k, domain, stats=None, prune=False):
+        """
+        Search one domain, falling back to the whole index on too few matches
+        
+        Args:
+            term_weights: Dict mapping term id -> query weight
+            k: Number of documents to return
+            domain: Domain to search, or None for the whole index
+            stats: Optional dict that receives search counters (summed over
+                the domain search and any fallback) plus 'scope'
+            prune: Use MaxScore dynamic pruning
+            
+        Returns:
+            List of (doc_idx, score) tuples with doc ids of the full index
+        """
+        partition = self.get(domain) if domain else None
+        domain_stats = {}
+        if partition is not None:
+            sub_index, doc_map = partition
+            matches = sub_index.search(term_weights, k, stats=domain_stats, prune=prune)
+            if len(matches) >= min(k, MIN_DOMAIN_MATCHES):
+                if stats is not None:
+                    stats.update(domain_stats, scope='domain')
+                return [(int(doc_map[doc_idx]), score) for doc_idx, score in matches]
+        
+        matches = self._index.search(term_weights, k, stats=stats, prune=prune)
+        if stats is not None:
+            for key, value in domain_stats.items():
+                stats[key] += value
+            stats['scope'] = 'fallback' if partition is not None else 'global'
+        return matches
+
+class DenseVectors:
+    """
+    Hashed dense vectors of one generation's documents, built on first use
+    
+    Only hybrid retrieval reads them, so engines that never use it never
+    pay for the matrix.
+    """
+    
+    def __init__(self, texts, dense_index=None):
+        self._texts = texts
+        self._dense_index = dense_index
+        self._lock = threading.Lock()
+    
+    def get(self):
+        """Return the DenseIndex, vectorizing the documents if not done yet"""
+        dense_index = self._dense_index
+        if dense_index is None:
+            with self._lock:
+                if self._dense_index is None:
+                    token_lists = [
+                        default_tokenizer.analyze(text, cache=False).tokens for text in self._texts
+                    ]
+                    self._dense_index = DenseIndex.build(token_lists)
+                    logger.info(f"Built {self._dense_index.vectorizer.dim}-dimensional "
+                                f"dense vectors for {len(token_lists)} documents")
+                dense_index = self._dense_index
+        return dense_index
+    
+    def with_changes(self, texts, keep_mask, added_token_lists):
+        """
+        Return the dense vectors of the next generation
+        
+        Already built vectors are updated incrementally; otherwise the next
+        generation builds its own on first use.
+        """
+        if self._dense_index is None:
+            return DenseVectors(texts)
+        return DenseVectors(texts, self._dense_index.with_changes(keep_mask, added_token_lists))
+    
+    @property
+    def nbytes(self):
+        return self._dense_index.nbytes if self._dense_index is not None else 0
+
+class TokenPositions:
+    """
+    Positional index of one generation's postings, built on first use
+    
+    Engines created from token lists build it right away; snapshot-backed
+    engines re-tokenize their texts the first time phrases are matched.
+    """
+    
+    def __init__(self, index, texts, positional=None):
+        self._index = index
+        self._texts = texts
+        self._positional = positional
+        self._lock = threading.Lock()
+    
+    def get(self):
+        """Return the PositionalIndex, building it if not done yet"""
+        positional = self._positional
+        if positional is None:
+            with self._lock:
+                if self._positional is None:
+                    token_lists = [
+                        default_tokenizer.analyze(text, cache=False).tokens for text in self._texts
+                    ]
+                    self._positional = PositionalIndex.build(self._index, token_lists)
+                    logger.info(f"Built positional index with {len(self._positional.deltas)} positions")
+                positional = self._positional
+        return positional
+    
+    def with_changes(self, index, texts, keep_mask, added_token_lists):
+        """
+        Return the token positions of the next generation
+        
+        An already built positional index is updated incrementally; otherwise
+        the next generation builds its own on first use.
+        """
+        if self._positional is None:
+            return TokenPositions(index, texts)
+        return TokenPositions(
+            index, texts, self._positional.with_changes(index, keep_mask, added_token_lists)
+        )
+    
+    @property
+    def nbytes(self):
+        return self._positional.nbytes if self._positional is not None else 0
+
+class IndexGeneration:
+    """
+    One immutable version of the evidence index and its documents
+    
+    RAGEngine swaps whole generations in a single reference assignment, so a
+    request that read the current generation keeps a consistent view even if
+    the evidence is reloaded while it runs.
+    """
+    
+    __slots__ = ('index', 'texts', 'metadata', 'word_counts', 'tokenizer',
+                 'domains', 'dense', 'positions', 'version', 'generation')
+    
+    def __init__(self, index, texts, metadata, word_counts, version, generation, dense=None,
+                 positions=None):
+        self.index = index
+        self.texts = texts
+        self.metadata = metadata
+        self.word_counts = word_counts
+        self.tokenizer = Tokenizer(vocabulary=index.vocabulary)
+        self.domains = DomainPartitions(index, metadata)
+        self.dense = dense if dense is not None else DenseVectors(texts)
+        self.positions = positions if positions is not None else TokenPositions(index, texts)
+        self.version = version
+        self.generation = generation
+
+def _document_fields(item):
+    """Extract (text, metadata) from a raw evidence item"""
+    return item.get('content', ''), {
+        'id': item.get('id'),
+        'source': item.get('source'),
+        'url': item.get('url'),
+        'domain': item.get('domain'),
+        'publication_date': item.get('publication_date')
+    }
+
+def query_term_weights(tokenized):
+    """
+    Weight every query token by its count, emphasizing the top keywords
+    
+    Args:
+        tokenized: TokenizedText of the combined query
+        
+    Returns:
+        Dict token -> weight, in order of first occurrence
+    """
+    # Extract important keywords to give them more weight
+    keywords = {word for word, count in tokenized.counts.most_common(5)}
+    return {
+        token: (3 if token in keywords else 1) * count
+        for token, count in tokenized.counts.items()
+    }
+
+def relevant_matches(top_matches):
+    """
+    Scale scores relative to the best match and drop weak matches
+    
+    Args:
+        top_matches: List of (doc_idx, score) tuples ordered by descending score
+        
+    Yields:
+        (doc_idx, relevance_score) tuples with relevance in the 0-1 range
+    """
+    max_score = top_matches[0][1] if top_matches else 1
+    
+    for doc_idx, doc_score in top_matches:
+        # Calculate relevance score (0-1 range)
+        relevance_score = doc_score / max_score if max_score > 0 else 0
+        
+        # Only include results with reasonable relevance
+        if relevance_score > RELEVANCE_THRESHOLD:
+            yield doc_idx, relevance_score
+
+def boost_phrases(positional, phrases, keyword_matches, k):
+    """
+    Boost keyword matches that contain claim phrases
+    
+    A document's score is multiplied by 1 + PHRASE_BOOST times the share of
+    phrases it contains, so a document quoting the whole claim gains half its
+    score again.
+    
+    Args:
+        positional: PositionalIndex of the searched index
+        phrases: List of phrases, each a tuple of term ids (None if unknown)
+        keyword_matches: List of (doc_idx, score) tuples
+        k: Number of documents to return
+        
+    Returns:
+        List of (doc_idx, boosted score) tuples ordered by descending score
+    """
+    if not keyword_matches or not phrases:
+        return keyword_matches[:k]
+    doc_ids = np.array([doc_idx for doc_idx, _ in keyword_matches], dtype=np.int64)
+    scores = np.array([score for _, score in keyword_matches])
+    order = np.argsort(doc_ids)
+    hits = np.zeros(len(doc_ids))
+    for phrase in phrases:
+        hits[order] += positional.phrase_counts(phrase, doc_ids[order]) > 0
+    return top_k(doc_ids, scores * (1 + PHRASE_BOOST * hits / len(phrases)), k)
+
+def fuse_scores(keyword_matches, dense_matches, dense_scores, k, dense_weight):
+    """
+    Combine BM25 and dense rankings into one weighted score
+    
+    BM25 scores are scaled by the best keyword match so both signals are in
+    the 0-1 range; negative cosine similarities count as zero. A candidate
+    found only by the dense ranking has a BM25 score of zero.
+    
+    Args:
+        keyword_matches: List of (doc_idx, BM25 score) tuples, best first
+        dense_matches: List of (doc_idx, cosine similarity) tuples
+        dense_scores: Array of every document's cosine similarity to the query
+        k: Number of documents to return
+        dense_weight: Weight of the cosine similarity, between 0 and 1
+        
+    Returns:
+        List of (doc_idx, fused score) tuples ordered by descending score
+    """
+    max_score = keyword_matches[0][1] if keyword_matches else 0
+    keyword_scores = dict(keyword_matches)
+    candidates = np.array(
+        sorted(keyword_scores.keys() | {doc_idx for doc_idx, _ in dense_matches}), dtype=np.int64
+    )
+    if not len(candidates):
+        return []
+    bm25 = np.array([keyword_scores.get(doc_idx, 0.0) for doc_idx in candidates.tolist()])
+    if max_score > 0:
+        bm25 /= max_score
+    cosine = np.maximum(dense_scores[candidates], 0)
+    fused = (1 - dense_weight) * bm25 + dense_weight * cosine
+    positive = fused > 0
+    return top_k(candidates[positive], fused[positive], k)
+
+def memory_report(index, texts, metadata, word_counts=None, domains=None, dense=None,
+                  positions=None):
+    """
+    Return the bytes held by each component of an index and its documents
+    
+    Components backed by a memory-mapped snapshot are counted separately
+    as 'mapped_bytes': their pages live in the OS page cache and are shared
+    by every worker process that maps the same file.
+    
+    Args:
+        index: InvertedIndex
+        texts: Document texts (StringColumn)
+        metadata: Document metadata (EvidenceMetadata or mapped StringColumn)
+        word_counts: Optional array of document word counts
+        domains: Optional DomainPartitions of the index
+        dense: Optional DenseVectors of the documents
+        positions: Optional TokenPositions of the index
+        
+    Returns:
+        Dict with 'documents', per-component 'components' ({'bytes',
+        'mapped'}), 'heap_bytes', 'mapped_bytes' and 'bytes_per_document'
+    """
+    components = {}
+    for name, array in index.arrays().items():
+        components[f'index.{name}'] = (array.nbytes, is_mapped(array))
+    
+    vocabulary = index.vocabulary
+    if hasattr(vocabulary, 'nbytes'):
+        components['vocabulary'] = (vocabulary.nbytes, vocabulary.mapped)
+    else:
+        components['vocabulary'] = (
+            sys.getsizeof(vocabulary)
+            + sum(sys.getsizeof(term) + sys.getsizeof(term_id)
+                  for term, term_id in vocabulary.items()),
+            False,
+        )
+    
+    components['texts'] = (texts.nbytes, texts.mapped)
+    if isinstance(metadata, EvidenceMetadata):
+        for field, nbytes in metadata.memory_usage().items():
+            components[f'metadata.{field}'] = (nbytes, False)
+    else:
+        components['metadata'] = (metadata.nbytes, metadata.mapped)
+    if word_counts is not None:
+        components['word_counts'] = (word_counts.nbytes, is_mapped(word_counts))
+    if domains is not None:
+        components['domain_partitions'] = (domains.memory_usage(), False)
+    if dense is not None:
+        components['dense_vectors'] = (dense.nbytes, False)
+    if positions is not None:
+        components['positions'] = (positions.nbytes, False)
+    
+    heap_bytes = sum(nbytes for nbytes, mapped in components.values() if not mapped)
+    mapped_bytes = sum(nbytes for nbytes, mapped in components.values() if mapped)
+    num_docs = index.num_docs
+    per_document = (heap_bytes + mapped_bytes) / num_docs if num_docs else 0.0
+    return {
+        'documents': num_docs,
+        'components': {
+            name: {'bytes': int(nbytes), 'mapped': mapped}
+            for name, (nbytes, mapped) in components.items()
+        },
+        'heap_bytes': int(heap_bytes),
+        'mapped_bytes': int(mapped_bytes),
+        'bytes_per_document': round(per_document, 1),
+    }
+
+def corpus_version(evidence_data):
+    """Return a content hash identifying a list of evidence items"""
+    payload = json.dumps(evidence_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
 class RAGEngine:
     """Retrieval-Augmented Generation engine for finding relevant evidence"""
     
-    def __init__(self, evidence_data):
+    def __init__(self, evidence_data, k1=DEFAULT_K1, b=DEFAULT_B, version=None,
+                 pruning=True, domain_filter=True, hybrid=False,
+                 dense_weight=DEFAULT_DENSE_WEIGHT, positional=False):
         """
         Initialize the RAG engine
         
         Args:
             evidence_data: Dictionary of evidence items
+            k1: BM25 term-frequency saturation parameter
+            b: BM25 document length normalization parameter
+            version: Identifier of the evidence corpus contents; derived from
+                a hash of evidence_data if not given
+            pruning: Use MaxScore dynamic pruning for top-k retrieval
+            domain_filter: Search only evidence of the claim's domain when
+                one is given to retrieve_evidence
+            hybrid: Fuse BM25 with hashed dense vector similarity
+            dense_weight: Weight of the dense similarity in hybrid retrieval
+            positional: Index token positions, boost documents containing
+                claim phrases and let the claim analyzer detect negated phrases
         """
-        self.evidence_data = evidence_data
+        self.k1 = k1
+        self.b = b
+        self.pruning = pruning
+        self.domain_filter = domain_filter
+        self.hybrid = hybrid
+        self.dense_weight = dense_weight
+        self.positional = positional
+        self._write_lock = threading.Lock()
+        self.last_reload_seconds = None
+        self.reloaded_at = None
         logger.info(f"Initializing RAG engine with {len(evidence_data)} evidence items")
         
         # Process and index evidence data
-        self._create_index()
+        self._current = self._create_index(
+            evidence_data, version if version is not None else corpus_version(evidence_data)
+        )
     
-    def _create_index(self):
-        """Create simple keyword-based index from evidence data"""
-        # Process each evidence item
-        self.texts = []
-        self.metadata = []
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Create a RAG engine backed by a memory-mapped index snapshot
         
-        # Create inverted index (token -> document IDs)
-        self.inverted_index = {}
+        Args:
+            snapshot: An opened utils.index_snapshot.IndexSnapshot
+            
+        Returns:
+            RAGEngine that reads texts, metadata and postings from the snapshot
+        """
+        index = snapshot.load_index()
+        engine = cls.from_components(index, snapshot.texts, snapshot.metadata,
+                                     snapshot.word_counts, snapshot.source_hash.hex())
+        logger.info(f"Loaded RAG engine from snapshot {snapshot.path} "
+                    f"with {index.num_docs} evidence items")
+        return engine
+    
+    @classmethod
+    def from_components(cls, index, texts, metadata, word_counts, version):
+        """
+        Create a RAG engine around an already built index and document store
         
-        for i, item in enumerate(self.evidence_data):
+        Args:
+            index: InvertedIndex
+            texts: Document texts (StringColumn)
+            metadata: Document metadata (EvidenceMetadata or mapped StringColumn)
+            word_counts: Array with the raw word count of every document
+            version: Identifier of the evidence corpus contents
+            
+        Returns:
+            RAGEngine
+        """
+        engine = cls.__new__(cls)
+        engine.k1 = index.k1
+        engine.b = index.b
+        engine.pruning = True
+        engine.domain_filter = True
+        engine.hybrid = False
+        engine.dense_weight = DEFAULT_DENSE_WEIGHT
+        engine.positional = False
+        engine._write_lock = threading.Lock()
+        engine.last_reload_seconds = None
+        engine.reloaded_at = None
+        engine._current = IndexGeneration(index, texts, metadata, word_counts, version, 0)
+        return engine
+    
+    # The current generation's components
+    index = property(lambda self: self._current.index)
+    texts = property(lambda self: self._current.texts)
+    metadata = property(lambda self: self._current.metadata)
+    word_counts = property(lambda self: self._current.word_counts)
+    tokenizer = property(lambda self: self._current.tokenizer)
+    version = property(lambda self: self._current.version)
+    generation = property(lambda self: self._current.generation)
+    
+    def _create_index(self, evidence_data, version, generation=0):
+        """Create BM25 inverted index and compact document store from evidence data"""
+        # Process each evidence item
+        texts = []
+        metadata = []
+        word_counts = []
+        token_lists = []
+        
+        for item in evidence_data:
             # Store the text and metadata
-            self.texts.append(item.get('content', ''))
-            self.metadata.append({
-                'id': item.get('id'),
-                'source': item.get('source'),
-                'url': item.get('url'),
-                'domain': item.get('domain'),
-                'publication_date': item.get('publication_date')
-            })
+            text, item_metadata = _document_fields(item)
+            texts.append(text)
+            metadata.append(item_metadata)
+            word_counts.append(len(text.split()))
             
-            # Preprocess and tokenize for the inverted index
-            processed_text = preprocess_text(item.get('content', ''))
-            tokens = tokenize(processed_text)
+            # Tokenize for the inverted index (bypassing the cache for bulk input)
+            token_lists.append(default_tokenizer.analyze(text, cache=False).tokens)
+        
+        index = InvertedIndex.build(token_lists, k1=self.k1, b=self.b)
+        
+        logger.info(f"Created BM25 inverted index with {len(index.vocabulary)} tokens "
+                    f"and {index.num_postings} postings")
+        texts = StringColumn.from_strings(texts)
+        positions = None
+        if self.positional:
+            positions = TokenPositions(index, texts, PositionalIndex.build(index, token_lists))
+        return IndexGeneration(
+            index, texts, EvidenceMetadata.from_records(metadata),
+            np.array(word_counts, dtype=np.int32), version, generation, positions=positions
+        )
+    
+    def update_documents(self, added=(), removed_ids=(), version=None):
+        """
+        Add and remove evidence items, then atomically publish the new index
+        
+        The new generation is built next to the current one (which keeps
+        serving requests) by reusing its postings, so only added items are
+        tokenized.
+        
+        Args:
+            added: Iterable of raw evidence items to append
+            removed_ids: Iterable of evidence ids to remove
+            version: Corpus version of the result; derived from the previous
+                version and the changes if not given
             
-            # Add to inverted index
-            for token in set(tokens):  # Use set to count each token only once per document
-                if token not in self.inverted_index:
-                    self.inverted_index[token] = []
-                self.inverted_index[token].append(i)  # Store the position in the texts list
+        Returns:
+            The new generation number
+        """
+        added = list(added)
+        removed_ids = set(removed_ids)
+        
+        with self._write_lock:
+            started = time.perf_counter()
+            current = self._current
+            metadata = current.metadata
+            if not isinstance(metadata, EvidenceMetadata):
+                # Snapshot generations store metadata as JSON rows
+                metadata = EvidenceMetadata.from_records(metadata)
+            keep_mask = np.array(
+                [doc_id not in removed_ids for doc_id in metadata.column('id')], dtype=bool
+            )
+            
+            added_texts = []
+            added_metadata = []
+            added_word_counts = []
+            token_lists = []
+            for item in added:
+                text, item_metadata = _document_fields(item)
+                added_texts.append(text)
+                added_metadata.append(item_metadata)
+                added_word_counts.append(len(text.split()))
+                token_lists.append(default_tokenizer.analyze(text, cache=False).tokens)
+            texts = current.texts.select(keep_mask).concat(StringColumn.from_strings(added_texts))
+            metadata = metadata.select(keep_mask).concat(
+                EvidenceMetadata.from_records(added_metadata)
+            )
+            word_counts = np.concatenate([
+                np.asarray(current.word_counts)[keep_mask],
+                np.array(added_word_counts, dtype=np.int32)
+            ])
+            
+            if version is None:
+                version = corpus_version([current.version, sorted(map(str, removed_ids)), added])
+            
+            index = current.index.with_changes(keep_mask, token_lists)
+            new = IndexGeneration(
+                index, texts, metadata, word_counts, version,
+                current.generation + 1,
+                current.dense.with_changes(texts, keep_mask, token_lists),
+                current.positions.with_changes(index, texts, keep_mask, token_lists)
+            )
+            # Requests keep using the current generation until the new one is warm
+            self._warm(new)
+            self._current = new
+            self._record_reload(started)
+        
+        logger.info(f"Published index generation {self.generation}: "
+                    f"+{len(added)} -{len(keep_mask) - int(keep_mask.sum())} documents")
+        return self.generation
+    
+    def add_documents(self, items, version=None):
+        """Append evidence items; see update_documents"""
+        return self.update_documents(added=items, version=version)
+    
+    def remove_documents(self, doc_ids, version=None):
+        """Remove evidence items by id; see update_documents"""
+        return self.update_documents(removed_ids=doc_ids, version=version)
+    
+    def replace_with(self, other):
+        """
+        Atomically adopt the current generation of another engine
+        
+        Used for full rebuilds, which are done in a separate engine off the
+        request path.
+        """
+        with self._write_lock:
+            started = time.perf_counter()
+            source = other._current
+            new = IndexGeneration(
+                source.index, source.texts, source.metadata, source.word_counts, source.version,
+                self._current.generation + 1, source.dense, source.positions
+            )
+            # Requests keep using the current generation until the new one is warm
+            self._warm(new)
+            self._current = new
+            self._record_reload(started)
+        return self.generation
+    
+    def warm_up(self):
+        """
+        Build the structures that are otherwise computed on first search
         
-        logger.info(f"Created simple inverted index with {len(self.inverted_index)} tokens")
+        Called before serving traffic, and in preload mode before forking, so
+        workers share them instead of each building a copy. Reloads warm
+        every new generation the same way before publishing it.
+        """
+        self._warm(self._current)
+    
+    def _warm(self, generation):
+        """Build the lazily computed structures of a generation that this engine's settings use"""
+        if self.pruning:
+            generation.index.max_impacts
+        if self.domain_filter:
+            generation.domains.warm_up(prune=self.pruning)
+        if self.hybrid:
+            generation.dense.get()
+        if self.positional:
+            generation.positions.get()
+    
+    def _record_reload(self, started):
+        self.last_reload_seconds = time.perf_counter() - started
+        self.reloaded_at = time.time()
+    
+    def status(self):
+        """Return the index generation, corpus version and reload timing"""
+        current = self._current
+        return {
+            'generation': current.generation,
+            'version': current.version,
+            'documents': current.index.num_docs,
+            'terms': len(current.index.vocabulary),
+            'postings': current.index.num_postings,
+            'pruning': self.pruning,
+            'domain_filter': self.domain_filter,
+            'hybrid': self.hybrid,
+            'positional': self.positional,
+            'last_reload_seconds': self.last_reload_seconds,
+            'reloaded_at': self.reloaded_at,
+        }
     
-    def retrieve_evidence(self, brand_name, tagline, claim, k=5):
+    def memory_report(self):
+        """
+        Return the bytes held by each component of the current generation
+        
+        Returns:
+            Dict as described in memory_report() at module level
+        """
+        current = self._current
+        return memory_report(current.index, current.texts, current.metadata,
+                             current.word_counts, current.domains, current.dense,
+                             current.positions)
+    
+    def _fuse_dense(self, current, tokens, keyword_matches, k, domain):
+        """Rerank BM25 candidates together with the nearest dense vectors"""
+        dense = current.dense.get()
+        scores = dense.scores(dense.embed(tokens))
+        doc_ids = np.arange(len(scores))
+        if domain is not None:
+            # Keep dense candidates in the domain the keyword search used
+            doc_ids = current.domains.get(domain)[1]
+        dense_matches = [
+            (doc_idx, similarity)
+            for doc_idx, similarity in top_k(doc_ids, scores[doc_ids], k * HYBRID_CANDIDATES)
+            if similarity >= MIN_DENSE_SIMILARITY
+        ]
+        return fuse_scores(keyword_matches, dense_matches, scores, k, self.dense_weight)
+    
+    def retrieve_evidence(self, brand_name, tagline, claim, k=5, domain=None):
         """
         Retrieve the most relevant evidence for a claim
         
@@ -62,48 +715,75 @@ class RAGEngine:
             tagline: Marketing tagline
             claim: The claim to check
             k: Number of evidence items to retrieve
+            domain: Optional domain of the claim; if set (and domain_filter is
+                on) only that domain's evidence is searched, unless it yields
+                fewer than MIN_DOMAIN_MATCHES matches
             
         Returns:
-            List of evidence items with relevance scores
+            List of evidence items with relevance scores. Each item also carries
+            'features' (DocumentFeatures) with the document's cached token ids
+            and, if positional is on, access to its token positions.
         """
-        # Combine and preprocess the query
-        query = f"{brand_name} {tagline} {claim}"
-        processed_query = preprocess_text(query)
-        query_tokens = tokenize(processed_query)
-        
-        # Extract important keywords to give them more weight
-        keywords = extract_keywords(query)
+        # Pin the current generation for the whole request
+        current = self._current
         
-        # Count documents that match each query token, with emphasis on keywords
-        matching_docs = Counter()
+        # Combine and tokenize the query in a single (cached) pass
+        query = f"{brand_name} {tagline} {claim}"
+        tokenized = current.tokenizer.analyze(query)
         
-        for token in query_tokens:
-            if token in self.inverted_index:
-                weight = 3 if token in keywords else 1  # Give more weight to keywords (integer)
-                for doc_idx in self.inverted_index[token]:
-                    matching_docs[doc_idx] += weight
+        # Weight each query term, with emphasis on keywords
+        token_weights = query_term_weights(tokenized)
+        term_weights = {
+            term_id: token_weights[token] for token, term_id in tokenized.term_ids.items()
+        }
         
-        # Get top k matches
-        top_matches = matching_docs.most_common(k)
+        # Get top k matches by BM25 score (more candidates if they are reranked)
+        depth = k
+        if self.hybrid:
+            depth = k * HYBRID_CANDIDATES
+        if self.positional:
+            depth = max(depth, k * PHRASE_CANDIDATES)
+        search_stats = {}
+        search_domain = domain if self.domain_filter else None
+        top_matches = current.domains.search(
+            term_weights, depth, search_domain, stats=search_stats, prune=self.pruning
+        )
+        positional = None
+        if self.positional:
+            positional = current.positions.get()
+            vocabulary = current.index.vocabulary
+            phrases = [
+                tuple(vocabulary.get(token) for token in phrase)
+                for phrase in claim_phrases(current.tokenizer.analyze(claim).tokens)
+            ]
+            top_matches = boost_phrases(positional, phrases, top_matches,
+                                        depth if self.hybrid else k)
+        if self.hybrid:
+            top_matches = self._fuse_dense(
+                current, tokenized.tokens, top_matches, k,
+                search_domain if search_stats['scope'] == 'domain' else None
+            )
+        metrics.retrieval_scope.inc(search_stats['scope'])
+        metrics.postings_scanned.observe(search_stats['postings_scanned'])
+        metrics.postings_skipped.observe(search_stats['postings_skipped'])
+        metrics.candidates_scored.observe(search_stats['candidates_scored'])
         
         # Format results
         results = []
-        max_matches = max([count for _, count in top_matches]) if top_matches else 1
-        
-        for doc_idx, match_count in top_matches:
-            if doc_idx < len(self.texts):
-                # Calculate relevance score (0-1 range)
-                relevance_score = match_count / max_matches if max_matches > 0 else 0
-                
-                # Only include results with reasonable relevance
-                if relevance_score > 0.3:  # 30% similarity threshold
-                    result = {
-                        'text': self.texts[doc_idx],
-                        'metadata': self.metadata[doc_idx],
-                        'relevance_score': relevance_score
-                    }
-                    results.append(result)
-        
-        logger.info(f"Retrieved {len(results)} evidence items for claim")
+        for doc_idx, relevance_score in relevant_matches(top_matches):
+            if doc_idx < len(current.texts):
+                results.append({
+                    'text': current.texts[doc_idx],
+                    'metadata': current.metadata[doc_idx],
+                    'relevance_score': relevance_score,
+                    'features': DocumentFeatures(
+                        current.index,
+                        current.index.document_terms(doc_idx),
+                        int(current.word_counts[doc_idx]),
+                        doc_idx,
+                        positional
+                    )
+                })
+        
+        logger.debug("Retrieved %d evidence items for claim", len(results))
         return results
-
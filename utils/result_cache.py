@@ -0,0 +1,212 @@
+"""
+Cache of analysis results for repeated claims.
+
+Entries are keyed by the normalized brand name, tagline and preprocessed
+claim plus the evidence corpus version, so editing the evidence database
+automatically makes old entries unreachable (and they are purged the first
+time a new version is seen). An in-process LRU with TTL is always used; an
+optional SQLite file shares results between all workers on the host.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def normalize(text):
+    """Lowercase and collapse whitespace"""
+    return ' '.join(text.lower().split())
+
+
+def make_key(brand_name, tagline, processed_claim, corpus_version):
+    """Return the cache key for an analysis"""
+    payload = json.dumps(
+        [normalize(brand_name), normalize(tagline), processed_claim, corpus_version],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SQLiteCacheBackend:
+    """Shared cache table in a local SQLite file"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache ("
+            " key TEXT PRIMARY KEY, version TEXT NOT NULL,"
+            " value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _connection(self):
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, now):
+        row = self._connection().execute(
+            "SELECT value FROM analysis_cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, version, value, expires_at):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO analysis_cache (key, version, value, expires_at)"
+            " VALUES (?, ?, ?, ?)",
+            (key, version, json.dumps(value, ensure_ascii=False), expires_at),
+        )
+        conn.commit()
+
+    def purge(self, current_version, now):
+        """Delete expired entries and entries from other corpus versions"""
+        conn = self._connection()
+        conn.execute(
+            "DELETE FROM analysis_cache WHERE version != ? OR expires_at <= ?",
+            (current_version, now),
+        )
+        conn.commit()
+
+
+class ResultCache:
+    """In-process LRU + TTL cache of analysis results with an optional shared backend"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, backend=None):
+        """
+        Args:
+            ttl: Seconds an entry stays valid
+            max_entries: Maximum number of entries kept in process
+            backend: Optional shared backend such as SQLiteCacheBackend
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _check_version(self, version):
+        """Drop everything cached for a previous evidence corpus version"""
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            if self._version is not None:
+                logger.info("Evidence corpus changed; invalidating result cache")
+            self._entries.clear()
+            self._version = version
+        if self.backend is not None:
+            try:
+                self.backend.purge(version, time.time())
+            except sqlite3.Error as e:
+                logger.warning(f"Could not purge shared result cache: {e}")
+
+    def get(self, key, version):
+        """Return a cached value or None"""
+        self._check_version(version)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared result cache read failed: {e}")
+                value = None
+            if value is not None:
+                self._store_local(key, value, now + self.ttl)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, version, value):
+        """Store a value"""
+        self._check_version(version)
+        expires_at = time.time() + self.ttl
+        self._store_local(key, value, expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, version, value, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared result cache write failed: {e}")
+
+    def _store_local(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'shared_backend': self.backend.path if self.backend is not None else None,
+                'corpus_version': self._version,
+            }
+
+
+def create_result_cache():
+    """Create a ResultCache configured from environment variables"""
+    backend = None
+    path = os.environ.get("RESULT_CACHE_PATH")
+    if path:
+        try:
+            backend = SQLiteCacheBackend(path)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared result cache disabled ({path}): {e}")
+
+    return ResultCache(
+        ttl=int(os.environ.get("RESULT_CACHE_TTL", DEFAULT_TTL)),
+        max_entries=int(os.environ.get("RESULT_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+        backend=backend,
+    )
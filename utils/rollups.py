@@ -0,0 +1,389 @@
+"""
+Daily rollups of verdicts and feedback ratings.
+
+Dashboards want the verdict distribution and average feedback rating per
+brand, per domain and overall, day by day. Instead of grouping the whole
+Claim and Feedback tables on every request, two small tables hold running
+totals: VerdictRollup (claims and score sum per verdict) and RatingRollup
+(number and sum of ratings), each keyed by (dimension, key, day) where the
+dimension is 'all', 'brand' or 'domain'.
+
+track_inserts() keeps them current: after every flush that inserts claims
+or feedback, the increments of the whole flush (a micro-batch, e.g. one
+AnalysisWriter batch) are added with one upsert per table, in the same
+transaction as the rows themselves. backfill() rebuilds both tables from
+the raw rows in a single streaming pass, e.g. after a bulk import.
+"""
+import argparse
+import base64
+import json
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import and_, delete, event, or_, select
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('all', 'brand', 'domain')
+
+# Key of the 'all' dimension, and of claims without a domain or verdict
+ALL_KEY = 'all'
+UNKNOWN = 'unknown'
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows streamed per fetch by backfill()
+DEFAULT_BACKFILL_BATCH = 10000
+
+# Backfill writes its totals out whenever this many groups have accumulated
+BACKFILL_FLUSH_GROUPS = 50000
+
+
+def _group_keys(brand_name, domain):
+    """Return the (dimension, key) pairs a claim counts towards"""
+    return (
+        ('all', ALL_KEY),
+        ('brand', brand_name),
+        ('domain', domain or UNKNOWN),
+    )
+
+
+def _day(created_at):
+    return (created_at or datetime.utcnow()).date()
+
+
+class RollupDelta:
+    """Increments to the rollup tables, summed per group"""
+
+    def __init__(self):
+        # (dimension, key, day, verdict) -> [claims, score_sum]
+        self.verdicts = defaultdict(lambda: [0, 0.0])
+        # (dimension, key, day) -> [ratings, rating_sum]
+        self.ratings = defaultdict(lambda: [0, 0])
+
+    def __len__(self):
+        return len(self.verdicts) + len(self.ratings)
+
+    def add_claim(self, brand_name, domain, verdict, score, created_at):
+        day = _day(created_at)
+        for dimension, key in _group_keys(brand_name, domain):
+            totals = self.verdicts[(dimension, key, day, verdict or UNKNOWN)]
+            totals[0] += 1
+            totals[1] += score or 0.0
+
+    def add_feedback(self, brand_name, domain, rating, created_at):
+        day = _day(created_at)
+        for dimension, key in _group_keys(brand_name, domain):
+            totals = self.ratings[(dimension, key, day)]
+            totals[0] += 1
+            totals[1] += rating
+
+    def apply(self, connection, verdict_model, rating_model):
+        """
+        Add the increments to the rollup tables and reset the delta
+
+        Args:
+            connection: SQLAlchemy connection, inside the caller's transaction
+            verdict_model: VerdictRollup model class
+            rating_model: RatingRollup model class
+        """
+        if self.verdicts:
+            _upsert(connection, verdict_model.__table__, ('dimension', 'key', 'day', 'verdict'), [
+                {'dimension': dimension, 'key': key, 'day': day, 'verdict': verdict,
+                 'claims': claims, 'score_sum': score_sum}
+                for (dimension, key, day, verdict), (claims, score_sum) in self.verdicts.items()
+            ])
+        if self.ratings:
+            _upsert(connection, rating_model.__table__, ('dimension', 'key', 'day'), [
+                {'dimension': dimension, 'key': key, 'day': day,
+                 'ratings': ratings, 'rating_sum': rating_sum}
+                for (dimension, key, day), (ratings, rating_sum) in self.ratings.items()
+            ])
+        self.verdicts.clear()
+        self.ratings.clear()
+
+
+def _upsert(connection, table, key_columns, rows):
+    """Insert rows, adding their counters to existing rows with the same key"""
+    counters = [column for column in rows[0] if column not in key_columns]
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: table.c[column] + stmt.excluded[column] for column in counters},
+        )
+        connection.execute(stmt, rows)
+        return
+
+    # Other databases: update, and insert the groups that did not exist yet
+    for row in rows:
+        match = and_(*(table.c[column] == row[column] for column in key_columns))
+        updated = connection.execute(table.update().where(match).values(
+            {column: table.c[column] + row[column] for column in counters}
+        ))
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(row))
+
+
+def track_inserts(session, claim_model, feedback_model, verdict_model, rating_model):
+    """
+    Update the rollups whenever claims or feedback are inserted
+
+    Args:
+        session: Session, session class or scoped_session to listen on
+        claim_model: Claim model class
+        feedback_model: Feedback model class
+        verdict_model: VerdictRollup model class
+        rating_model: RatingRollup model class
+    """
+    claim_table = claim_model.__table__
+
+    def after_flush(flush_session, flush_context):
+        claims = [obj for obj in flush_session.new if isinstance(obj, claim_model)]
+        feedbacks = [obj for obj in flush_session.new if isinstance(obj, feedback_model)]
+        if not claims and not feedbacks:
+            return
+
+        delta = RollupDelta()
+        for claim in claims:
+            delta.add_claim(claim.brand_name, claim.domain, claim.verdict, claim.score,
+                            claim.created_at)
+        connection = flush_session.connection()
+        if feedbacks:
+            # Feedback counts towards its claim's brand and domain
+            groups = {claim.id: (claim.brand_name, claim.domain) for claim in claims}
+            claim_ids = {feedback.claim_id for feedback in feedbacks} - groups.keys()
+            claim_ids.discard(None)
+            if claim_ids:
+                groups.update(
+                    (row.id, (row.brand_name, row.domain))
+                    for row in connection.execute(
+                        select(claim_table.c.id, claim_table.c.brand_name, claim_table.c.domain)
+                        .where(claim_table.c.id.in_(claim_ids))
+                    )
+                )
+            for feedback in feedbacks:
+                group = groups.get(feedback.claim_id)
+                if group is None:
+                    # Never fail the insert over a rollup; backfill() repairs the totals
+                    logger.warning(f"Feedback {feedback.id} refers to unknown claim "
+                                   f"{feedback.claim_id}; not counted in the rollups")
+                    continue
+                brand_name, domain = group
+                delta.add_feedback(brand_name, domain, feedback.user_rating, feedback.created_at)
+        delta.apply(connection, verdict_model, rating_model)
+
+    event.listen(session, 'after_flush', after_flush)
+
+
+def backfill(session, claim_model, feedback_model, verdict_model, rating_model,
+             batch_size=DEFAULT_BACKFILL_BATCH):
+    """
+    Rebuild the rollup tables from the Claim and Feedback rows
+
+    Each table is read once, in primary key order, batch_size rows per
+    fetch; only the running totals are kept in memory. The rebuild is one
+    transaction, so readers see either the old or the new rollups. Run it
+    while no analyses are being written: inserts committed during the pass
+    may be missed.
+
+    Args:
+        session: SQLAlchemy session
+        claim_model: Claim model class
+        feedback_model: Feedback model class
+        verdict_model: VerdictRollup model class
+        rating_model: RatingRollup model class
+        batch_size: Rows fetched at a time
+
+    Returns:
+        Dict with the number of claims and feedback rows read
+    """
+    Claim, Feedback = claim_model, feedback_model
+    connection = session.connection()
+    connection.execute(delete(verdict_model.__table__))
+    connection.execute(delete(rating_model.__table__))
+
+    delta = RollupDelta()
+    counts = {'claims': 0, 'feedback': 0}
+    claims = connection.execution_options(yield_per=batch_size).execute(
+        select(Claim.brand_name, Claim.domain, Claim.verdict, Claim.score, Claim.created_at)
+        .order_by(Claim.id)
+    )
+    for row in claims:
+        delta.add_claim(row.brand_name, row.domain, row.verdict, row.score, row.created_at)
+        counts['claims'] += 1
+        if len(delta) >= BACKFILL_FLUSH_GROUPS:
+            delta.apply(connection, verdict_model, rating_model)
+
+    feedback = connection.execution_options(yield_per=batch_size).execute(
+        select(Claim.brand_name, Claim.domain, Feedback.user_rating, Feedback.created_at)
+        .join(Claim, Feedback.claim_id == Claim.id)
+        .order_by(Feedback.id)
+    )
+    for row in feedback:
+        delta.add_feedback(row.brand_name, row.domain, row.user_rating, row.created_at)
+        counts['feedback'] += 1
+        if len(delta) >= BACKFILL_FLUSH_GROUPS:
+            delta.apply(connection, verdict_model, rating_model)
+
+    delta.apply(connection, verdict_model, rating_model)
+    session.commit()
+    logger.info(f"Rebuilt rollups from {counts['claims']} claims and {counts['feedback']} feedback rows")
+    return counts
+
+
+def encode_cursor(key, day):
+    """Return the opaque pagination cursor pointing after (key, day)"""
+    payload = json.dumps([key, day.isoformat()], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return the (key, day) of a cursor from encode_cursor
+
+    Raises:
+        ValueError: The cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key, day = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return str(key), date.fromisoformat(day)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _after(model, key, day, inclusive=False):
+    """Condition selecting the groups that sort after (key, day)"""
+    later_day = model.day >= day if inclusive else model.day > day
+    return or_(model.key > key, and_(model.key == key, later_day))
+
+
+def _not_after(model, key, day):
+    """Condition selecting the groups that sort at or before (key, day)"""
+    return or_(model.key < key, and_(model.key == key, model.day <= day))
+
+
+def query_stats(session, verdict_model, rating_model, dimension='brand', key=None,
+                since=None, until=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of daily stats, ordered by key then day
+
+    Pagination is by keyset: a page is the first limit (key, day) groups
+    after the cursor, so fetching a page costs the same however deep it is.
+
+    Args:
+        session: SQLAlchemy session
+        verdict_model: VerdictRollup model class
+        rating_model: RatingRollup model class
+        dimension: 'all', 'brand' or 'domain'
+        key: Optional brand or domain to restrict to
+        since: Optional first day (inclusive)
+        until: Optional last day (inclusive)
+        after: Optional (key, day) cursor of the previous page's last group
+        limit: Maximum groups per page
+
+    Returns:
+        (stats, next_cursor): list of per-day dicts, and the cursor of the
+        next page or None if this is the last one
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+
+    def conditions(model):
+        where = [model.dimension == dimension]
+        if key is not None:
+            where.append(model.key == key)
+        if since is not None:
+            where.append(model.day >= since)
+        if until is not None:
+            where.append(model.day <= until)
+        return where
+
+    # The first limit + 1 groups of each table after the cursor; both are
+    # range scans of the (dimension, key, day) unique indexes
+    groups = set()
+    for model in (verdict_model, rating_model):
+        stmt = select(model.key, model.day).where(*conditions(model))
+        if after is not None:
+            stmt = stmt.where(_after(model, *after))
+        stmt = stmt.distinct().order_by(model.key, model.day).limit(limit + 1)
+        groups.update((row.key, row.day) for row in session.execute(stmt))
+    page = sorted(groups)[:limit + 1]
+    has_more = len(page) > limit
+    page = page[:limit]
+    if not page:
+        return [], None
+
+    # The page is a contiguous range of groups, so it is read with one range per table
+    first, last = page[0], page[-1]
+    stats = {
+        group: {
+            'key': group[0],
+            'day': group[1].isoformat(),
+            'claims': 0,
+            'verdicts': {},
+            'average_score': None,
+            'ratings': 0,
+            'average_rating': None,
+        }
+        for group in page
+    }
+    score_sums = defaultdict(float)
+    for row in session.execute(
+        select(verdict_model.key, verdict_model.day, verdict_model.verdict,
+               verdict_model.claims, verdict_model.score_sum)
+        .where(*conditions(verdict_model), _after(verdict_model, *first, inclusive=True),
+               _not_after(verdict_model, *last))
+    ):
+        entry = stats[(row.key, row.day)]
+        entry['claims'] += row.claims
+        entry['verdicts'][row.verdict] = row.claims
+        score_sums[(row.key, row.day)] += row.score_sum
+    for row in session.execute(
+        select(rating_model.key, rating_model.day, rating_model.ratings, rating_model.rating_sum)
+        .where(*conditions(rating_model), _after(rating_model, *first, inclusive=True),
+               _not_after(rating_model, *last))
+    ):
+        entry = stats[(row.key, row.day)]
+        entry['ratings'] = row.ratings
+        if row.ratings:
+            entry['average_rating'] = round(row.rating_sum / row.ratings, 3)
+    for group, score_sum in score_sums.items():
+        entry = stats[group]
+        if entry['claims']:
+            entry['average_score'] = round(score_sum / entry['claims'], 4)
+
+    return [stats[group] for group in page], encode_cursor(*last) if has_more else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the verdict and rating rollup tables")
+    parser.add_argument('command', choices=['backfill'], help="backfill: rebuild from Claim and Feedback")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BACKFILL_BATCH,
+                        help="Rows fetched at a time")
+    args = parser.parse_args(argv)
+
+    # Importing the app has no side effects; only the database is needed here
+    from app import app, db
+    import models
+    from utils.schema import upgrade_schema
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema(db.engine, db.metadata)
+        counts = backfill(db.session, models.Claim, models.Feedback, models.VerdictRollup,
+                          models.RatingRollup, batch_size=args.batch_size)
+    print(json.dumps(counts))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,93 @@
+"""
+In-place upgrades of databases created by earlier versions.
+
+db.create_all() creates missing tables but never alters existing ones, so
+a database from an earlier release lacks the columns and indexes added to
+the models since. upgrade_schema() compares the live tables with the
+models and adds what is missing: nullable columns (or columns with a
+server default) with ALTER TABLE ... ADD COLUMN, missing indexes, and, on
+PostgreSQL, wider string columns. Anything it cannot add safely raises
+SchemaError at startup rather than failing later on every query.
+"""
+import logging
+
+from sqlalchemy import String, inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaError(RuntimeError):
+    """The database schema does not match the models and cannot be upgraded automatically"""
+
+
+def _add_column_sql(engine, table, column):
+    column_type = column.type.compile(dialect=engine.dialect)
+    preparer = engine.dialect.identifier_preparer
+    sql = (f"ALTER TABLE {preparer.format_table(table)} "
+           f"ADD COLUMN {preparer.format_column(column)} {column_type}")
+    if column.server_default is not None:
+        sql += f" DEFAULT {column.server_default.arg}"
+    return sql
+
+
+def upgrade_schema(engine, metadata):
+    """
+    Bring existing tables up to date with the models
+
+    Args:
+        engine: SQLAlchemy engine
+        metadata: MetaData of the models (after create_all)
+
+    Returns:
+        List of the statements and index names applied
+
+    Raises:
+        SchemaError: A missing column is NOT NULL without a server default, or
+            a string column must be widened on a database other than PostgreSQL
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+    applied = []
+
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            live_columns = {column['name']: column for column in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                live = live_columns.get(column.name)
+                if live is None:
+                    if not column.nullable and column.server_default is None:
+                        raise SchemaError(
+                            f"Column {table.name}.{column.name} is missing and is NOT NULL; "
+                            f"add it manually"
+                        )
+                    sql = _add_column_sql(engine, table, column)
+                    connection.execute(text(sql))
+                    applied.append(sql)
+                elif (engine.dialect.name != 'sqlite' and isinstance(column.type, String)
+                      and isinstance(live['type'], String) and column.type.length
+                      and live['type'].length and live['type'].length < column.type.length):
+                    # SQLite does not enforce lengths; other databases reject longer values
+                    if engine.dialect.name != 'postgresql':
+                        raise SchemaError(
+                            f"Column {table.name}.{column.name} must be widened to "
+                            f"{column.type.length} characters; alter it manually"
+                        )
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    sql = (f"ALTER TABLE {preparer.format_table(table)} ALTER COLUMN "
+                           f"{preparer.format_column(column)} TYPE {column_type}")
+                    connection.execute(text(sql))
+                    applied.append(sql)
+
+            live_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in live_indexes:
+                    index.create(connection)
+                    applied.append(index.name)
+
+    for change in applied:
+        logger.info(f"Upgraded database schema: {change}")
+    return applied
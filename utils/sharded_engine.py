@@ -0,0 +1,337 @@
+"""
+Sharded evidence retrieval across worker processes.
+
+Documents are split into contiguous ranges, one per shard. Every shard
+process streams the evidence file (JSON arrays included) and keeps only
+the documents of its own range; of the documents before it, it only holds
+the fingerprints used for deduplication. At startup the shards report
+their document frequencies so each one can weight postings with
+corpus-wide BM25 statistics; scores are then identical to a single
+RAGEngine over all documents. A query is sent to every shard in parallel
+and the per-shard top-k lists are merged with a heap into the global top-k.
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils import metrics
+from utils.evidence_ingest import iter_evidence, read_records
+from utils.evidence_store import EvidenceMetadata, StringColumn
+from utils.index_snapshot import content_hash
+from utils.inverted_index import InvertedIndex, DEFAULT_K1, DEFAULT_B
+from utils.nlp_processor import default_tokenizer
+from utils.rag_engine import (DomainPartitions, MIN_DOMAIN_MATCHES, _document_fields,
+                              memory_report, query_term_weights, relevant_matches)
+
+logger = logging.getLogger(__name__)
+
+# Shard processes are started from a clean server process rather than forked
+# from the caller, which may be a thread of a process with other threads
+MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+# State of the shard owned by this worker process, created by _init_shard
+_shard = None
+
+
+class _Shard:
+    """Documents and sub-index of one shard"""
+
+    __slots__ = ('index', 'texts', 'metadata', 'domains', 'first_doc')
+
+    def __init__(self, index, texts, metadata, first_doc):
+        self.index = index
+        self.texts = texts
+        self.metadata = metadata
+        self.domains = DomainPartitions(index, metadata)
+        self.first_doc = first_doc
+
+
+def _count_documents(evidence_path):
+    """Count the evidence items of a file without keeping them"""
+    return sum(1 for _ in iter_evidence(read_records(evidence_path)))
+
+
+def _init_shard(evidence_path, num_docs, shard, num_shards, k1, b):
+    """Process pool initializer that indexes this worker's range of documents"""
+    global _shard
+
+    first_doc = shard * num_docs // num_shards
+    last_doc = (shard + 1) * num_docs // num_shards
+
+    # Items before the range are still read so deduplication matches a full load
+    texts = []
+    metadata = []
+    token_lists = []
+    items = iter_evidence(read_records(evidence_path))
+    for item in itertools.islice(items, first_doc, last_doc):
+        text, item_metadata = _document_fields(item)
+        texts.append(text)
+        metadata.append(item_metadata)
+        token_lists.append(default_tokenizer.analyze(text, cache=False).tokens)
+
+    index = InvertedIndex.build(token_lists, k1=k1, b=b)
+    _shard = _Shard(index, StringColumn.from_strings(texts),
+                    EvidenceMetadata.from_records(metadata), first_doc)
+
+
+def _shard_statistics():
+    """Return (terms in local id order, document frequencies, docs, total length)"""
+    index = _shard.index
+    terms = [None] * len(index.vocabulary)
+    for term, term_id in index.vocabulary.items():
+        terms[term_id] = term
+    total_length = float(index.doc_lengths.sum(dtype=np.float64))
+    return terms, np.diff(index.offsets), index.num_docs, total_length
+
+
+def _apply_statistics(doc_freqs, num_docs, avg_doc_length):
+    """Reweight this shard's postings with corpus-wide statistics"""
+    global _shard
+
+    index = _shard.index.with_collection_stats(doc_freqs, num_docs, avg_doc_length)
+    _shard = _Shard(index, _shard.texts, _shard.metadata, _shard.first_doc)
+    return len(index.vocabulary)
+
+
+def _search_shard(token_weights, k, prune, domain=None):
+    """
+    Run a query against this worker's shard
+
+    Args:
+        token_weights: Dict token -> query weight
+        k: Number of documents to return
+        prune: Use MaxScore dynamic pruning
+        domain: Only search this domain's documents (no fallback; the
+            caller decides on that over all shards)
+
+    Returns:
+        (matches, stats) where matches are (global doc id, score, text, metadata)
+        tuples ordered by descending score
+    """
+    shard = _shard
+    vocabulary = shard.index.vocabulary
+    term_weights = {}
+    for token, weight in token_weights.items():
+        term_id = vocabulary.get(token)
+        if term_id is not None:
+            term_weights[term_id] = weight
+
+    stats = {'postings_scanned': 0, 'postings_skipped': 0, 'candidates_scored': 0}
+    if domain is None:
+        index, doc_map = shard.index, None
+    else:
+        partition = shard.domains.get(domain)
+        if partition is None:
+            return [], stats
+        index, doc_map = partition
+
+    matches = []
+    for doc_idx, score in index.search(term_weights, k, stats=stats, prune=prune):
+        if doc_map is not None:
+            doc_idx = int(doc_map[doc_idx])
+        matches.append(
+            (shard.first_doc + doc_idx, score, shard.texts[doc_idx], shard.metadata[doc_idx])
+        )
+    return matches, stats
+
+
+def _warm_up_shard(prune, domain_filter):
+    """Build this shard's lazily computed search structures"""
+    if prune:
+        _shard.index.max_impacts
+    if domain_filter:
+        _shard.domains.warm_up(prune)
+
+
+def _shard_memory_report():
+    """Return the memory report of this worker's shard"""
+    return memory_report(_shard.index, _shard.texts, _shard.metadata, domains=_shard.domains)
+
+
+def _merge_top_k(shard_results, k):
+    """Merge per-shard match lists into the global top-k"""
+    # Every shard's list is already ordered, so a k-way heap merge suffices
+    merged = heapq.merge(
+        *(matches for matches, _ in shard_results),
+        key=lambda match: (-match[1], match[0]),
+    )
+    return list(itertools.islice(merged, k))
+
+
+class ShardedRAGEngine:
+    """RAG engine that partitions the evidence index across worker processes"""
+
+    def __init__(self, evidence_path, num_shards, k1=DEFAULT_K1, b=DEFAULT_B, pruning=True,
+                 domain_filter=True):
+        """
+        Start the shard processes and build their indexes
+
+        Args:
+            evidence_path: Path to the evidence file (.json, .jsonl or .csv)
+            num_shards: Number of shard processes
+            k1: BM25 term-frequency saturation parameter
+            b: BM25 document length normalization parameter
+            pruning: Use MaxScore dynamic pruning inside every shard
+            domain_filter: Search only evidence of the claim's domain when
+                one is given to retrieve_evidence
+        """
+        started = time.perf_counter()
+        self.evidence_path = evidence_path
+        self.num_shards = num_shards
+        self.k1 = k1
+        self.b = b
+        self.pruning = pruning
+        self.domain_filter = domain_filter
+        self.version = content_hash(evidence_path).hex()
+        self.generation = 0
+        self.reloaded_at = None
+
+        # One single-process pool per shard, so each shard's state stays in one worker
+        num_docs = _count_documents(evidence_path)
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=MP_CONTEXT,
+                initializer=_init_shard,
+                initargs=(evidence_path, num_docs, shard, num_shards, k1, b),
+            )
+            for shard in range(num_shards)
+        ]
+        atexit.register(self.close)
+
+        shard_stats = self._gather(_shard_statistics)
+        self.num_docs = sum(num_docs for _, _, num_docs, _ in shard_stats)
+        total_length = sum(length for _, _, _, length in shard_stats)
+        avg_doc_length = total_length / self.num_docs if self.num_docs else 0.0
+
+        # Sum document frequencies over shards, then send each shard its terms' totals
+        doc_freqs = {}
+        for terms, shard_freqs, _, _ in shard_stats:
+            for term, freq in zip(terms, shard_freqs.tolist()):
+                doc_freqs[term] = doc_freqs.get(term, 0) + freq
+        self.num_terms = len(doc_freqs)
+
+        futures = [
+            executor.submit(
+                _apply_statistics,
+                np.array([doc_freqs[term] for term in terms], dtype=np.int64),
+                self.num_docs,
+                avg_doc_length,
+            )
+            for executor, (terms, _, _, _) in zip(self._executors, shard_stats)
+        ]
+        self.shard_terms = [future.result() for future in futures]
+        self.num_postings = sum(int(freqs.sum()) for _, freqs, _, _ in shard_stats)
+        self.last_reload_seconds = time.perf_counter() - started
+        logger.info(f"Started {num_shards} index shards over {self.num_docs} evidence items "
+                    f"in {self.last_reload_seconds:.2f}s")
+
+    def _gather(self, fn, *args):
+        """Call fn in every shard process in parallel and return the results in shard order"""
+        futures = [executor.submit(fn, *args) for executor in self._executors]
+        return [future.result() for future in futures]
+
+    def search(self, token_weights, k, domain=None):
+        """
+        Scatter a weighted query to all shards and merge their top-k lists
+
+        Args:
+            token_weights: Dict token -> query weight
+            k: Number of documents to return
+            domain: Optional domain to search; falls back to all documents if
+                the shards find fewer than MIN_DOMAIN_MATCHES matches in total
+
+        Returns:
+            List of (doc_idx, score, text, metadata) tuples ordered by
+            descending score, with ties broken by ascending document id
+        """
+        shard_results = self._gather(_search_shard, token_weights, k, self.pruning, domain)
+        scope = 'global' if domain is None else 'domain'
+        merged = _merge_top_k(shard_results, k)
+
+        if domain is not None and len(merged) < min(k, MIN_DOMAIN_MATCHES):
+            scope = 'fallback'
+            domain_results = shard_results
+            shard_results = self._gather(_search_shard, token_weights, k, self.pruning)
+            merged = _merge_top_k(shard_results, k)
+            shard_results = shard_results + domain_results
+
+        metrics.retrieval_scope.inc(scope)
+        metrics.postings_scanned.observe(sum(stats['postings_scanned'] for _, stats in shard_results))
+        metrics.postings_skipped.observe(sum(stats['postings_skipped'] for _, stats in shard_results))
+        metrics.candidates_scored.observe(sum(stats['candidates_scored'] for _, stats in shard_results))
+        return merged
+
+    def retrieve_evidence(self, brand_name, tagline, claim, k=5, domain=None):
+        """
+        Retrieve the most relevant evidence for a claim
+
+        Same arguments and scoring as RAGEngine.retrieve_evidence. Results
+        carry no 'features', since token ids only exist inside the shards.
+        """
+        query = f"{brand_name} {tagline} {claim}"
+        token_weights = query_term_weights(default_tokenizer.analyze(query))
+        top_matches = self.search(token_weights, k, domain if self.domain_filter else None)
+
+        texts = {doc_idx: (text, item_metadata) for doc_idx, _, text, item_metadata in top_matches}
+        results = []
+        for doc_idx, relevance_score in relevant_matches([(d, s) for d, s, _, _ in top_matches]):
+            text, item_metadata = texts[doc_idx]
+            results.append({
+                'text': text,
+                'metadata': item_metadata,
+                'relevance_score': relevance_score,
+            })
+
+        logger.debug("Retrieved %d evidence items for claim from %d shards",
+                     len(results), self.num_shards)
+        return results
+
+    def status(self):
+        """Return the shard layout and corpus version"""
+        return {
+            'generation': self.generation,
+            'version': self.version,
+            'documents': self.num_docs,
+            'terms': self.num_terms,
+            'postings': self.num_postings,
+            'pruning': self.pruning,
+            'domain_filter': self.domain_filter,
+            'shards': self.num_shards,
+            'shard_terms': self.shard_terms,
+            'last_reload_seconds': self.last_reload_seconds,
+            'reloaded_at': self.reloaded_at,
+        }
+
+    def warm_up(self):
+        """Build every shard's pruning bounds and domain sub-indexes now"""
+        self._gather(_warm_up_shard, self.pruning, self.domain_filter)
+
+    def memory_report(self):
+        """
+        Return the memory held by every shard process
+
+        Returns:
+            Dict with the summed 'heap_bytes' and 'mapped_bytes' and the
+            per-shard reports (see rag_engine.memory_report) under 'shards'
+        """
+        shards = self._gather(_shard_memory_report)
+        return {
+            'documents': self.num_docs,
+            'heap_bytes': sum(report['heap_bytes'] for report in shards),
+            'mapped_bytes': sum(report['mapped_bytes'] for report in shards),
+            'shards': shards,
+        }
+
+    def close(self):
+        """Stop the shard processes"""
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)